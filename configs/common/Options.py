@@ -230,6 +230,10 @@ def addCommonOptions(parser):
     parser.add_option("--restore-simpoint-checkpoint", action="store_true",
         help="restore from a simpoint checkpoint taken with " +
              "--take-simpoint-checkpoints")
+    parser.add_option("--checkpoint-store", action="store", type="string",
+        help="deduplicate the memory of the checkpoints taken with " +
+             "--take-simpoint-checkpoints into this page store " +
+             "(see util/cpt_dedup.py)")
 
     # Checkpointing options
     ###Note that performing checkpointing via python script files will override
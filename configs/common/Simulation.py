@@ -39,6 +39,7 @@
 #
 # Authors: Lisa Hsu
 
+import glob
 import sys
 from os import getcwd
 from os.path import join as joinpath
@@ -343,7 +344,17 @@ def parseSimpointAnalysisFile(options, testsys):
 
     return (simpoints, interval_length)
 
-def takeSimpointCheckpoints(simpoints, interval_length, cptdir):
+def cptDedup():
+    """Import util/cpt_dedup.py, which handles checkpoint page stores"""
+    addToPath('../../util')
+    import cpt_dedup
+    return cpt_dedup
+
+def takeSimpointCheckpoints(simpoints, interval_length, cptdir, store=None):
+    if store:
+        cpt_dedup = cptDedup()
+        store = cpt_dedup.ChunkStore(store, create=True)
+
     num_checkpoints = 0
     index = 0
     last_chkpnt_inst_count = -1
@@ -366,18 +377,28 @@ def takeSimpointCheckpoints(simpoints, interval_length, cptdir):
             code = exit_event.getCode()
 
         if exit_cause == "simpoint starting point found":
-            m5.checkpoint(joinpath(cptdir,
+            checkpoint_dir = joinpath(cptdir,
                 "cpt.simpoint_%02d_inst_%d_weight_%f_interval_%d_warmup_%d"
                 % (index, starting_inst_count, weight, interval_length,
-                actual_warmup_length)))
+                actual_warmup_length))
+            m5.checkpoint(checkpoint_dir)
             print "Checkpoint #%d written. start inst:%d weight:%f" % \
                 (num_checkpoints, starting_inst_count, weight)
+            if store:
+                # Replace the memory images by manifests into the store
+                size, added = cpt_dedup.store_checkpoint(store,
+                                                         checkpoint_dir)
+                print "Checkpoint #%d memory deduplicated: %d bytes " \
+                    "stored as %d new bytes" % (num_checkpoints, size, added)
             num_checkpoints += 1
             last_chkpnt_inst_count = starting_inst_count
         else:
             break
         index += 1
 
+    if store:
+        store.close()
+
     print 'Exiting @ tick %i because %s' % (m5.curTick(), exit_cause)
     print "%d checkpoints taken" % num_checkpoints
     sys.exit(code)
@@ -586,6 +607,10 @@ def run(options, root, testsys, cpu_class):
     checkpoint_dir = None
     if options.checkpoint_restore:
         cpt_starttick, checkpoint_dir = findCptDir(options, cptdir, testsys)
+        # Rebuild memory images that were deduplicated into a page store
+        if glob.glob(joinpath(checkpoint_dir, "*.pmem.manifest")):
+            for image in cptDedup().restore_checkpoint(checkpoint_dir):
+                print "Restored memory image", image
     m5.instantiate(checkpoint_dir)
 
     # Initialization is complete.  If we're not in control of simulation
@@ -681,7 +706,8 @@ def run(options, root, testsys, cpu_class):
 
     # Take SimPoint checkpoints
     elif options.take_simpoint_checkpoints != None:
-        takeSimpointCheckpoints(simpoints, interval_length, cptdir)
+        takeSimpointCheckpoints(simpoints, interval_length, cptdir,
+                                options.checkpoint_store)
 
     # Restore from SimPoint checkpoints
     elif options.restore_simpoint_checkpoint != None:
@@ -38,6 +38,11 @@
 # This script allows .ini and .json system config file generated from a
 # previous gem5 run to be read in and instantiated.
 #
+# Binary config snapshots (written with --snapshot-config) can also be
+# read.  These hold the same information with vector values already
+# split, children already resolved and port connections already paired
+# up with their indices, so they load without any text parsing.
+#
 # This may be useful as a way of allowing variant run scripts (say,
 # with more complicated than usual checkpointing/stats dumping/
 # simulation control) to read pre-described systems from config scripts
@@ -351,6 +356,13 @@ class ConfigManager(object):
         for name, obj in self.objects_by_name.iteritems():
             self.fill_in_simobj_parameters(name, obj)
 
+        # Snapshots list every connection once with explicit indices
+        #   so they can be bound directly
+        indexed_connections = self.config.get_port_connections()
+        if indexed_connections is not None:
+            self.bind_indexed_ports(indexed_connections)
+            return
+
         # Gather a list of all port-to-port connections
         connections = []
         for name, obj in self.objects_by_name.iteritems():
@@ -360,6 +372,22 @@ class ConfigManager(object):
         #   bind them
         self.bind_ports(connections)
 
+    def bind_indexed_ports(self, connections):
+        """Bind all ports from a list of (object, port, index, peer_object,
+        peer_port, peer_index) tuples, one per connection.  An index of -1
+        denotes a non-vector port"""
+
+        def port_ref(object_name, port_name, index):
+            ref = getattr(self.objects_by_name[object_name], port_name)
+            if index >= 0:
+                ref = ref[index]
+            return ref
+
+        for from_object, from_port, from_index, to_object, to_port, \
+            to_index in connections:
+            port_ref(from_object, from_port, from_index).connect(
+                port_ref(to_object, to_port, to_index))
+
 class ConfigFile(object):
     def get_flags(self):
         return set()
@@ -393,6 +421,12 @@ class ConfigFile(object):
         object.port(\[index\])?) of the port object_name.port_name"""
         pass
 
+    def get_port_connections(self):
+        """Get a list of (object, port, index, peer_object, peer_port,
+        peer_index) for every connection, or None if the connections
+        must be gathered with get_port_peers"""
+        return None
+
 class ConfigIniFile(ConfigFile):
     def __init__(self):
         self.parser = ConfigParser.ConfigParser()
@@ -506,16 +540,57 @@ class ConfigJsonFile(ConfigFile):
 
         return peers
 
+class ConfigSnapshotFile(ConfigFile):
+    def __init__(self):
+        pass
+
+    def load(self, config_file):
+        objs, self.connections = m5.loadConfigSnapshot(config_file)
+        self.types = {}
+        self.children = {}
+        self.params = {}
+        for path, type, children, params in objs:
+            self.types[path] = type
+            self.children[path] = children
+            self.params[path] = dict(params)
+        self.object_names = [ obj[0] for obj in objs ]
+
+    def get_all_object_names(self):
+        return self.object_names
+
+    def get_param(self, object_name, param_name):
+        if param_name == 'type':
+            return self.types[object_name]
+        return self.params[object_name][param_name]
+
+    def get_param_vector(self, object_name, param_name):
+        return self.params[object_name][param_name]
+
+    def get_object_children(self, object_name):
+        return self.children[object_name]
+
+    def get_port_peers(self, object_name, port_name):
+        return []
+
+    def get_port_connections(self):
+        return self.connections
+
 parser = argparse.ArgumentParser()
 
 parser.add_argument('config_file', metavar='config-file.ini',
-    help='.ini configuration file to load and run')
+    help='.ini, .json or binary snapshot configuration file to load and run')
 
 args = parser.parse_args(sys.argv[1:])
 
 if args.config_file.endswith('.ini'):
     config = ConfigIniFile()
     config.load(args.config_file)
+elif args.config_file.endswith('.json'):
+    config = ConfigJsonFile()
+    config.load(args.config_file)
+elif args.config_file.endswith('.snapshot'):
+    config = ConfigSnapshotFile()
+    config.load(args.config_file)
 else:
     config = ConfigJsonFile()
     config.load(args.config_file)
@@ -45,6 +45,8 @@ import sys
 import re
 import string
 import inspect, traceback
+import cPickle
+import hashlib
 # get type names
 from types import *
 
@@ -1209,6 +1211,59 @@ class LineTracker(object):
     def __int__(self):
         return self.lineno
 
+def file_hash(filename):
+    f = file(filename, 'rb')
+    digest = hashlib.sha1(f.read()).hexdigest()
+    f.close()
+    return digest
+
+def update_file(filename, contents):
+    '''Write contents to filename unless the file already holds exactly
+    that, so that unchanged outputs keep their timestamps and SCons
+    doesn't rebuild everything that includes them.'''
+    try:
+        f = file(filename, 'r')
+        unchanged = f.read() == contents
+        f.close()
+        if unchanged:
+            return
+    except IOError:
+        pass
+
+    f = file(filename, 'w')
+    f.write(contents)
+    f.close()
+
+#
+# Generated files are accumulated in memory and handed back to the
+# parser when they are closed, which only writes them out if they
+# changed and remembers them for the output cache.
+#
+class OutputFile(object):
+    def __init__(self, parser, name):
+        self.parser = parser
+        self.name = name
+        self.data = []
+        self.closed = False
+
+    def write(self, s):
+        self.data.append(s)
+
+    def getvalue(self):
+        return ''.join(self.data)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.parser.commit_output(self.name, self.getvalue())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+
 
 #######################
 #
@@ -1224,10 +1279,21 @@ class ISAParser(Grammar):
             self.includes = includes
             self.strings = strings
 
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, cache_dir=None):
         super(ISAParser, self).__init__()
         self.output_dir = output_dir
 
+        # Directory holding the parse tables and the generated code of
+        # previous runs, or None to always parse from scratch.
+        self.cache_dir = cache_dir
+        if cache_dir:
+            self.setupTableCache(cache_dir, 'isa_parser')
+
+        # Contents of every generated file, by name, and the
+        # (filename, hash) pairs of the files they were generated from.
+        self.outputs = {}
+        self.deps = []
+
         self.filename = None # for output file watermarking/scaremongering
 
         self.cpuModels = [
@@ -1267,6 +1333,9 @@ class ISAParser(Grammar):
 
         symbols = ('makeList', 're', 'string')
         self.exportContext = dict([(s, eval(s)) for s in symbols])
+        # Let blocks that cache their own intermediate results (like the
+        # x86 microassembler) keep them next to the parser's.
+        self.exportContext['isa_cache_dir'] = cache_dir
 
         self.maxInstSrcRegs = 0
         self.maxInstDestRegs = 0
@@ -2347,20 +2416,22 @@ StaticInstPtr
 
     def open(self, name, bare=False):
         '''Open the output file for writing and include scary warning.'''
-        filename = os.path.join(self.output_dir, name)
-        f = open(filename, 'w')
-        if f:
-            if not bare:
-                f.write(ISAParser.scaremonger_template % self)
+        f = OutputFile(self, name)
+        if not bare:
+            f.write(ISAParser.scaremonger_template % self)
         return f
 
     def update(self, file, contents):
-        '''Update the output file only.  Scons should handle the case when
-        the new contents are unchanged using its built-in hash feature.'''
+        '''Update the output file only.  The file is left alone if the
+        new contents are unchanged.'''
         f = self.open(file)
         f.write(contents)
         f.close()
 
+    def commit_output(self, name, contents):
+        self.outputs[name] = contents
+        update_file(os.path.join(self.output_dir, name), contents)
+
     # This regular expression matches '##include' directives
     includeRE = re.compile(r'^\s*##include\s+"(?P<filename>[^"]*)".*$',
                            re.MULTILINE)
@@ -2386,6 +2457,8 @@ StaticInstPtr
             contents = open(filename).read()
         except IOError:
             error('Error including file "%s"' % filename)
+        self.deps.append((filename,
+                          hashlib.sha1(contents).hexdigest()))
 
         self.fileNameStack.push(LineTracker(filename))
 
@@ -2416,6 +2489,19 @@ StaticInstPtr
         # grab the last three path components of isa_desc_file
         self.filename = '/'.join(isa_desc_file.split('/')[-3:])
 
+        # If none of the files the ISA was generated from changed since
+        # the last run, just put back the code generated then.
+        if self.cache_dir:
+            cache_file = self.cache_file(isa_desc_file)
+            outputs = self.loadCachedOutputs(cache_file)
+            if outputs is not None:
+                for name, contents in sorted(outputs.iteritems()):
+                    self.commit_output(name, contents)
+                ISAParser.AlreadyGenerated[isa_desc_file] = None
+                return
+
+        modules = set(sys.modules)
+
         # Read file and (recursively) all included files into a string.
         # PLY requires that the input be in a single string so we have to
         # do this up front.
@@ -2427,8 +2513,79 @@ StaticInstPtr
         # Parse.
         self.parse_string(isa_desc)
 
+        if self.cache_dir:
+            self.storeCachedOutputs(cache_file,
+                                    self.deps + self.module_deps(modules))
+
         ISAParser.AlreadyGenerated[isa_desc_file] = None
 
+    def cache_file(self, isa_desc_file):
+        isa_desc_file = os.path.abspath(isa_desc_file)
+        key = hashlib.sha1('%s\0%s' % (isa_desc_file,
+                                       os.path.abspath(self.output_dir)))
+        name = os.path.splitext(os.path.basename(isa_desc_file))[0]
+        return os.path.join(self.cache_dir, 'isa-%s-%s.pickle' %
+                            (name, key.hexdigest()[:16]))
+
+    # Top-level packages of the modules the parser itself imports
+    parser_packages = ('m5', 'ply')
+
+    def module_deps(self, modules):
+        '''The generated code also depends on the python modules that
+        'let' blocks import, like the x86 microcode, and on the parser
+        itself.  Those are the modules imported while parsing, any that
+        live in the arch directory, and the parser's own imports
+        (m5.util.grammar and PLY), which were usually loaded before
+        parsing started.'''
+        arch_dir = os.path.dirname(os.path.abspath(__file__))
+        deps = []
+        for name, module in sorted(sys.modules.items()):
+            filename = getattr(module, '__file__', None)
+            if not filename:
+                continue
+            filename = os.path.abspath(filename)
+            if name in modules and \
+                   not filename.startswith(arch_dir + os.sep) and \
+                   name.split('.')[0] not in self.parser_packages:
+                continue
+            if filename.endswith(('.pyc', '.pyo')):
+                filename = filename[:-1]
+            if filename.endswith('.py') and os.path.isfile(filename):
+                deps.append((filename, file_hash(filename)))
+        return deps
+
+    def loadCachedOutputs(self, cache_file):
+        try:
+            f = file(cache_file, 'rb')
+        except IOError:
+            return None
+
+        try:
+            version, deps = cPickle.load(f)
+            if version != sys.version_info[:2]:
+                return None
+            for filename, digest in deps:
+                if file_hash(filename) != digest:
+                    return None
+            outputs = cPickle.load(f)
+        except (EnvironmentError, EOFError, cPickle.UnpicklingError,
+                ValueError):
+            return None
+        finally:
+            f.close()
+        return outputs
+
+    def storeCachedOutputs(self, cache_file, deps):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Write atomically, several builds may share the cache
+        tmp_file = '%s.%d' % (cache_file, os.getpid())
+        f = file(tmp_file, 'wb')
+        cPickle.dump((sys.version_info[:2], deps), f, 2)
+        cPickle.dump(self.outputs, f, 2)
+        f.close()
+        os.rename(tmp_file, cache_file)
+
     def parse_isa_desc(self, *args, **kwargs):
         try:
             self._parse_isa_desc(*args, **kwargs)
@@ -2439,6 +2596,7 @@ StaticInstPtr
             sys.exit(1)
 
 # Called as script: get args from command line.
-# Args are: <isa desc file> <output dir>
+# Args are: <isa desc file> <output dir> [<cache dir>]
 if __name__ == '__main__':
-    ISAParser(sys.argv[2]).parse_isa_desc(sys.argv[1])
+    cache_dir = len(sys.argv) > 3 and sys.argv[3] or None
+    ISAParser(sys.argv[2], cache_dir).parse_isa_desc(sys.argv[1])
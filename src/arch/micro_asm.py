@@ -31,6 +31,9 @@ import sys
 import re
 import string
 import traceback
+import cPickle
+import hashlib
+import new
 # get type names
 from types import *
 
@@ -121,15 +124,29 @@ def print_error(message):
     print "*** %s" % message
     print
 
+# The same parameter strings show up over and over again in the
+# microcode, so they are only compiled once.
+compiled_statements = {}
+
+def compile_statement(function, params):
+    try:
+        return compiled_statements[function, params]
+    except KeyError:
+        pass
+    code = compile('%s(%s)' % (function, params), '<microcode>', 'eval')
+    compiled_statements[function, params] = code
+    return code
+
 def handle_statement(parser, container, statement):
     if statement.is_microop:
-        if statement.mnemonic not in parser.microops.keys():
+        if statement.mnemonic not in parser.microops:
             raise Exception, "Unrecognized mnemonic: %s" % statement.mnemonic
         parser.symbols["__microopClassFromInsideTheAssembler"] = \
             parser.microops[statement.mnemonic]
         try:
-            microop = eval('__microopClassFromInsideTheAssembler(%s)' %
-                    statement.params, {}, parser.symbols)
+            microop = eval(compile_statement(
+                    '__microopClassFromInsideTheAssembler', statement.params),
+                    {}, parser.symbols)
         except:
             print_error("Error creating microop object with mnemonic %s." % \
                     statement.mnemonic)
@@ -144,13 +161,14 @@ def handle_statement(parser, container, statement):
             print_error("Error adding microop.")
             raise
     elif statement.is_directive:
-        if statement.name not in container.directives.keys():
+        if statement.name not in container.directives:
             raise Exception, "Unrecognized directive: %s" % statement.name
         parser.symbols["__directiveFunctionFromInsideTheAssembler"] = \
             container.directives[statement.name]
         try:
-            eval('__directiveFunctionFromInsideTheAssembler(%s)' %
-                    statement.params, {}, parser.symbols)
+            eval(compile_statement(
+                    '__directiveFunctionFromInsideTheAssembler',
+                    statement.params), {}, parser.symbols)
         except:
             print_error("Error executing directive.")
             print container.directives
@@ -158,6 +176,39 @@ def handle_statement(parser, container, statement):
     else:
         raise Exception, "Didn't recognize the type of statement", statement
 
+# Defines a section of microcode that should go in the current ROM
+def handle_rom_block(parser, statements):
+    if not parser.rom:
+        print_error("Rom block found, but no Rom object specified.")
+        raise TypeError, "Rom block found, but no Rom object was specified."
+    for statement in statements:
+        handle_statement(parser, parser.rom, statement)
+
+# Defines a macroop that jumps to an external label in the ROM
+def handle_rom_macroop(parser, name, target):
+    if not parser.rom_macroop_type:
+        print_error("ROM based macroop found, but no ROM macroop class was specified.")
+        raise TypeError, "ROM based macroop found, but no ROM macroop class was specified."
+    macroop = parser.rom_macroop_type(name, target)
+    parser.macroops[name] = macroop
+
+# Defines a macroop that is combinationally generated
+def handle_macroop(parser, name, statements):
+    try:
+        curop = parser.macro_type(name)
+    except TypeError:
+        print_error("Error creating macroop object.")
+        raise
+    for statement in statements:
+        handle_statement(parser, curop, statement)
+    parser.macroops[name] = curop
+
+definition_handlers = {
+    'rom' : handle_rom_block,
+    'rom_macroop' : handle_rom_macroop,
+    'macroop' : handle_macroop,
+}
+
 ##########################################################################
 #
 # Lexer specification
@@ -306,57 +357,49 @@ def t_ANY_error(t):
 ##########################################################################
 
 # Start symbol for a file which may have more than one macroop or rom
-# specification.
+# specification. The parser only collects the definitions, as
+# (kind, args...) tuples, and the assembler hands them to the
+# definition_handlers afterwards so that they can be cached.
 def p_file(t):
     'file : opt_rom_or_macros'
+    t[0] = t[1]
 
 def p_opt_rom_or_macros_0(t):
     'opt_rom_or_macros : '
+    t[0] = []
 
 def p_opt_rom_or_macros_1(t):
     'opt_rom_or_macros : rom_or_macros'
+    t[0] = t[1]
 
 def p_rom_or_macros_0(t):
     'rom_or_macros : rom_or_macro'
+    t[0] = [t[1]]
 
 def p_rom_or_macros_1(t):
     'rom_or_macros : rom_or_macros rom_or_macro'
+    t[1].append(t[2])
+    t[0] = t[1]
 
 def p_rom_or_macro_0(t):
     '''rom_or_macro : rom_block
                     | macroop_def'''
+    t[0] = t[1]
 
 # Defines a section of microcode that should go in the current ROM
 def p_rom_block(t):
     'rom_block : DEF ROM block SEMI'
-    if not t.parser.rom:
-        print_error("Rom block found, but no Rom object specified.")
-        raise TypeError, "Rom block found, but no Rom object was specified."
-    for statement in t[3].statements:
-        handle_statement(t.parser, t.parser.rom, statement)
-    t[0] = t.parser.rom
+    t[0] = ('rom', t[3].statements)
 
 # Defines a macroop that jumps to an external label in the ROM
 def p_macroop_def_0(t):
     'macroop_def : DEF MACROOP ID LPAREN ID RPAREN SEMI'
-    if not t.parser.rom_macroop_type:
-        print_error("ROM based macroop found, but no ROM macroop class was specified.")
-        raise TypeError, "ROM based macroop found, but no ROM macroop class was specified."
-    macroop = t.parser.rom_macroop_type(t[3], t[5])
-    t.parser.macroops[t[3]] = macroop
-
+    t[0] = ('rom_macroop', t[3], t[5])
 
 # Defines a macroop that is combinationally generated
 def p_macroop_def_1(t):
     'macroop_def : DEF MACROOP ID block SEMI'
-    try:
-        curop = t.parser.macro_type(t[3])
-    except TypeError:
-        print_error("Error creating macroop object.")
-        raise
-    for statement in t[4].statements:
-        handle_statement(t.parser, curop, statement)
-    t.parser.macroops[t[3]] = curop
+    t[0] = ('macroop', t[3], t[4].statements)
 
 # A block of statements
 def p_block(t):
@@ -479,12 +522,46 @@ def p_error(t):
     else:
         error(0, "unknown syntax error", True)
 
+# The lexer and the parse tables only depend on this file, so they are
+# built once and every assembler gets its own copy of them.
+prototype_lexer = None
+parser_tables = None
+
+def build_parser():
+    global prototype_lexer, parser_tables
+    if prototype_lexer is None:
+        prototype_lexer = lex.lex()
+        parser = yacc.yacc(write_tables=0, debug=0)
+        parser_tables = {
+            'productions' : parser.productions,
+            'action'      : parser.action,
+            'goto'        : parser.goto,
+            'errorfunc'   : parser.errorfunc,
+            }
+    return prototype_lexer.clone(), \
+           new.instance(yacc.LRParser, dict(parser_tables))
+
+# Parsed microcode, keyed by the hash of its source.
+parsed_microcode = {}
+
+_parse_cache_version = None
+
+def parse_cache_version():
+    '''The cached definitions are only good for the grammar they were
+    parsed with, so they are tagged with the hash of this file.'''
+    global _parse_cache_version
+    if _parse_cache_version is None:
+        filename = os.path.splitext(__file__)[0] + '.py'
+        f = file(filename, 'rb')
+        _parse_cache_version = hashlib.sha1(f.read()).hexdigest()
+        f.close()
+    return _parse_cache_version
+
 class MicroAssembler(object):
 
     def __init__(self, macro_type, microops,
-            rom = None, rom_macroop_type = None):
-        self.lexer = lex.lex()
-        self.parser = yacc.yacc()
+            rom = None, rom_macroop_type = None, cache_dir = None):
+        self.lexer, self.parser = build_parser()
         self.parser.macro_type = macro_type
         self.parser.macroops = {}
         self.parser.microops = microops
@@ -492,9 +569,61 @@ class MicroAssembler(object):
         self.parser.rom_macroop_type = rom_macroop_type
         self.parser.symbols = {}
         self.symbols = self.parser.symbols
+        self.cache_dir = cache_dir
+
+    def parse(self, asm):
+        '''Parse asm into a list of definitions.  The result is kept in
+        memory and, if the assembler has a cache_dir, on disk, keyed by
+        the hash of the source.'''
+        key = hashlib.sha1(asm).hexdigest()
+        if key in parsed_microcode:
+            return parsed_microcode[key]
+
+        cache_file = None
+        definitions = None
+        if self.cache_dir:
+            cache_file = os.path.join(self.cache_dir,
+                                      'microcode-%s.pickle' % key)
+            definitions = self.loadCachedDefinitions(cache_file)
+
+        if definitions is None:
+            definitions = self.parser.parse(asm, lexer=self.lexer)
+            if cache_file:
+                self.storeCachedDefinitions(cache_file, definitions)
+
+        parsed_microcode[key] = definitions
+        return definitions
+
+    def loadCachedDefinitions(self, cache_file):
+        try:
+            f = file(cache_file, 'rb')
+        except IOError:
+            return None
+
+        try:
+            version, definitions = cPickle.load(f)
+        except (EnvironmentError, EOFError, cPickle.UnpicklingError,
+                AttributeError, ImportError, IndexError, ValueError):
+            return None
+        finally:
+            f.close()
+        if version != parse_cache_version():
+            return None
+        return definitions
+
+    def storeCachedDefinitions(self, cache_file, definitions):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Write atomically, several builds may share the cache
+        tmp_file = '%s.%d' % (cache_file, os.getpid())
+        f = file(tmp_file, 'wb')
+        cPickle.dump((parse_cache_version(), definitions), f, 2)
+        f.close()
+        os.rename(tmp_file, cache_file)
 
     def assemble(self, asm):
-        self.parser.parse(asm, lexer=self.lexer)
+        for definition in self.parse(asm):
+            definition_handlers[definition[0]](self.parser, *definition[1:])
         macroops = self.parser.macroops
         self.parser.macroops = {}
         return macroops
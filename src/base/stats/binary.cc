@@ -0,0 +1,523 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include "base/stats/binary.hh"
+
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <iostream>
+#include <sstream>
+
+#include "base/misc.hh"
+#include "base/output.hh"
+#include "base/stats/info.hh"
+
+using namespace std;
+
+namespace Stats {
+
+Binary::Binary()
+    : stream(NULL), naming(false)
+{
+}
+
+void
+Binary::open(std::ostream &_stream)
+{
+    if (stream)
+        panic("stream already set!");
+
+    stream = &_stream;
+    if (!valid())
+        fatal("Unable to open output stream for writing\n");
+
+    write("gem5stat", 8);
+    writeWord(version);
+    writeWord(0x01020304);
+}
+
+bool
+Binary::valid() const
+{
+    return stream != NULL && stream->good();
+}
+
+void
+Binary::write(const void *data, size_t size)
+{
+    stream->write((const char *)data, size);
+}
+
+void
+Binary::writeWord(uint32_t word)
+{
+    write(&word, sizeof(word));
+}
+
+void
+Binary::writeString(const string &str)
+{
+    writeWord(str.size());
+    write(str.data(), str.size());
+}
+
+void
+Binary::writeTable()
+{
+    size_t size = 8;
+    writeWord('T');
+    writeWord(names.size());
+    for (off_type i = 0; i < names.size(); ++i) {
+        writeString(names[i]);
+        writeString(descs[i]);
+        size += 8 + names[i].size() + descs[i].size();
+    }
+
+    static const char padding[8] = { 0 };
+    if (size % 8)
+        write(padding, 8 - size % 8);
+}
+
+void
+Binary::begin()
+{
+    values.clear();
+    newShape.clear();
+    newNames.clear();
+    newDescs.clear();
+    naming = false;
+}
+
+void
+Binary::end()
+{
+    if (naming || newShape.size() != shape.size()) {
+        // If the only change is that there are fewer stats than in
+        // the last dump, the remaining columns are a prefix of the
+        // last table.
+        if (!naming) {
+            newNames.assign(names.begin(), names.begin() + values.size());
+            newDescs.assign(descs.begin(), descs.begin() + values.size());
+        }
+        names.swap(newNames);
+        descs.swap(newDescs);
+        writeTable();
+    }
+    shape.swap(newShape);
+
+    writeWord('D');
+    writeWord(values.size());
+    if (!values.empty())
+        write(&values[0], values.size() * sizeof(double));
+    stream->flush();
+}
+
+bool
+Binary::noOutput(const Info &info)
+{
+    return !info.flags.isSet(display);
+}
+
+void
+Binary::checkShape(size_t pos, size_t start)
+{
+    if (naming)
+        return;
+
+    if (newShape.size() > shape.size() ||
+        !std::equal(newShape.begin() + pos, newShape.end(),
+                    shape.begin() + pos)) {
+        // Everything visited before this stat matched the last
+        // table, so its names can be reused.
+        naming = true;
+        newNames.assign(names.begin(), names.begin() + start);
+        newDescs.assign(descs.begin(), descs.begin() + start);
+    }
+}
+
+void
+Binary::column(const string &name, const string &desc)
+{
+    newNames.push_back(name);
+    newDescs.push_back(desc);
+}
+
+void
+Binary::visit(const ScalarInfo &info)
+{
+    if (noOutput(info))
+        return;
+
+    size_t start = values.size();
+    size_t pos = newShape.size();
+    values.push_back(info.result());
+    newShape.push_back(info.id);
+    newShape.push_back(1);
+    checkShape(pos, start);
+
+    if (naming)
+        column(info.name, info.desc);
+}
+
+void
+Binary::vectorColumns(const string &name, const string &desc,
+                      const VResult &vec, Result total,
+                      const vector<string> *subnames,
+                      const vector<string> *subdescs,
+                      bool total_flag, bool forceSubnames, bool names)
+{
+    size_type size = vec.size();
+    string base = names ? name + Info::separatorString : string();
+
+    if (size == 1) {
+        if (!names)
+            values.push_back(vec[0]);
+        else if (forceSubnames)
+            column(base + (subnames ? (*subnames)[0] : "0"), desc);
+        else
+            column(name, desc);
+        return;
+    }
+
+    for (off_type i = 0; i < size; ++i) {
+        if (subnames && (i >= subnames->size() || (*subnames)[i].empty()))
+            continue;
+
+        if (!names) {
+            values.push_back(vec[i]);
+        } else {
+            column(base + (subnames ? (*subnames)[i] : std::to_string(i)),
+                   subdescs ? (*subdescs)[i] : desc);
+        }
+    }
+
+    if (total_flag) {
+        if (!names)
+            values.push_back(total);
+        else
+            column(base + "total", desc);
+    }
+}
+
+void
+Binary::visit(const VectorInfo &info)
+{
+    if (noOutput(info))
+        return;
+
+    size_type size = info.size();
+    const vector<string> *subnames = NULL;
+    const vector<string> *subdescs = NULL;
+    vector<string> sized_subnames, sized_subdescs;
+
+    // Use the same sub names and descriptions as the text output
+    for (off_type i = 0; i < info.subnames.size(); ++i) {
+        if (!info.subnames[i].empty()) {
+            sized_subnames = info.subnames;
+            sized_subnames.resize(size);
+            subnames = &sized_subnames;
+            break;
+        }
+    }
+    for (off_type i = 0; subnames && i < size; ++i) {
+        if (!sized_subnames[i].empty() && i < info.subdescs.size() &&
+            !info.subdescs[i].empty()) {
+            sized_subdescs = info.subdescs;
+            sized_subdescs.resize(size);
+            subdescs = &sized_subdescs;
+            break;
+        }
+    }
+
+    size_t start = values.size();
+    size_t pos = newShape.size();
+    bool total_flag = info.flags.isSet(::Stats::total);
+    vectorColumns(info.name, info.desc, info.result(), info.total(),
+                  subnames, subdescs, total_flag, false, false);
+    newShape.push_back(info.id);
+    newShape.push_back(values.size() - start);
+    checkShape(pos, start);
+
+    if (naming) {
+        vectorColumns(info.name, info.desc, info.result(), info.total(),
+                      subnames, subdescs, total_flag, false, true);
+    }
+}
+
+void
+Binary::vector2dColumns(const Vector2dInfo &info, bool names)
+{
+    const vector<string> *y_subnames = NULL;
+    for (off_type i = 0; i < info.y_subnames.size(); ++i) {
+        if (!info.y_subnames[i].empty()) {
+            y_subnames = &info.y_subnames;
+            break;
+        }
+    }
+
+    bool havesub = false;
+    for (off_type i = 0; i < info.subnames.size() && i < info.x; ++i)
+        if (!info.subnames[i].empty())
+            havesub = true;
+
+    bool total_flag = info.flags.isSet(::Stats::total);
+    VResult yvec(info.y);
+    for (off_type i = 0; i < info.x; ++i) {
+        if (havesub && (i >= info.subnames.size() || info.subnames[i].empty()))
+            continue;
+
+        Result total = 0.0;
+        if (!names) {
+            off_type iy = i * info.y;
+            for (off_type j = 0; j < info.y; ++j) {
+                yvec[j] = info.cvec[iy + j];
+                total += yvec[j];
+            }
+        }
+
+        string name = names ? info.name + "_" +
+            (havesub ? info.subnames[i] : std::to_string(i)) : "";
+        vectorColumns(name, info.desc, yvec, total, y_subnames, NULL,
+                      total_flag, true, names);
+    }
+
+    if (total_flag && info.x > 1) {
+        static const vector<string> total_subname(1, "total");
+        vectorColumns(info.name, info.desc, VResult(1, info.total()), 0.0,
+                      &total_subname, NULL, false, true, names);
+    }
+}
+
+void
+Binary::visit(const Vector2dInfo &info)
+{
+    if (noOutput(info))
+        return;
+
+    size_t start = values.size();
+    size_t pos = newShape.size();
+    vector2dColumns(info, false);
+    newShape.push_back(info.id);
+    newShape.push_back(values.size() - start);
+    checkShape(pos, start);
+
+    if (naming)
+        vector2dColumns(info, true);
+}
+
+void
+Binary::distColumns(const string &name, const string &desc,
+                    const Info &info, const DistData &data, bool names)
+{
+    string base = names ? name + Info::separatorString : string();
+
+#define COLUMN(n, v) do {                       \
+        if (names)                              \
+            column(base + (n), desc);           \
+        else                                    \
+            values.push_back(v);                \
+    } while (0)
+
+    if (info.flags.isSet(oneline)) {
+        COLUMN("bucket_size", data.bucket_size);
+        COLUMN("min_bucket", data.min);
+        COLUMN("max_bucket", data.max);
+    }
+
+    COLUMN("samples", data.samples);
+    COLUMN("mean", data.samples ? data.sum / data.samples : NAN);
+
+    if (data.type == Hist)
+        COLUMN("gmean", data.samples ? exp(data.logs / data.samples) : NAN);
+
+    Result stdev = NAN;
+    if (data.samples)
+        stdev = sqrt((data.samples * data.squares - data.sum * data.sum) /
+                     (data.samples * (data.samples - 1.0)));
+    COLUMN("stdev", stdev);
+
+    if (data.type == Deviation)
+        return;
+
+    size_t size = data.cvec.size();
+
+    Result total = 0.0;
+    if (data.type == Dist)
+        total += data.underflow;
+    for (off_type i = 0; i < size; ++i)
+        total += data.cvec[i];
+    if (data.type == Dist)
+        total += data.overflow;
+
+    if (data.type == Dist)
+        COLUMN("underflows", data.underflow);
+
+    for (off_type i = 0; i < size; ++i) {
+        if (names) {
+            stringstream namestr;
+            Counter low = i * data.bucket_size + data.min;
+            Counter high = ::min(low + data.bucket_size - 1.0, data.max);
+            namestr << low;
+            if (low < high)
+                namestr << "-" << high;
+            column(base + namestr.str(), desc);
+        } else {
+            values.push_back(data.cvec[i]);
+        }
+    }
+
+    if (data.type == Dist) {
+        COLUMN("overflows", data.overflow);
+        COLUMN("min_value", data.min_val);
+        COLUMN("max_value", data.max_val);
+    }
+
+    COLUMN("total", total);
+
+#undef COLUMN
+}
+
+void
+Binary::addDistShape(const DistData &data)
+{
+    // Histograms rescale their buckets as samples grow, which changes
+    // the bucket names but not the number of columns
+    newShape.push_back(data.bucket_size);
+    newShape.push_back(data.min);
+    newShape.push_back(data.max);
+}
+
+void
+Binary::visit(const DistInfo &info)
+{
+    if (noOutput(info))
+        return;
+
+    size_t start = values.size();
+    size_t pos = newShape.size();
+    distColumns(info.name, info.desc, info, info.data, false);
+    newShape.push_back(info.id);
+    newShape.push_back(values.size() - start);
+    addDistShape(info.data);
+    checkShape(pos, start);
+
+    if (naming)
+        distColumns(info.name, info.desc, info, info.data, true);
+}
+
+void
+Binary::visit(const VectorDistInfo &info)
+{
+    if (noOutput(info))
+        return;
+
+    size_t start = values.size();
+    size_t pos = newShape.size();
+    for (off_type i = 0; i < info.size(); ++i)
+        distColumns("", info.desc, info, info.data[i], false);
+    newShape.push_back(info.id);
+    newShape.push_back(values.size() - start);
+    for (off_type i = 0; i < info.size(); ++i)
+        addDistShape(info.data[i]);
+    checkShape(pos, start);
+
+    if (!naming)
+        return;
+
+    for (off_type i = 0; i < info.size(); ++i) {
+        string name = info.name + "_" +
+            (info.subnames[i].empty() ? std::to_string(i) : info.subnames[i]);
+        const string &desc =
+            info.subdescs[i].empty() ? info.desc : info.subdescs[i];
+        distColumns(name, desc, info, info.data[i], true);
+    }
+}
+
+void
+Binary::visit(const FormulaInfo &info)
+{
+    visit((const VectorInfo &)info);
+}
+
+void
+Binary::sparseHistColumns(const SparseHistInfo &info, bool names)
+{
+    string base = names ? info.name + Info::separatorString : string();
+
+    if (names)
+        column(base + "samples", info.desc);
+    else
+        values.push_back(info.data.samples);
+
+    MCounter::const_iterator it;
+    for (it = info.data.cmap.begin(); it != info.data.cmap.end(); it++) {
+        if (names) {
+            stringstream namestr;
+            namestr << base << (*it).first;
+            column(namestr.str(), info.desc);
+        } else {
+            values.push_back((*it).second);
+        }
+    }
+}
+
+void
+Binary::visit(const SparseHistInfo &info)
+{
+    if (noOutput(info))
+        return;
+
+    size_t start = values.size();
+    size_t pos = newShape.size();
+    sparseHistColumns(info, false);
+    newShape.push_back(info.id);
+    newShape.push_back(values.size() - start);
+    // The columns of a sparse histogram depend on which keys have
+    // been sampled
+    MCounter::const_iterator it;
+    for (it = info.data.cmap.begin(); it != info.data.cmap.end(); it++)
+        newShape.push_back((*it).first);
+    checkShape(pos, start);
+
+    if (naming)
+        sparseHistColumns(info, true);
+}
+
+Output *
+initBinary(const string &filename)
+{
+    static Binary binary;
+    static bool connected = false;
+
+    if (!connected) {
+        binary.open(*simout.findOrCreate(filename, true)->stream());
+        connected = true;
+    }
+
+    return &binary;
+}
+
+} // namespace Stats
@@ -0,0 +1,143 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#ifndef __BASE_STATS_BINARY_HH__
+#define __BASE_STATS_BINARY_HH__
+
+#include <iosfwd>
+#include <string>
+#include <vector>
+
+#include "base/stats/output.hh"
+#include "base/stats/types.hh"
+
+namespace Stats {
+
+struct DistData;
+
+/**
+ * Stat output that writes stat dumps as packed arrays of doubles.
+ *
+ * Every stat is expanded into one or more columns named the same way
+ * as the corresponding lines in stats.txt (e.g., vector elements
+ * become "name::element"). The table of column names and
+ * descriptions is written once and each dump is written as a record
+ * containing the value of every column. A new table is only written
+ * if the columns change between dumps, which happens for sparse
+ * histograms and for histograms that rescale their buckets.
+ *
+ * Unlike the text output, stats are not filtered by their prereq or
+ * the nozero/nonan flags, since that would change the set of columns
+ * from one dump to the next.
+ *
+ * File layout (host byte order, all records aligned to 8 bytes):
+ *   header: char magic[8] = "gem5stat", uint32_t version,
+ *           uint32_t byte order mark (0x01020304)
+ *   table:  uint32_t 'T', uint32_t columns,
+ *           columns x (uint32_t len, name, uint32_t len, desc),
+ *           padding
+ *   dump:   uint32_t 'D', uint32_t columns, columns x double
+ */
+class Binary : public Output
+{
+  public:
+    static const uint32_t version = 1;
+
+  protected:
+    std::ostream *stream;
+
+    /** Column names and descriptions of the last table written */
+    std::vector<std::string> names;
+    std::vector<std::string> descs;
+
+    /**
+     * Shape of the stats visited in the last dump. Every stat adds
+     * its id and number of columns. Distributions also add their
+     * bucket size and range, and sparse histograms add their keys.
+     */
+    std::vector<double> shape;
+
+    /** Values, names and shape of the current dump */
+    std::vector<double> values;
+    std::vector<std::string> newNames;
+    std::vector<std::string> newDescs;
+    std::vector<double> newShape;
+
+    /**
+     * Set when the current dump doesn't match the last table. From
+     * then on, names are generated for all visited stats.
+     */
+    bool naming;
+
+    bool noOutput(const Info &info);
+    void checkShape(size_t pos, size_t start);
+    void column(const std::string &name, const std::string &desc);
+
+    /**
+     * Helpers that add the columns of a stat. They are called twice
+     * if names are needed: once to add the values and once (with
+     * names set) to add the names and descriptions of the columns.
+     */
+    void vectorColumns(const std::string &name, const std::string &desc,
+                       const VResult &vec, Result total,
+                       const std::vector<std::string> *subnames,
+                       const std::vector<std::string> *subdescs,
+                       bool total_flag, bool forceSubnames, bool names);
+    void vector2dColumns(const Vector2dInfo &info, bool names);
+    void addDistShape(const DistData &data);
+    void distColumns(const std::string &name, const std::string &desc,
+                     const Info &info, const DistData &data, bool names);
+    void sparseHistColumns(const SparseHistInfo &info, bool names);
+
+    void write(const void *data, size_t size);
+    void writeWord(uint32_t word);
+    void writeString(const std::string &str);
+    void writeTable();
+
+  public:
+    Binary();
+
+    void open(std::ostream &stream);
+
+    // Implement Visit
+    virtual void visit(const ScalarInfo &info);
+    virtual void visit(const VectorInfo &info);
+    virtual void visit(const DistInfo &info);
+    virtual void visit(const VectorDistInfo &info);
+    virtual void visit(const Vector2dInfo &info);
+    virtual void visit(const FormulaInfo &info);
+    virtual void visit(const SparseHistInfo &info);
+
+    // Implement Output
+    virtual bool valid() const;
+    virtual void begin();
+    virtual void end();
+};
+
+Output *initBinary(const std::string &filename);
+
+} // namespace Stats
+
+#endif // __BASE_STATS_BINARY_HH__
@@ -0,0 +1,144 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include "base/stats/change_filter.hh"
+
+#include <cstring>
+
+#include "base/stats/info.hh"
+
+using namespace std;
+
+namespace Stats {
+
+ChangeFilter::ChangeFilter(Output &_output)
+    : output(_output)
+{
+}
+
+bool
+ChangeFilter::changed(const Info &info)
+{
+    vector<double> &values = last[info.id];
+    // NaN values never compare equal, compare their bits instead
+    if (values.size() == current.size() && !current.empty() &&
+        memcmp(&values[0], &current[0],
+               current.size() * sizeof(double)) == 0) {
+        return false;
+    }
+
+    values.swap(current);
+    return true;
+}
+
+void
+ChangeFilter::addDist(const DistData &data)
+{
+    current.push_back(data.samples);
+    current.push_back(data.sum);
+    current.push_back(data.squares);
+    current.push_back(data.logs);
+    current.push_back(data.min_val);
+    current.push_back(data.max_val);
+    current.push_back(data.underflow);
+    current.push_back(data.overflow);
+    current.insert(current.end(), data.cvec.begin(), data.cvec.end());
+}
+
+void
+ChangeFilter::visit(const ScalarInfo &info)
+{
+    current.clear();
+    current.push_back(info.result());
+    if (changed(info))
+        output.visit(info);
+}
+
+void
+ChangeFilter::visit(const VectorInfo &info)
+{
+    const VResult &result = info.result();
+    current.assign(result.begin(), result.end());
+    if (changed(info))
+        output.visit(info);
+}
+
+void
+ChangeFilter::visit(const DistInfo &info)
+{
+    current.clear();
+    addDist(info.data);
+    if (changed(info))
+        output.visit(info);
+}
+
+void
+ChangeFilter::visit(const VectorDistInfo &info)
+{
+    current.clear();
+    for (off_type i = 0; i < info.data.size(); ++i)
+        addDist(info.data[i]);
+    if (changed(info))
+        output.visit(info);
+}
+
+void
+ChangeFilter::visit(const Vector2dInfo &info)
+{
+    current.assign(info.cvec.begin(), info.cvec.end());
+    if (changed(info))
+        output.visit(info);
+}
+
+void
+ChangeFilter::visit(const FormulaInfo &info)
+{
+    const VResult &result = info.result();
+    current.assign(result.begin(), result.end());
+    if (changed(info))
+        output.visit(info);
+}
+
+void
+ChangeFilter::visit(const SparseHistInfo &info)
+{
+    current.clear();
+    current.push_back(info.data.samples);
+    MCounter::const_iterator it;
+    for (it = info.data.cmap.begin(); it != info.data.cmap.end(); it++) {
+        current.push_back((*it).first);
+        current.push_back((*it).second);
+    }
+    if (changed(info))
+        output.visit(info);
+}
+
+Output *
+initChangeFilter(Output *output)
+{
+    return new ChangeFilter(*output);
+}
+
+} // namespace Stats
@@ -0,0 +1,81 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#ifndef __BASE_STATS_CHANGE_FILTER_HH__
+#define __BASE_STATS_CHANGE_FILTER_HH__
+
+#include <unordered_map>
+#include <vector>
+
+#include "base/stats/output.hh"
+#include "base/stats/types.hh"
+
+namespace Stats {
+
+struct DistData;
+
+/**
+ * Output wrapper that only forwards stats whose values have changed
+ * since the last dump they were output in. Stats are always output
+ * the first time they are visited.
+ */
+class ChangeFilter : public Output
+{
+  protected:
+    Output &output;
+
+    /** Values of each stat (by id) when it was last output */
+    std::unordered_map<int, std::vector<double> > last;
+
+    /** Values of the stat currently being visited */
+    std::vector<double> current;
+
+    void addDist(const DistData &data);
+    bool changed(const Info &info);
+
+  public:
+    ChangeFilter(Output &output);
+
+    // Implement Visit
+    virtual void visit(const ScalarInfo &info);
+    virtual void visit(const VectorInfo &info);
+    virtual void visit(const DistInfo &info);
+    virtual void visit(const VectorDistInfo &info);
+    virtual void visit(const Vector2dInfo &info);
+    virtual void visit(const FormulaInfo &info);
+    virtual void visit(const SparseHistInfo &info);
+
+    // Implement Output
+    virtual bool valid() const { return output.valid(); }
+    virtual void begin() { output.begin(); }
+    virtual void end() { output.end(); }
+};
+
+/** Wrap an output to only output stats that have changed */
+Output *initChangeFilter(Output *output);
+
+} // namespace Stats
+
+#endif // __BASE_STATS_CHANGE_FILTER_HH__
@@ -35,6 +35,21 @@ class AST(PairContainer):
         if pairs:
             self.pairs.update(getattr(pairs, "pairs", pairs))
 
+    # The parser is not pickled with the AST.  ASTs loaded from the
+    # parse cache are attached to the parser that loads them, see
+    # SLICC.parse_file().
+    unpickling_slicc = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['slicc']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.slicc = AST.unpickling_slicc
+        self.location.no_warning = not self.slicc.verbose
+
     @property
     def symtab(self):
         return self.slicc.symtab
@@ -64,6 +64,10 @@ def main(args=None):
                       help="print traceback on error")
     parser.add_option("-q", "--quiet",
                       help="don't print messages")
+    parser.add_option("--cache-dir",
+                      help="Directory for cached parse tables and ASTs")
+    parser.add_option("-j", "--jobs", type="int", default=1,
+                      help="Number of processes writing generated files")
     opts,files = parser.parse_args(args=args)
 
     if len(files) != 1:
@@ -75,7 +79,9 @@ def main(args=None):
     output("SLICC v0.4")
     output("Parsing...")
 
-    slicc = SLICC(files[0], verbose=True, debug=opts.debug, traceback=opts.tb)
+    slicc = SLICC(files[0], os.path.dirname(files[0]), verbose=True,
+                  debug=opts.debug, traceback=opts.tb,
+                  cache_dir=opts.cache_dir, jobs=opts.jobs)
 
     if opts.print_files:
         for i in sorted(slicc.files()):
@@ -85,7 +91,7 @@ def main(args=None):
         slicc.process()
 
         output("Writing C++ files...")
-        slicc.writeCodeFiles(opts.code_path)
+        slicc.writeCodeFiles(opts.code_path, [])
 
         if opts.html_path:
             output("Writing HTML files...")
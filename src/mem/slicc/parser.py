@@ -26,6 +26,8 @@
 #
 # Authors: Nathan Binkert
 
+import cPickle
+import hashlib
 import os.path
 import re
 import sys
@@ -37,13 +39,49 @@ import slicc.ast as ast
 import slicc.util as util
 from slicc.symbols import SymbolTable
 
+def file_hash(filename):
+    f = file(filename, 'rb')
+    digest = hashlib.sha1(f.read()).hexdigest()
+    f.close()
+    return digest
+
+# Version of the parsed-AST cache, derived from the sources of the
+# parser and the AST classes so that changing either invalidates it.
+_ast_cache_version = None
+
+def ast_cache_version():
+    global _ast_cache_version
+    if _ast_cache_version is None:
+        slicc_dir = os.path.dirname(os.path.abspath(__file__))
+        ast_dir = os.path.join(slicc_dir, 'ast')
+        sources = [ os.path.join(slicc_dir, 'parser.py'),
+                    os.path.join(slicc_dir, 'util.py') ] + \
+                  [ os.path.join(ast_dir, f) for f in
+                    sorted(os.listdir(ast_dir)) if f.endswith('.py') ]
+        digest = hashlib.sha1()
+        for source in sources:
+            digest.update(file_hash(source))
+        _ast_cache_version = digest.hexdigest()
+    return _ast_cache_version
+
 class SLICC(Grammar):
-    def __init__(self, filename, base_dir, verbose=False, traceback=False, **kwargs):
+    def __init__(self, filename, base_dir, verbose=False, traceback=False,
+                 cache_dir=None, jobs=1, **kwargs):
         self.protocol = None
         self.traceback = traceback
         self.verbose = verbose
         self.symtab = SymbolTable(self)
         self.base_dir = base_dir
+        # Parse tables and the ASTs of parsed files are cached in
+        # cache_dir, if given
+        self.cache_dir = cache_dir
+        # (filename, hash) of the files read by the current parse
+        self.parse_deps = []
+        # Number of processes writing the generated files
+        self.jobs = jobs
+
+        if cache_dir:
+            self.setupTableCache(cache_dir, 'slicc_parsetab')
 
         try:
             self.decl_list = self.parse_file(filename, **kwargs)
@@ -52,6 +90,75 @@ class SLICC(Grammar):
                 sys.exit(str(e))
             raise
 
+    def parse_file(self, filename, **kwargs):
+        """Parse a file, or load its AST from the cache if neither the
+        file nor any file it includes changed since it was cached"""
+        if not self.cache_dir:
+            return Grammar.parse_file(self, filename, **kwargs)
+
+        cache_file = os.path.join(self.cache_dir, 'ast-%s.pickle' %
+            hashlib.sha1(os.path.abspath(filename)).hexdigest())
+        entry = self.loadCachedAST(cache_file)
+        if entry is not None:
+            deps, protocol, decl_list = entry
+            if protocol:
+                if self.protocol:
+                    raise ParseError("Protocol can only be set once! "
+                                     "Error in %s\n" % filename)
+                self.protocol = protocol
+            self.parse_deps.extend(deps)
+            return decl_list
+
+        outer_deps = self.parse_deps
+        self.parse_deps = [ (filename, file_hash(filename)) ]
+        protocol = self.protocol
+        try:
+            decl_list = Grammar.parse_file(self, filename, **kwargs)
+            deps = self.parse_deps
+        finally:
+            outer_deps.extend(self.parse_deps)
+            self.parse_deps = outer_deps
+
+        if self.protocol != protocol:
+            protocol = self.protocol
+        else:
+            protocol = None
+        self.storeCachedAST(cache_file, (deps, protocol, decl_list))
+        return decl_list
+
+    def loadCachedAST(self, cache_file):
+        try:
+            f = file(cache_file, 'rb')
+        except IOError:
+            return None
+
+        ast.AST.unpickling_slicc = self
+        try:
+            version, deps = cPickle.load(f)
+            if version != ast_cache_version():
+                return None
+            for filename, digest in deps:
+                if file_hash(filename) != digest:
+                    return None
+            protocol, decl_list = cPickle.load(f)
+        except (EnvironmentError, EOFError, cPickle.UnpicklingError,
+                AttributeError, ImportError, IndexError, ValueError):
+            return None
+        finally:
+            ast.AST.unpickling_slicc = None
+            f.close()
+        return deps, protocol, decl_list
+
+    def storeCachedAST(self, cache_file, entry):
+        deps, protocol, decl_list = entry
+        # Write atomically, builds of other protocols may share the cache
+        tmp_file = '%s.%d' % (cache_file, os.getpid())
+        f = file(tmp_file, 'wb')
+        cPickle.dump((ast_cache_version(), deps), f, 2)
+        cPickle.dump((protocol, decl_list), f, 2)
+        f.close()
+        os.rename(tmp_file, cache_file)
+
     def currentLocation(self):
         return util.Location(self.current_source, self.current_line,
                              no_warning=not self.verbose)
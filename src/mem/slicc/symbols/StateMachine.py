@@ -1424,13 +1424,23 @@ if (!checkResourceAvailable(%s_RequestType_%s, addr)) {
         return str(code)
 
     def writeHTMLFiles(self, path):
+        for func, args in self.htmlWriteCalls(path):
+            func(*args)
+
+    def htmlWriteCalls(self, path):
+        """Return the independent (function, args) calls that write the
+        HTML files of this machine, see SymbolTable.writeHTMLFiles()"""
         # Create table with no row hilighted
-        self.printHTMLTransitions(path, None)
+        calls = [ (self.printHTMLTransitions, (path, None)) ]
 
         # Generate transition tables
         for state in self.states.itervalues():
-            self.printHTMLTransitions(path, state)
+            calls.append((self.printHTMLTransitions, (path, state)))
+
+        calls.append((self.printHTMLDescriptions, (path, )))
+        return calls
 
+    def printHTMLDescriptions(self, path):
         # Generate action descriptions
         for action in self.actions.itervalues():
             name = "%s_action_%s.html" % (self.ident, action.ident)
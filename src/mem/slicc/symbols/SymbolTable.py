@@ -32,6 +32,35 @@ from slicc.symbols.StateMachine import StateMachine
 from slicc.symbols.Type import Type
 from slicc.util import Location
 
+# Calls run by the processes of a write pool.  Set before the pool is
+# created, so that the forked workers inherit them.
+_write_calls = []
+
+def _run_write_call(index):
+    func, args = _write_calls[index]
+    func(*args)
+
+def runWriteCalls(calls, jobs):
+    """Run a list of (function, args) calls that write independent
+    files, in a pool of jobs forked processes if jobs > 1.  Only the
+    standalone slicc command (-j) uses a pool, the build runs SLICC
+    with jobs=1 since it must not fork SCons."""
+    global _write_calls
+    if jobs <= 1 or len(calls) <= 1:
+        for func, args in calls:
+            func(*args)
+        return
+
+    import multiprocessing
+    _write_calls = calls
+    pool = multiprocessing.Pool(min(jobs, len(calls)))
+    try:
+        pool.map(_run_write_call, range(len(calls)), 1)
+    finally:
+        pool.close()
+        pool.join()
+        _write_calls = []
+
 class SymbolTable(object):
     def __init__(self, slicc):
         self.slicc = slicc
@@ -137,8 +166,16 @@ class SymbolTable(object):
 
         code.write(path, "Types.hh")
 
+        # The state machines are by far the most expensive to generate,
+        # and are independent of each other, so they are written in
+        # parallel once everything else is done
+        machines = []
         for symbol in self.sym_vec:
-            symbol.writeCodeFiles(path, includes)
+            if isinstance(symbol, StateMachine):
+                machines.append((symbol.writeCodeFiles, (path, includes)))
+            else:
+                symbol.writeCodeFiles(path, includes)
+        runWriteCalls(machines, self.slicc.jobs)
 
     def writeHTMLFiles(self, path):
         makeDir(path)
@@ -167,7 +204,14 @@ class SymbolTable(object):
         code("<HTML></HTML>")
         code.write(path, "empty.html")
 
+        # Each transition table is independent, so they are written in
+        # parallel
+        calls = []
         for symbol in self.sym_vec:
-            symbol.writeHTMLFiles(path)
+            if isinstance(symbol, StateMachine):
+                calls += symbol.htmlWriteCalls(path)
+            else:
+                symbol.writeHTMLFiles(path)
+        runWriteCalls(calls, self.slicc.jobs)
 
 __all__ = [ "SymbolTable" ]
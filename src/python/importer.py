@@ -29,9 +29,25 @@
 # Simple importer that allows python to import data from a dict of
 # code objects.  The keys are the module path, and the items are the
 # filename and bytecode of the file.
+#
+# If the environment variable M5_OVERRIDE_PY_SOURCE is set, modules
+# are loaded from their source files instead of the embedded bytecode.
+# The compiled code is cached on disk (in M5_PY_CACHE_DIR, or
+# ~/.cache/gem5/pycache if unset; set it to an empty string to disable
+# the cache) so that only modified sources are recompiled.  The cache
+# directory is created private to the user and is not used if anyone
+# else can write to it.
+#
+# The importer also records how long each module took to load; see
+# report().
 class CodeImporter(object):
     def __init__(self):
         self.modules = {}
+        # fullname -> (total seconds, seconds excluding nested imports)
+        self.load_times = {}
+        self._loading = []
+        # Bytecode cache directory, False until it has been looked up
+        self._cache_dir = False
 
     def add_module(self, filename, abspath, modpath, code):
         if modpath in self.modules:
@@ -45,6 +61,119 @@ class CodeImporter(object):
 
         return None
 
+    # Return the bytecode cache directory, creating it if needed, or
+    # None if the cache is disabled.  Anyone who can write to the
+    # directory can make gem5 run arbitrary code, so the cache is also
+    # ignored unless the directory belongs to the current user and is
+    # not writable by anyone else.  The directory is only checked on
+    # first use.
+    def cache_dir(self):
+        if self._cache_dir is not False:
+            return self._cache_dir
+
+        import os
+        import stat
+
+        self._cache_dir = None
+        cache_dir = os.environ.get('M5_PY_CACHE_DIR')
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'gem5', 'pycache')
+        if not cache_dir:
+            return None
+
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, 0700)
+        except OSError:
+            # Possibly created by a concurrent gem5 process
+            pass
+
+        try:
+            st = os.stat(cache_dir)
+        except OSError:
+            return None
+
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or \
+               st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return None
+
+        self._cache_dir = cache_dir
+        return cache_dir
+
+    def cache_path(self, abspath):
+        import hashlib
+        import os
+
+        cache_dir = self.cache_dir()
+        if not cache_dir:
+            return None
+
+        return os.path.join(cache_dir,
+                            hashlib.sha1(abspath).hexdigest() + '.m5c')
+
+    # Compile the source file abspath, reusing the cached code object
+    # if the source has not changed.  The cache entry is considered
+    # valid if the mtime and size of the source match; if they don't,
+    # the hash of the source is compared before recompiling so that a
+    # simple touch or checkout doesn't force recompilation.  Returns
+    # None if the source file doesn't exist.
+    def compile_source(self, abspath):
+        import hashlib
+        import imp
+        import marshal
+        import os
+
+        try:
+            st = os.stat(abspath)
+        except OSError:
+            return None
+
+        magic = imp.get_magic()
+        cache = self.cache_path(abspath)
+
+        header = None
+        code = None
+        if cache:
+            try:
+                f = file(cache, 'rb')
+                try:
+                    header = marshal.load(f)
+                    if header[0] == magic:
+                        code = marshal.load(f)
+                finally:
+                    f.close()
+            except (IOError, OSError, EOFError, ValueError, TypeError,
+                    IndexError):
+                header = None
+                code = None
+
+        if code is not None and header[1:3] == (st.st_mtime, st.st_size):
+            return code
+
+        src = file(abspath, 'r').read()
+        digest = hashlib.sha1(src).hexdigest()
+        if code is None or header[3] != digest:
+            code = compile(src, abspath, 'exec')
+
+        if cache:
+            # Write to a temporary file and rename it into place so
+            # that concurrent gem5 processes never see a partial entry
+            tmp = '%s.%d.tmp' % (cache, os.getpid())
+            try:
+                f = file(tmp, 'wb')
+                try:
+                    marshal.dump((magic, st.st_mtime, st.st_size, digest), f)
+                    marshal.dump(code, f)
+                finally:
+                    f.close()
+                os.rename(tmp, cache)
+            except (IOError, OSError):
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+        return code
+
     def load_module(self, fullname):
         # Because the importer is created and initialized in its own
         # little sandbox (in init.cc), the globals that were available
@@ -54,6 +183,7 @@ class CodeImporter(object):
         import imp
         import os
         import sys
+        import time
 
         try:
             mod = sys.modules[fullname]
@@ -61,14 +191,17 @@ class CodeImporter(object):
             mod = imp.new_module(fullname)
             sys.modules[fullname] = mod
 
+        start = time.time()
+        self._loading.append(0.0)
         try:
             mod.__loader__ = self
             srcfile,abspath,code = self.modules[fullname]
 
             override = os.environ.get('M5_OVERRIDE_PY_SOURCE', 'false').lower()
-            if override in ('true', 'yes') and  os.path.exists(abspath):
-                src = file(abspath, 'r').read()
-                code = compile(src, abspath, 'exec')
+            if override in ('true', 'yes'):
+                source_code = self.compile_source(abspath)
+                if source_code is not None:
+                    code = source_code
 
             if os.path.basename(srcfile) == '__init__.py':
                 mod.__path__ = fullname.split('.')
@@ -81,8 +214,34 @@ class CodeImporter(object):
         except Exception:
             del sys.modules[fullname]
             raise
+        finally:
+            elapsed = time.time() - start
+            nested = self._loading.pop()
+            if self._loading:
+                self._loading[-1] += elapsed
+            self.load_times[fullname] = (elapsed, elapsed - nested)
+
+        # A module may replace itself in sys.modules (see m5.objects),
+        # so return whatever is registered there.
+        return sys.modules[fullname]
+
+    # Print the time spent loading modules, with the modules that took
+    # the longest to load by themselves first.
+    def report(self, stream=None, count=20):
+        import sys
+
+        if stream is None:
+            stream = sys.stdout
 
-        return mod
+        times = sorted(self.load_times.iteritems(),
+                       key=lambda item: item[1][1], reverse=True)
+        total = sum(own for name, (cumulative, own) in times)
+        print >>stream, "Python import timing (%d modules, %.3fs):" % \
+              (len(times), total)
+        print >>stream, "    %-40s %9s %9s" % ("module", "self", "total")
+        for name, (cumulative, own) in times[:count]:
+            print >>stream, "    %-40s %8.3fs %8.3fs" % \
+                  (name, own, cumulative)
 
 # Create an importer and add it to the meta_path so future imports can
 # use it.  There's currently nothing in the importer, but calls to
@@ -55,7 +55,7 @@ from m5.params import *
 # There are a few things we need that aren't in params.__all__ since
 # normal users don't need them
 from m5.params import ParamDesc, VectorParamDesc, \
-     isNullPointer, SimObjectVector, Port
+     isNullPointer, SimObjectVector, Port, PortRef
 
 from m5.proxy import *
 from m5.proxy import isproxy
@@ -103,12 +103,48 @@ from m5.proxy import isproxy
 # list of all SimObject classes
 allClasses = {}
 
+# Function used to import the module defining a SimObject class that
+# has not been loaded yet.  Set by m5.objects when SimObject modules
+# are loaded lazily (see M5_LAZY_OBJECTS).
+lazyClassLoader = None
+
+# Look up a SimObject class by name, loading it first if necessary
+def findClass(name):
+    if name not in allClasses and lazyClassLoader:
+        lazyClassLoader(name)
+    return allClasses[name]
+
 # dict to look up SimObjects based on path
 instanceDict = {}
 
 # Did any of the SimObjects lack a header file?
 noCxxHeader = False
 
+# Generation counter for the configuration hierarchy.  It is bumped
+# whenever a SimObject is attached to or detached from a parent, which
+# lets cached views of the hierarchy (e.g., flat_descendants()) detect
+# that they are stale without having to walk the tree.
+_hierarchy_generation = 0
+
+def _hierarchyChanged():
+    global _hierarchy_generation
+    _hierarchy_generation += 1
+
+# Cache of the names of the params of a SimObject class whose declared
+# type is a subclass of a given type, keyed by (class, type).  This
+# lets find_any() and find_all() skip the params that can never match
+# instead of checking every param of every object they visit.
+_param_type_cache = {}
+
+def _params_of_type(cls, ptype):
+    key = (cls, ptype)
+    pnames = _param_type_cache.get(key)
+    if pnames is None:
+        pnames = [ pname for pname,pdesc in cls._params.iteritems()
+                   if issubclass(pdesc.ptype, ptype) ]
+        _param_type_cache[key] = pnames
+    return pnames
+
 def public_value(key, value):
     return key.startswith('_') or \
                isinstance(value, (FunctionType, MethodType, ModuleType,
@@ -541,6 +577,7 @@ class MetaSimObject(type):
         assert(not hasattr(pdesc, 'name'))
         pdesc.name = name
         cls._params[name] = pdesc
+        _param_type_cache.clear()
         if hasattr(pdesc, 'default'):
             cls._set_param(name, pdesc.default, pdesc)
 
@@ -1006,6 +1043,9 @@ class SimObject(object):
         self._ccObject = None  # pointer to C++ object
         self._ccParams = None
         self._instantiated = False # really "cloned"
+        self._descendants_cache = None
+        self._path_cache = None
+        self._type_index_cache = None
 
         # Clone children specified at class level.  No need for a
         # multidict here since we will be cloning everything.
@@ -1157,11 +1197,13 @@ class SimObject(object):
     def clear_parent(self, old_parent):
         assert self._parent is old_parent
         self._parent = None
+        _hierarchyChanged()
 
     # Also implemented by SimObjectVector
     def set_parent(self, parent, name):
         self._parent = parent
         self._name = name
+        _hierarchyChanged()
 
     # Return parent object of this SimObject, not implemented by SimObjectVector
     # because the elements in a SimObjectVector may not share the same parent
@@ -1214,16 +1256,29 @@ class SimObject(object):
                 warn("%s adopting orphan SimObject param '%s'", self, key)
                 self.add_child(key, val)
 
+    # The path is memoized since it is used as a sort key and as the
+    # object name all over the configuration dump and C++ object
+    # creation.  Any re-parenting in the hierarchy bumps the hierarchy
+    # generation, which invalidates the cached paths of all objects
+    # (including those below the re-parented one).
     def path(self):
+        cache = self._path_cache
+        if cache is not None and cache[0] == _hierarchy_generation:
+            return cache[1]
+
         if not self._parent:
-            return '<orphan %s>' % self.__class__
+            path = '<orphan %s>' % self.__class__
         elif isinstance(self._parent, MetaSimObject):
-            return str(self.__class__)
+            path = str(self.__class__)
+        else:
+            ppath = self._parent.path()
+            if ppath == 'root':
+                path = self._name
+            else:
+                path = ppath + "." + self._name
 
-        ppath = self._parent.path()
-        if ppath == 'root':
-            return self._name
-        return ppath + "." + self._name
+        self._path_cache = (_hierarchy_generation, path)
+        return path
 
     def __str__(self):
         return self.path()
@@ -1234,56 +1289,90 @@ class SimObject(object):
     def ini_str(self):
         return self.path()
 
+    # Return the type index of the subtree below this object.  The
+    # index maps each class to the list of objects of exactly that
+    # class below this object (not including the object itself), and
+    # comes with per-type memos of the children and descendants that
+    # are instances of a given type.  Like flat_descendants(), the
+    # index is built lazily and reused until the hierarchy changes.
+    def _type_index(self):
+        cache = self._type_index_cache
+        if cache is None or cache[0] != _hierarchy_generation:
+            index = {}
+            for obj in self.flat_descendants()[1:]:
+                if not isNullPointer(obj):
+                    index.setdefault(obj.__class__, []).append(obj)
+            cache = (_hierarchy_generation, index, {}, {})
+            self._type_index_cache = cache
+        return cache
+
+    # Direct children of this object that are instances of ptype
+    def _children_of_type(self, ptype):
+        memo = self._type_index()[2]
+        objs = memo.get(ptype)
+        if objs is None:
+            objs = [ child for name, child in sorted(self._children.items())
+                     if isinstance(child, ptype) ]
+            memo[ptype] = objs
+        return objs
+
+    # All objects below this object that are instances of ptype
+    def _descendants_of_type(self, ptype):
+        cache = self._type_index()
+        index, memo = cache[1], cache[3]
+        objs = memo.get(ptype)
+        if objs is None:
+            objs = []
+            for cls, cls_objs in index.iteritems():
+                if issubclass(cls, ptype):
+                    objs.extend(cls_objs)
+            memo[ptype] = objs
+        return objs
+
     def find_any(self, ptype):
         if isinstance(self, ptype):
             return self, True
 
         found_obj = None
-        for child in self._children.itervalues():
+        for child in self._children_of_type(ptype):
             visited = False
             if hasattr(child, '_visited'):
               visited = getattr(child, '_visited')
 
-            if isinstance(child, ptype) and not visited:
+            if not visited:
                 if found_obj != None and child != found_obj:
                     raise AttributeError, \
                           'parent.any matched more than one: %s %s' % \
                           (found_obj.path, child.path)
                 found_obj = child
         # search param space
-        for pname,pdesc in self._params.iteritems():
-            if issubclass(pdesc.ptype, ptype):
-                match_obj = self._values[pname]
-                if found_obj != None and found_obj != match_obj:
-                    raise AttributeError, \
-                          'parent.any matched more than one: %s and %s' % (found_obj.path, match_obj.path)
-                found_obj = match_obj
+        for pname in _params_of_type(self.__class__, ptype):
+            match_obj = self._values[pname]
+            if found_obj != None and found_obj != match_obj:
+                raise AttributeError, \
+                      'parent.any matched more than one: %s and %s' % (found_obj.path, match_obj.path)
+            found_obj = match_obj
         return found_obj, found_obj != None
 
     def find_all(self, ptype):
         all = {}
-        # search children
-        for child in self._children.itervalues():
-            # a child could be a list, so ensure we visit each item
-            if isinstance(child, list):
-                children = child
-            else:
-                children = [child]
-
-            for child in children:
-                if isinstance(child, ptype) and not isproxy(child) and \
-                        not isNullPointer(child):
-                    all[child] = True
-                if isSimObject(child):
-                    # also add results from the child itself
-                    child_all, done = child.find_all(ptype)
-                    all.update(dict(zip(child_all, [done] * len(child_all))))
-        # search param space
-        for pname,pdesc in self._params.iteritems():
-            if issubclass(pdesc.ptype, ptype):
-                match_obj = self._values[pname]
-                if not isproxy(match_obj) and not isNullPointer(match_obj):
-                    all[match_obj] = True
+        # search the whole subtree using the type index
+        for child in self._descendants_of_type(ptype):
+            all[child] = True
+        # search param space of this object and of every object below
+        # it, looking only at the classes that have matching params
+        index = self._type_index()[1]
+        groups = [ (self.__class__, [ self ]) ] + index.items()
+        for cls, objs in groups:
+            pnames = _params_of_type(cls, ptype)
+            if not pnames:
+                continue
+            for obj in objs:
+                for pname in pnames:
+                    match_obj = obj._values[pname]
+                    if not isproxy(match_obj) and \
+                            not isNullPointer(match_obj):
+                        all[match_obj] = True
         # Also make sure to sort the keys based on the objects' path to
         # ensure that the order is the same on all hosts
         return sorted(all.keys(), key = lambda o: o.path()), True
@@ -1313,9 +1402,10 @@ class SimObject(object):
                 port.unproxy(self)
 
     def print_ini(self, ini_file):
-        print >>ini_file, '[' + self.path() + ']'       # .ini section header
+        path = self.path()
+        print >>ini_file, '[' + path + ']'       # .ini section header
 
-        instanceDict[self.path()] = self
+        instanceDict[path] = self
 
         if hasattr(self, 'type'):
             print >>ini_file, 'type=%s' % self.type
@@ -1373,6 +1463,47 @@ class SimObject(object):
 
         return d
 
+    # generate a compact description of the parameters, children and
+    # port connections of this object, made only of strings, numbers,
+    # lists and tuples so it can be marshalled into a binary config
+    # snapshot (see m5.simulate.dumpConfigSnapshot).  Values are in
+    # .ini form, vectors are kept as lists, and each connection is
+    # listed once, from the master side, with explicit port indices.
+    def get_config_snapshot(self):
+        children = []
+        for n in sorted(self._children.keys()):
+            child = self._children[n]
+            if isinstance(child, SimObjectVector):
+                children += [ (c.get_name(), c.path()) for c in child ]
+            else:
+                children.append((child.get_name(), child.path()))
+
+        params = []
+        for param in sorted(self._params.keys()):
+            value = self._values.get(param)
+            if value is None:
+                continue
+            if isinstance(self._params[param], VectorParamDesc):
+                params.append((param, [ v.ini_str() for v in value ]))
+            else:
+                params.append((param, value.ini_str()))
+
+        connections = []
+        for port_name in sorted(self._ports.keys()):
+            port = self._port_refs.get(port_name, None)
+            if port is None:
+                continue
+            for ref in getattr(port, 'elements', [ port ]):
+                peer = ref.peer
+                if ref.role != 'MASTER' or not isinstance(peer, PortRef):
+                    continue
+                connections.append((self.path(), ref.name, ref.index,
+                                    peer.simobj.path(), peer.name,
+                                    peer.index))
+
+        entry = (self.path(), getattr(self, 'type', None), children, params)
+        return entry, connections
+
     def getCCParams(self):
         if self._ccParams:
             return self._ccParams
@@ -1441,6 +1572,18 @@ class SimObject(object):
             for obj in child.descendants():
                 yield obj
 
+    # Return this object and all of its descendants as a flat tuple in
+    # the same order as descendants().  The list is computed once and
+    # reused until the hierarchy changes (i.e., until a child is added
+    # or removed anywhere), so repeated walks over a sealed hierarchy
+    # do not re-sort every node's children.
+    def flat_descendants(self):
+        cache = self._descendants_cache
+        if cache is None or cache[0] != _hierarchy_generation:
+            cache = (_hierarchy_generation, tuple(self.descendants()))
+            self._descendants_cache = cache
+        return cache[1]
+
     # Call C++ to create C++ object corresponding to this object
     def createCCObject(self):
         self.getCCParams()
@@ -46,6 +46,7 @@ if internal:
     import objects
     import params
     import stats
+    import sweep
     import util
 
     from event import *
@@ -82,6 +82,16 @@ def parse_options():
     group("Statistics Options")
     option("--stats-file", metavar="FILE", default="stats.txt",
         help="Sets the output file for statistics [Default: %default]")
+    option("--stats-binary", metavar="FILE", default="",
+        help="Also write statistics to a binary file (see " \
+             "util/statsfile.py) [Default: %default]")
+    option("--stats-include", metavar="GLOB[,GLOB]", action='append',
+        split=',', help="Only dump statistics with names matching GLOB")
+    option("--stats-exclude", metavar="GLOB[,GLOB]", action='append',
+        split=',', help="Don't dump statistics with names matching GLOB")
+    option("--stats-changed-only", action="store_true", default=False,
+        help="Only dump statistics that changed since the last dump " \
+             "to the text output")
 
     # Configuration Options
     group("Configuration Options")
@@ -89,11 +99,19 @@ def parse_options():
         help="Dump configuration output file [Default: %default]")
     option("--json-config", metavar="FILE", default="config.json",
         help="Create JSON output of the configuration [Default: %default]")
+    option("--snapshot-config", metavar="FILE", default="",
+        help="Create a binary snapshot of the configuration that "
+        "configs/example/read_config.py can load, the name must end in "
+        ".snapshot [Default: %default]")
     option("--dot-config", metavar="FILE", default="config.dot",
         help="Create DOT & pdf outputs of the configuration [Default: %default]")
     option("--dot-dvfs-config", metavar="FILE", default=None,
         help="Create DOT & pdf outputs of the DVFS configuration" + \
              " [Default: %default]")
+    option("--instantiate-timing", action="store_true", default=False,
+        help="Print the time spent in each phase of m5.instantiate()")
+    option("--import-timing", action="store_true", default=False,
+        help="Print the time spent importing Python modules on exit")
 
     # Debugging options
     group("Debugging Options")
@@ -261,6 +279,9 @@ def main(*args):
 
     if options.list_sim_objects:
         import SimObject
+        import objects
+        # Make sure all lazily loaded SimObject modules are imported
+        objects._load_all()
         done = True
         print "SimObjects:"
         objects = SimObject.allClasses.keys()
@@ -305,6 +326,14 @@ def main(*args):
         print "command line:", " ".join(map(pipes.quote, sys.argv))
         print
 
+    if options.import_timing:
+        # The embedded module importer records how long each module
+        # took to load (see src/python/importer.py).  Report on exit
+        # so that modules imported lazily by the script are included.
+        import atexit
+        import importer
+        atexit.register(importer.importer.report)
+
     # check to make sure we can find the listed script
     if not arguments or not os.path.isfile(arguments[0]):
         if arguments and not os.path.isfile(arguments[0]):
@@ -319,7 +348,14 @@ def main(*args):
     sys.path[0:0] = options.path
 
     # set stats options
-    stats.initText(options.stats_file)
+    stats.initText(options.stats_file,
+                   include=options.stats_include,
+                   exclude=options.stats_exclude,
+                   changed_only=options.stats_changed_only)
+    if options.stats_binary:
+        stats.initBinary(options.stats_binary,
+                         include=options.stats_include,
+                         exclude=options.stats_exclude)
 
     # set debugging options
     debug.setRemoteGDBPort(options.remote_gdb_port)
@@ -26,6 +26,13 @@
 #
 # Authors: Nathan Binkert
 
+# Keep the helper modules private so that they don't leak into the
+# namespaces of scripts that do 'from m5.objects import *'
+import os as _os
+import sys as _sys
+from types import ModuleType as _ModuleType
+
+import m5.SimObject as _SimObject
 from m5.internal import params
 from m5.SimObject import *
 
@@ -34,6 +41,62 @@ try:
 except NameError:
     modules = { }
 
-for module in modules.iterkeys():
-    if module.startswith('m5.objects.'):
-        exec "from %s import *" % module
+# SimObject modules that have not been imported yet
+_pending = [ module for module in modules.iterkeys()
+             if module.startswith('m5.objects.') ]
+
+def _load(module):
+    _pending.remove(module)
+    exec "from %s import *" % module in _namespace
+
+def _load_all():
+    while _pending:
+        _load(_pending[0])
+
+# Import the SimObject module(s) needed to resolve name.  By
+# convention, a SimObject is defined in the module with the same name,
+# so try that first before falling back to loading the remaining
+# modules one by one until the name shows up.
+def _resolve(name):
+    module = 'm5.objects.' + name
+    if module in _pending:
+        _load(module)
+    while name not in _namespace and _pending:
+        _load(_pending[0])
+
+# In lazy mode (M5_LAZY_OBJECTS), SimObject modules are only imported
+# when one of their names is first looked up in m5.objects, or when a
+# parameter refers to a SimObject class that hasn't been loaded yet.
+# 'from m5.objects import *' still imports everything.
+class _LazyObjects(_ModuleType):
+    def __getattr__(self, attr):
+        if attr == '__all__':
+            _load_all()
+            return [ name for name in _namespace
+                     if not name.startswith('_') ]
+        if attr.startswith('__'):
+            raise AttributeError, attr
+
+        _resolve(attr)
+        try:
+            return _namespace[attr]
+        except KeyError:
+            raise AttributeError, "m5.objects has no attribute '%s'" % attr
+
+def _load_class(name):
+    _resolve(name)
+
+_lazy = _os.environ.get('M5_LAZY_OBJECTS', 'false').lower() in ('true', 'yes')
+
+if _lazy and _pending:
+    _lazy_module = _LazyObjects(__name__, __doc__)
+    _lazy_module.__dict__.update(globals())
+    # Keep the original module alive; its globals are still used by
+    # the functions above and would be cleared if it were collected.
+    _lazy_module._module = _sys.modules[__name__]
+    _namespace = _lazy_module.__dict__
+    _sys.modules[__name__] = _lazy_module
+    _SimObject.lazyClassLoader = _load_class
+else:
+    _namespace = globals()
+    _load_all()
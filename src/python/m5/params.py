@@ -176,7 +176,7 @@ class ParamDesc(object):
 
     def __getattr__(self, attr):
         if attr == 'ptype':
-            ptype = SimObject.allClasses[self.ptype_str]
+            ptype = SimObject.findClass(self.ptype_str)
             assert isSimObjectClass(ptype)
             self.ptype = ptype
             return ptype
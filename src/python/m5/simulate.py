@@ -41,8 +41,11 @@
 #          Steve Reinhardt
 
 import atexit
+import marshal
 import os
 import sys
+import time
+from contextlib import contextmanager
 
 # import the SWIG-wrapped main C++ functions
 import internal
@@ -68,6 +71,63 @@ _memory_modes = {
 
 _drain_manager = internal.drain.DrainManager.instance()
 
+# Wall-clock time spent in each phase of the most recent call to
+# instantiate(), as a list of (phase, seconds) tuples in the order the
+# phases were run.
+instantiate_times = []
+
+@contextmanager
+def _timed_phase(name):
+    start = time.time()
+    yield
+    instantiate_times.append((name, time.time() - start))
+
+def printInstantiateTimes(stream=sys.stdout):
+    total = sum(t for name, t in instantiate_times)
+    print >>stream, "Instantiation phase timing:"
+    for name, t in instantiate_times:
+        print >>stream, "    %-24s %9.3fs" % (name, t)
+    print >>stream, "    %-24s %9.3fs" % ("total", total)
+
+# Binary snapshots of the elaborated configuration.  A snapshot is the
+# marshalled tuple (magic, version, objects, connections), where objects
+# holds each object's SimObject.get_config_snapshot() entry sorted by
+# path, and connections holds every port connection once, sorted.
+# configs/example/read_config.py can rebuild a system from a snapshot
+# without re-running the script that built it or parsing text.
+config_snapshot_magic = 'gem5-config-snapshot'
+config_snapshot_version = 1
+
+def dumpConfigSnapshot(root, filename):
+    objs = []
+    connections = []
+    for obj in root.flat_descendants():
+        entry, conns = obj.get_config_snapshot()
+        objs.append(entry)
+        connections += conns
+    objs.sort()
+    connections.sort()
+    snapshot = file(filename, 'wb')
+    marshal.dump((config_snapshot_magic, config_snapshot_version,
+                  objs, connections), snapshot)
+    snapshot.close()
+
+def loadConfigSnapshot(filename):
+    """Return the (objects, connections) lists stored in a snapshot"""
+    snapshot = file(filename, 'rb')
+    try:
+        magic, version, objs, connections = marshal.load(snapshot)
+    except (EOFError, ValueError, TypeError):
+        fatal("%s is not a config snapshot", filename)
+    finally:
+        snapshot.close()
+    if magic != config_snapshot_magic:
+        fatal("%s is not a config snapshot", filename)
+    if version != config_snapshot_version:
+        fatal("Config snapshot %s has version %s, expected %s",
+              filename, version, config_snapshot_version)
+    return objs, connections
+
 # The final hook to generate .ini files.  Called from the user script
 # once the config is built.
 def instantiate(ckpt_dir=None):
@@ -78,83 +138,118 @@ def instantiate(ckpt_dir=None):
     if not root:
         fatal("Need to instantiate Root() before calling instantiate()")
 
+    del instantiate_times[:]
+
     # we need to fix the global frequency
     ticks.fixGlobalFrequency()
 
     # Make sure SimObject-valued params are in the configuration
-    # hierarchy so we catch them with future descendants() walks
-    for obj in root.descendants(): obj.adoptOrphanParams()
+    # hierarchy so we catch them with future descendants() walks.
+    # This pass may add children, so it has to use the live generator
+    # rather than the cached object list.
+    with _timed_phase("adoptOrphanParams"):
+        for obj in root.descendants(): obj.adoptOrphanParams()
+
+    # From here on the hierarchy is (normally) sealed, so every pass
+    # iterates over the same pre-sorted flat list.  The list is
+    # rebuilt transparently if a pass does modify the hierarchy.
 
     # Unproxy in sorted order for determinism
-    for obj in root.descendants(): obj.unproxyParams()
+    with _timed_phase("unproxyParams"):
+        for obj in root.flat_descendants(): obj.unproxyParams()
 
     if options.dump_config:
-        ini_file = file(os.path.join(options.outdir, options.dump_config), 'w')
-        # Print ini sections in sorted order for easier diffing
-        for obj in sorted(root.descendants(), key=lambda o: o.path()):
-            obj.print_ini(ini_file)
-        ini_file.close()
+        with _timed_phase("dumpConfig"):
+            ini_file = file(os.path.join(options.outdir,
+                                         options.dump_config), 'w')
+            # Print ini sections in sorted order for easier diffing
+            for obj in sorted(root.flat_descendants(),
+                              key=lambda o: o.path()):
+                obj.print_ini(ini_file)
+            ini_file.close()
 
     if options.json_config:
-        try:
-            import json
-            json_file = file(os.path.join(options.outdir, options.json_config), 'w')
-            d = root.get_config_as_dict()
-            json.dump(d, json_file, indent=4)
-            json_file.close()
-        except ImportError:
-            pass
-
-    do_dot(root, options.outdir, options.dot_config)
+        with _timed_phase("jsonConfig"):
+            try:
+                import json
+                json_file = file(os.path.join(options.outdir,
+                                              options.json_config), 'w')
+                d = root.get_config_as_dict()
+                json.dump(d, json_file, indent=4)
+                json_file.close()
+            except ImportError:
+                pass
+
+    if options.snapshot_config:
+        with _timed_phase("snapshotConfig"):
+            dumpConfigSnapshot(root, os.path.join(options.outdir,
+                                                  options.snapshot_config))
+
+    with _timed_phase("dotConfig"):
+        do_dot(root, options.outdir, options.dot_config)
 
     # Initialize the global statistics
-    stats.initSimStats()
+    with _timed_phase("initSimStats"):
+        stats.initSimStats()
 
     # Create the C++ sim objects and connect ports
-    for obj in root.descendants(): obj.createCCObject()
-    for obj in root.descendants(): obj.connectPorts()
+    with _timed_phase("createCCObject"):
+        for obj in root.flat_descendants(): obj.createCCObject()
+    with _timed_phase("connectPorts"):
+        for obj in root.flat_descendants(): obj.connectPorts()
 
     # Do a second pass to finish initializing the sim objects
-    for obj in root.descendants(): obj.init()
+    with _timed_phase("init"):
+        for obj in root.flat_descendants(): obj.init()
 
     # Do a third pass to initialize statistics
-    for obj in root.descendants(): obj.regStats()
+    with _timed_phase("regStats"):
+        for obj in root.flat_descendants(): obj.regStats()
 
     # Do a fourth pass to initialize probe points
-    for obj in root.descendants(): obj.regProbePoints()
+    with _timed_phase("regProbePoints"):
+        for obj in root.flat_descendants(): obj.regProbePoints()
 
     # Do a fifth pass to connect probe listeners
-    for obj in root.descendants(): obj.regProbeListeners()
+    with _timed_phase("regProbeListeners"):
+        for obj in root.flat_descendants(): obj.regProbeListeners()
 
     # We want to generate the DVFS diagram for the system. This can only be
     # done once all of the CPP objects have been created and initialised so
     # that we are able to figure out which object belongs to which domain.
     if options.dot_dvfs_config:
-        do_dvfs_dot(root, options.outdir, options.dot_dvfs_config)
+        with _timed_phase("dotDvfsConfig"):
+            do_dvfs_dot(root, options.outdir, options.dot_dvfs_config)
 
     # We're done registering statistics.  Enable the stats package now.
-    stats.enable()
+    with _timed_phase("enableStats"):
+        stats.enable()
 
     # Restore checkpoint (if any)
     if ckpt_dir:
-        _drain_manager.preCheckpointRestore()
-        ckpt = internal.core.getCheckpoint(ckpt_dir)
-        internal.core.unserializeGlobals(ckpt);
-        for obj in root.descendants(): obj.loadState(ckpt)
+        with _timed_phase("loadState"):
+            _drain_manager.preCheckpointRestore()
+            ckpt = internal.core.getCheckpoint(ckpt_dir)
+            internal.core.unserializeGlobals(ckpt);
+            for obj in root.flat_descendants(): obj.loadState(ckpt)
     else:
-        for obj in root.descendants(): obj.initState()
+        with _timed_phase("initState"):
+            for obj in root.flat_descendants(): obj.initState()
 
     # Check to see if any of the stat events are in the past after resuming from
     # a checkpoint, If so, this call will shift them to be at a valid time.
     updateStatEvents()
 
+    if options.instantiate_timing:
+        printInstantiateTimes()
+
 need_startup = True
 def simulate(*args, **kwargs):
     global need_startup
 
     if need_startup:
         root = objects.Root.getInstance()
-        for obj in root.descendants(): obj.startup()
+        for obj in root.flat_descendants(): obj.startup()
         need_startup = False
 
         # Python exit handlers happen in reverse order.
@@ -212,11 +307,11 @@ def drain():
     assert _drain_manager.isDrained(), "Drain state inconsistent"
 
 def memWriteback(root):
-    for obj in root.descendants():
+    for obj in root.flat_descendants():
         obj.memWriteback()
 
 def memInvalidate(root):
-    for obj in root.descendants():
+    for obj in root.flat_descendants():
         obj.memInvalidate()
 
 def checkpoint(dir):
@@ -315,7 +410,7 @@ def switchCpus(system, cpuList, verbose=True):
         new_cpu.takeOverFrom(old_cpu)
 
 def notifyFork(root):
-    for obj in root.descendants():
+    for obj in root.flat_descendants():
         obj.notifyFork()
 
 fork_count = 0
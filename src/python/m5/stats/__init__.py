@@ -27,6 +27,9 @@
 #
 # Authors: Nathan Binkert
 
+import fnmatch
+import re
+
 import m5
 
 from m5 import internal
@@ -37,10 +40,86 @@ from m5.util import attrdict, fatal
 from m5.internal.stats import schedStatEvent as schedEvent
 from m5.internal.stats import periodicStatDump
 
+def compilePatterns(patterns):
+    '''Combine a list of stat name patterns into a single regular
+    expression. Strings are treated as glob patterns that must match
+    the whole name (e.g., 'system.cpu*.ipc'). Compiled regular
+    expressions only need to match the beginning of the name, as with
+    re.match(). Returns None if the list is empty.'''
+    if not patterns:
+        return None
+
+    regexes = []
+    for pattern in patterns:
+        if isinstance(pattern, basestring):
+            regexes.append(fnmatch.translate(pattern))
+        else:
+            regexes.append('(?:%s)' % pattern.pattern)
+    return re.compile('|'.join(regexes))
+
+class StatOutput(object):
+    '''A registered stats output and the stats that are dumped to it.
+
+    Stats are selected by name. A stat is dumped if it matches one of
+    the include patterns (or there are no include patterns) and
+    doesn't match any of the exclude patterns (see compilePatterns()).
+    The selection is resolved once when the stats package is enabled.
+
+    If changed_only is set, stats are only dumped if their value has
+    changed since the last dump they were included in.'''
+
+    def __init__(self, output, include=None, exclude=None,
+                 changed_only=False):
+        if changed_only:
+            output = internal.stats.initChangeFilter(output)
+        self.output = output
+        self.include = compilePatterns(include)
+        self.exclude = compilePatterns(exclude)
+        self.stats = []
+
+    def selected(self, name):
+        if self.include and not self.include.match(name):
+            return False
+        if self.exclude and self.exclude.match(name):
+            return False
+        return True
+
+    def select(self, stats):
+        if self.include is None and self.exclude is None:
+            self.stats = stats
+        else:
+            self.stats = [ stat for stat in stats if self.selected(stat.name) ]
+
+    def dump(self):
+        output = self.output
+        if output.valid():
+            output.begin()
+            for stat in self.stats:
+                stat.visit(output)
+            output.end()
+
 outputList = []
-def initText(filename, desc=True):
+def addOutput(output, include=None, exclude=None, changed_only=False):
+    '''Register an output created by one of the internal init
+    functions. See StatOutput for a description of the filters.'''
+    stat_output = StatOutput(output, include=include, exclude=exclude,
+                             changed_only=changed_only)
+    if internal.stats.enabled():
+        stat_output.select(stats_list)
+    outputList.append(stat_output)
+
+def initText(filename, desc=True, include=None, exclude=None,
+             changed_only=False):
     output = internal.stats.initText(filename, desc)
-    outputList.append(output)
+    addOutput(output, include=include, exclude=exclude,
+              changed_only=changed_only)
+
+def initBinary(filename, include=None, exclude=None):
+    '''Write stats to a binary file in addition to any other outputs.
+    The file contains a table of stat names followed by one packed
+    array of values per dump. It can be read with util/statsfile.py.'''
+    output = internal.stats.initBinary(filename)
+    addOutput(output, include=include, exclude=exclude)
 
 def initSimStats():
     internal.stats.initSimStats()
@@ -75,6 +154,10 @@ def enable():
         stats_dict[stat.name] = stat
         stat.enable()
 
+    # Resolve the stat filters of each output
+    for output in outputList:
+        output.select(stats_list)
+
     internal.stats.enable();
 
 def prepare():
@@ -101,11 +184,7 @@ def dump():
     prepare()
 
     for output in outputList:
-        if output.valid():
-            output.begin()
-            for stat in stats_list:
-                stat.visit(output)
-            output.end()
+        output.dump()
 
 def reset():
     '''Reset all statistics to the base state'''
@@ -0,0 +1,230 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Parallel parameter sweeps built on m5.fork().
+#
+# A sweep starts from a single, fully instantiated (and usually warmed
+# up) simulator.  Every point of the sweep runs in a forked child that
+# applies its own changes to the simulated system, simulates, and
+# writes its statistics to its own output directory.  The parent keeps
+# at most a given number of children alive at any time and, once all
+# of them have finished, reads back their statistics so that the
+# results of the whole sweep can be inspected in one table.
+#
+# Example:
+#
+#   def use_cpu(cpu):
+#       def setup():
+#           m5.switchCpus(system, [(system.cpu, cpu)], verbose=False)
+#       return setup
+#
+#   points = [ ("timing", use_cpu(timing_cpu)), ("o3", use_cpu(o3_cpu)) ]
+#   results = m5.sweep.sweep(points, run=lambda name: m5.simulate(10**9))
+#   m5.sweep.printTable(results, [ "sim_insts", "sim_seconds" ])
+
+import os
+import sys
+import time
+import traceback
+
+import m5
+from m5.util import attrdict, warn
+
+def readStats(filename):
+    """Read the values of the last statistics dump in a stats file.
+
+    Only stats with a numeric value are returned.  Vector and
+    distribution stats show up as one entry per element
+    (e.g., 'system.cpu.op_class::IntAlu').
+
+    Return Value:
+      dictionary mapping stat names to values (None if the file
+      doesn't exist).
+    """
+
+    # This duplicates the line parser in util/statsfile.py, which
+    # can't be imported here: util/ isn't part of the m5 package that
+    # is embedded in the gem5 binary.
+
+    if not os.path.isfile(filename):
+        return None
+
+    stats = {}
+    for line in file(filename, 'r'):
+        if line.startswith('---------- Begin Simulation Statistics'):
+            stats = {}
+            continue
+
+        fields = line.split(None, 2)
+        if len(fields) < 2:
+            continue
+        try:
+            stats[fields[0]] = float(fields[1])
+        except ValueError:
+            # percentages, descriptions and other non-numeric fields
+            pass
+
+    return stats
+
+def _run_child(name, setup, run, reset_stats):
+    status = 0
+    try:
+        if reset_stats:
+            m5.stats.reset()
+        if setup is not None:
+            setup()
+        if run is not None:
+            exit_event = run(name)
+        else:
+            exit_event = m5.simulate()
+        if exit_event is not None:
+            print "Sweep point '%s' exiting @ tick %i because %s" % \
+                  (name, m5.curTick(), exit_event.getCause())
+    except Exception:
+        traceback.print_exc()
+        status = 1
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # Exit through sys.exit() so that the exit handlers dump the
+    # statistics and close the output files of the child.
+    sys.exit(status)
+
+def sweep(points, run=None, max_children=None, reset_stats=True,
+          simout="%(parent)s.%(name)s"):
+    """Run a set of sweep points in parallel forked children.
+
+    The simulator must have been instantiated before calling this
+    function.  The parent's state is not modified by the sweep, so it
+    can keep simulating (or sweep again) afterwards.
+
+    Arguments:
+      points -- List of (name, setup) tuples.  setup is called without
+                arguments in the child before simulating and is used
+                to apply the changes that define the point (it may be
+                None).  Names must be unique.
+
+    Keyword Arguments:
+      run -- Function called in the child (with the point name) to
+             simulate the point.  The default simulates until the
+             next exit event.
+      max_children -- Maximum number of children alive at any time
+                      (default: number of host CPUs).
+      reset_stats -- Reset the statistics in each child before
+                     applying the point so that its stats only cover
+                     the point itself.
+      simout -- Output directory of each child.  Formatted with
+                the parent's output directory (parent), the name of
+                the point (name) and its index in points (index).
+
+    Return Value:
+      List of results in the order of points.  Each result has the
+      fields name, index, pid, status (as returned by os.waitpid),
+      outdir and stats (see readStats()).
+    """
+    from m5 import options
+
+    if max_children is None:
+        try:
+            import multiprocessing
+            max_children = multiprocessing.cpu_count()
+        except (ImportError, NotImplementedError):
+            max_children = 1
+    if max_children < 1:
+        raise ValueError, "max_children must be at least 1"
+
+    names = [ name for name, setup in points ]
+    if len(set(names)) != len(names):
+        raise ValueError, "Sweep point names must be unique"
+
+    results = []
+    running = {}
+    pending = list(enumerate(points))
+    parent = options.outdir
+
+    while pending or running:
+        if pending and len(running) < max_children:
+            index, (name, setup) = pending.pop(0)
+            outdir = simout % {
+                "parent" : parent,
+                "name" : name,
+                "index" : index,
+                }
+            # m5.fork() expands its own format string, so escape ours
+            pid = m5.fork(outdir.replace('%', '%%'))
+            if pid == 0:
+                _run_child(name, setup, run, reset_stats)
+
+            result = attrdict()
+            result.name = name
+            result.index = index
+            result.pid = pid
+            result.status = None
+            result.outdir = outdir
+            result.stats = None
+            results.append(result)
+            running[pid] = result
+            continue
+
+        # Only reap our own children: waiting for any child would also
+        # collect processes started by the user script.
+        for pid in running.keys():
+            wpid, status = os.waitpid(pid, os.WNOHANG)
+            if wpid == pid:
+                break
+        else:
+            time.sleep(0.1)
+            continue
+
+        result = running.pop(pid)
+        result.status = status
+        if status != 0:
+            warn("Sweep point '%s' (pid %d) failed with status %d",
+                 result.name, pid, status)
+        result.stats = readStats(os.path.join(result.outdir,
+                                              options.stats_file))
+
+    results.sort(key=lambda r: r.index)
+    return results
+
+def table(results, stat_names):
+    """Collate the stats of a sweep into rows of values.
+
+    Return Value:
+      List of rows, one per result, each starting with the point name
+      followed by the value of each stat in stat_names (None if the
+      stat is missing).
+    """
+
+    rows = []
+    for result in results:
+        stats = result.stats or {}
+        rows.append([ result.name ] +
+                    [ stats.get(stat) for stat in stat_names ])
+    return rows
+
+def printTable(results, stat_names, stream=sys.stdout, sep=','):
+    print >>stream, sep.join([ "point" ] + list(stat_names))
+    for row in table(results, stat_names):
+        print >>stream, sep.join([ str(v) if v is not None else ""
+                                   for v in row ])
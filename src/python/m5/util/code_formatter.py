@@ -25,10 +25,10 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import __builtin__
-import inspect
 import os
 import re
 import string
+import sys
 
 class lookup(object):
     def __init__(self, formatter, frame, *args, **kwargs):
@@ -38,6 +38,10 @@ class lookup(object):
         self.args = args
         self.kwargs = kwargs
         self.locals = {}
+        # Every access to frame.f_locals rebuilds the dictionary, so
+        # only do it once.  The caller is suspended while we format, so
+        # its locals cannot change.
+        self.frame_locals = frame.f_locals if formatter.locals else {}
 
     def __setitem__(self, item, val):
         self.locals[item] = val
@@ -55,8 +59,8 @@ class lookup(object):
         if item == '__line__':
             return self.frame.f_lineno
 
-        if self.formatter.locals and item in self.frame.f_locals:
-            return self.frame.f_locals[item]
+        if item in self.frame_locals:
+            return self.frame_locals[item]
 
         if item in self.dict:
             return self.dict[item]
@@ -105,6 +109,11 @@ class code_formatter_meta(type):
                 'rdb' : re.escape(rb2+rb1),
                 }
         cls.pattern = re.compile(pat, re.VERBOSE | re.DOTALL | re.MULTILINE)
+        # Format strings compiled with this pattern, see _compile()
+        cls._compiled = {}
+
+# Kinds of the parts of a compiled format string
+_LITERAL, _IDENT, _LONE, _POS, _EVAL = range(5)
 
 class code_formatter(object):
     __metaclass__ = code_formatter_meta
@@ -152,9 +161,23 @@ class code_formatter(object):
         self._data = []
 
     def write(self, *args):
-        f = file(os.path.join(*args), "w")
-        for data in self._data:
-            f.write(data)
+        path = os.path.join(*args)
+        data = ''.join(self._data)
+        self._data = [ data ]
+
+        # Leave the file alone if it would not change, so that its
+        # timestamp does not trigger needless rebuilds
+        try:
+            f = file(path, "r")
+            unchanged = f.read() == data
+            f.close()
+            if unchanged:
+                return
+        except IOError:
+            pass
+
+        f = file(path, "w")
+        f.write(data)
         f.close()
 
     def __str__(self):
@@ -200,6 +223,80 @@ class code_formatter(object):
 
             initial_newline = False
 
+    # Compiled formats are kept until there are this many of them.  Most
+    # formats are string literals in the generating code, so this only
+    # matters for formats that are built on the fly.
+    _max_compiled = 16384
+
+    @classmethod
+    def _compile(cls, format):
+        """
+        Split a format string into a tuple of (kind, value, extra)
+        parts, where kind is one of _LITERAL (value is the text),
+        _IDENT (value is the name), _LONE (a lone identifier: value is
+        the name, extra the indentation), _POS (value is the index) or
+        _EVAL (value is the compiled expression).
+        """
+        parts = []
+        literal = []
+        last = 0
+        for match in cls.pattern.finditer(format):
+            literal.append(format[last:match.start()])
+            last = match.end()
+
+            # check for an escaped delimiter
+            if match.group('escaped') is not None:
+                literal.append('$')
+                continue
+
+            # check for a lone identifier
+            ident = match.group('lone')
+            if ident:
+                part = (_LONE, ident, match.group('indent')) # must be spaces
+            else:
+                # check for an identifier, braced or not
+                ident = match.group('ident') or match.group('b_ident')
+                pos = match.group('pos') or match.group('b_pos')
+                eval_expr = match.group('eval')
+                if ident is not None:
+                    part = (_IDENT, ident, None)
+                # check for a positional parameter, braced or not
+                elif pos is not None:
+                    part = (_POS, int(pos), None)
+                # check for a double braced expression
+                elif eval_expr is not None:
+                    part = (_EVAL, compile(eval_expr, '<string>', 'eval'),
+                            None)
+                # At this point, we have to match invalid
+                elif match.group('invalid') is None:
+                    # didn't match invalid!
+                    raise ValueError('Unrecognized named group in pattern',
+                                     cls.pattern)
+                else:
+                    i = match.start('invalid')
+                    lineno = format.count('\n', 0, i) + 1
+                    colno = i - format.rfind('\n', 0, i)
+                    raise ValueError('Invalid format string: line %d, col %d'
+                                     % (lineno, colno))
+
+            if literal:
+                text = ''.join(literal)
+                if text:
+                    parts.append((_LITERAL, text, None))
+                literal = []
+            parts.append(part)
+
+        literal.append(format[last:])
+        text = ''.join(literal)
+        if text:
+            parts.append((_LITERAL, text, None))
+
+        parts = tuple(parts)
+        if len(cls._compiled) >= cls._max_compiled:
+            cls._compiled.clear()
+        cls._compiled[format] = parts
+        return parts
+
     def __call__(self, *args, **kwargs):
         if not args:
             self._data.append('\n')
@@ -208,67 +305,45 @@ class code_formatter(object):
         format = args[0]
         args = args[1:]
 
-        frame = inspect.currentframe().f_back
+        parts = self._compiled.get(format)
+        if parts is None:
+            parts = self._compile(format)
 
-        l = lookup(self, frame, *args, **kwargs)
-        def convert(match):
-            ident = match.group('lone')
-            # check for a lone identifier
-            if ident:
-                indent = match.group('indent') # must be spaces
-                lone = '%s' % (l[ident], )
-
-                def indent_lines(gen):
-                    for line in gen:
-                        yield indent
-                        yield line
-                return ''.join(indent_lines(lone.splitlines(True)))
-
-            # check for an identifier, braced or not
-            ident = match.group('ident') or match.group('b_ident')
-            if ident is not None:
-                return '%s' % (l[ident], )
-
-            # check for a positional parameter, braced or not
-            pos = match.group('pos') or match.group('b_pos')
-            if pos is not None:
-                pos = int(pos)
-                if pos > len(args):
-                    raise ValueError \
-                        ('Positional parameter #%d not found in pattern' % pos,
-                         code_formatter.pattern)
-                return '%s' % (args[int(pos)], )
+        # Plain text needs no substitution at all
+        if len(parts) == 1 and parts[0][0] == _LITERAL:
+            self._append(parts[0][1])
+            return
 
-            # check for a double braced expression
-            eval_expr = match.group('eval')
-            if eval_expr is not None:
-                result = eval(eval_expr, {}, l)
-                return '%s' % (result, )
+        l = None
+        result = []
+        for kind, value, extra in parts:
+            if kind == _LITERAL:
+                result.append(value)
+                continue
 
-            # check for an escaped delimiter
-            if match.group('escaped') is not None:
-                return '$'
-
-            # At this point, we have to match invalid
-            if match.group('invalid') is None:
-                # didn't match invalid!
-                raise ValueError('Unrecognized named group in pattern',
-                                 code_formatter.pattern)
-
-            i = match.start('invalid')
-            if i == 0:
-                colno = 1
-                lineno = 1
+            if kind == _POS:
+                if value > len(args):
+                    raise ValueError \
+                        ('Positional parameter #%d not found in pattern' %
+                         value, code_formatter.pattern)
+                result.append('%s' % (args[value], ))
+                continue
+
+            # Identifiers and expressions are looked up in the caller
+            if l is None:
+                l = lookup(self, sys._getframe(1), *args, **kwargs)
+
+            if kind == _IDENT:
+                result.append('%s' % (l[value], ))
+            elif kind == _LONE:
+                lone = '%s' % (l[value], )
+                for line in lone.splitlines(True):
+                    result.append(extra)
+                    result.append(line)
             else:
-                lines = format[:i].splitlines(True)
-                colno = i - reduce(lambda x,y: x+y, (len(z) for z in lines))
-                lineno = len(lines)
-
-                raise ValueError('Invalid format string: line %d, col %d' %
-                                 (lineno, colno))
+                result.append('%s' % (eval(value, {}, l), ))
 
-        d = code_formatter.pattern.sub(convert, format)
-        self._append(d)
+        self._append(''.join(result))
 
 __all__ = [ "code_formatter" ]
 
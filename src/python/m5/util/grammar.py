@@ -25,6 +25,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import sys
 
 import ply.lex
 import ply.yacc
@@ -45,7 +46,7 @@ class Grammar(object):
             raise AttributeError, "module is an illegal attribute"
 
         if 'output' in kwargs:
-            dir,tab = os.path.split(output)
+            dir,tab = os.path.split(kwargs.pop('output'))
             if not tab.endswith('.py'):
                 raise AttributeError, \
                     'The output file must end with .py'
@@ -54,6 +55,19 @@ class Grammar(object):
 
         self.yacc_kwargs = kwargs
 
+    def setupTableCache(self, cache_dir, name):
+        """Keep the parse tables of this grammar in a pickle file in
+        cache_dir instead of regenerating them for every parser.  PLY
+        checks the signature of the grammar stored with the tables, and
+        rebuilds them if the grammar changed.  The file name includes
+        the PLY table and Python versions."""
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        picklefile = os.path.join(cache_dir, '%s-ply%s-py%d%d.pickle' %
+                                  ((name, ply.yacc.__tabversion__) +
+                                   sys.version_info[:2]))
+        self.setupParserFactory(picklefile=picklefile, debug=False)
+
     def __getattr__(self, attr):
         if attr == 'lexers':
             self.lexers = []
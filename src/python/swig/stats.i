@@ -36,6 +36,8 @@
 %include <stdint.i>
 
 %{
+#include "base/stats/binary.hh"
+#include "base/stats/change_filter.hh"
 #include "base/stats/text.hh"
 #include "base/stats/types.hh"
 #include "base/callback.hh"
@@ -120,6 +122,8 @@ namespace Stats {
 
 void initSimStats();
 Output *initText(const std::string &filename, bool desc);
+Output *initBinary(const std::string &filename);
+Output *initChangeFilter(Output *output);
 
 void registerPythonStatsHandlers();
 
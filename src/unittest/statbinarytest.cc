@@ -0,0 +1,177 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include <stdint.h>
+
+#include <cstring>
+#include <list>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include "base/statistics.hh"
+#include "base/stats/binary.hh"
+#include "base/stats/text.hh"
+#include "unittest/unittest.hh"
+
+using namespace std;
+using UnitTest::setCase;
+
+typedef list<Stats::Info *> InfoList;
+
+namespace {
+
+// Run one stats dump of every registered stat into output
+void
+dump(Stats::Output &output)
+{
+    InfoList &stats = Stats::statsList();
+    output.begin();
+    for (InfoList::iterator i = stats.begin(); i != stats.end(); ++i) {
+        (*i)->prepare();
+        (*i)->visit(output);
+    }
+    output.end();
+}
+
+// Names of the stats in the last dump of a text stats file
+vector<string>
+textNames(const string &text)
+{
+    vector<string> names;
+    istringstream stream(text);
+    string line;
+    while (getline(stream, line)) {
+        if (line.empty())
+            continue;
+        if (line.compare(0, 10, "----------") == 0) {
+            if (line.find("Begin") != string::npos)
+                names.clear();
+            continue;
+        }
+        names.push_back(line.substr(0, line.find(' ')));
+    }
+    return names;
+}
+
+uint32_t
+readWord(const string &data, size_t &pos)
+{
+    uint32_t word;
+    memcpy(&word, data.data() + pos, sizeof(word));
+    pos += sizeof(word);
+    return word;
+}
+
+string
+readString(const string &data, size_t &pos)
+{
+    uint32_t size = readWord(data, pos);
+    string str = data.substr(pos, size);
+    pos += size;
+    return str;
+}
+
+// Column names of the last table in a binary stats file, checking
+// that every dump has as many values as its table has columns
+vector<string>
+binaryNames(const string &data, unsigned &tables)
+{
+    vector<string> names;
+    size_t pos = 16;
+    tables = 0;
+    while (pos < data.size()) {
+        uint32_t type = readWord(data, pos);
+        uint32_t count = readWord(data, pos);
+        if (type == 'T') {
+            size_t start = pos;
+            names.clear();
+            for (uint32_t i = 0; i < count; ++i) {
+                names.push_back(readString(data, pos));
+                readString(data, pos);
+            }
+            pos += (8 - (pos - start + 8) % 8) % 8;
+            ++tables;
+        } else {
+            EXPECT_EQ(type, (uint32_t)'D');
+            EXPECT_EQ(count, names.size());
+            pos += count * sizeof(double);
+        }
+    }
+    EXPECT_EQ(pos, data.size());
+    return names;
+}
+
+} // anonymous namespace
+
+int
+main()
+{
+    Stats::Histogram hist;
+    hist
+        .init(4)
+        .name("test.hist")
+        .desc("a histogram that rescales as samples grow")
+        ;
+
+    InfoList &stats = Stats::statsList();
+    for (InfoList::iterator i = stats.begin(); i != stats.end(); ++i)
+        (*i)->enable();
+
+    ostringstream text_stream, binary_stream;
+    Stats::Text text(text_stream);
+    Stats::Binary binary;
+    binary.open(binary_stream);
+
+    unsigned tables;
+
+    setCase("initial buckets");
+    hist.sample(1);
+    dump(text);
+    dump(binary);
+    EXPECT_TRUE(binaryNames(binary_stream.str(), tables) ==
+                textNames(text_stream.str()));
+    EXPECT_EQ(tables, 1U);
+
+    setCase("unchanged buckets");
+    hist.sample(2);
+    dump(text);
+    dump(binary);
+    EXPECT_TRUE(binaryNames(binary_stream.str(), tables) ==
+                textNames(text_stream.str()));
+    EXPECT_EQ(tables, 1U);
+
+    // Sampling past the last bucket doubles the bucket size, which
+    // renames the buckets but keeps their number
+    setCase("rescaled buckets");
+    hist.sample(13);
+    dump(text);
+    dump(binary);
+    EXPECT_TRUE(binaryNames(binary_stream.str(), tables) ==
+                textNames(text_stream.str()));
+    EXPECT_EQ(tables, 2U);
+
+    return UnitTest::printResults();
+}
@@ -0,0 +1,101 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Tests of the regression test result cache (tests/testing/cache.py)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+
+from testing.cache import ResultCache, file_hash, tree_files
+
+def write_file(path, data):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write(data)
+
+def read_tree(path):
+    tree = {}
+    for fname in tree_files(path):
+        with open(os.path.join(path, fname)) as f:
+            tree[fname] = f.read()
+    return tree
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.dir, "cache"))
+        self.output_dir = os.path.join(self.dir, "out")
+        write_file(os.path.join(self.output_dir, "stats.txt"), "stats")
+        write_file(os.path.join(self.output_dir, "sub", "simout"), "out")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_miss(self):
+        self.assertEqual(self.cache.load("0123abcd", self.output_dir), None)
+        # A miss leaves the output directory alone
+        self.assertEqual(sorted(read_tree(self.output_dir)),
+                         [ "stats.txt", os.path.join("sub", "simout") ])
+
+    def test_round_trip(self):
+        files = read_tree(self.output_dir)
+        self.cache.store("0123abcd", self.output_dir, { "status" : "ok" })
+
+        restore_dir = os.path.join(self.dir, "restore")
+        result = self.cache.load("0123abcd", restore_dir)
+        self.assertEqual(result, { "status" : "ok" })
+        self.assertEqual(read_tree(restore_dir), files)
+
+    def test_stale_files_removed(self):
+        files = read_tree(self.output_dir)
+        self.cache.store("0123abcd", self.output_dir, "result")
+
+        # Leftovers of a previous run must not survive a restore
+        write_file(os.path.join(self.output_dir, "stale.txt"), "stale")
+        write_file(os.path.join(self.output_dir, "stats.txt"), "changed")
+        self.assertEqual(self.cache.load("0123abcd", self.output_dir),
+                         "result")
+        self.assertEqual(read_tree(self.output_dir), files)
+
+    def test_store_once(self):
+        self.cache.store("0123abcd", self.output_dir, "first")
+        self.cache.store("0123abcd", self.output_dir, "second")
+        self.assertEqual(self.cache.load("0123abcd", self.output_dir),
+                         "first")
+
+    def test_file_hash(self):
+        path = os.path.join(self.output_dir, "stats.txt")
+        digest = file_hash(path)
+        write_file(path, "other stats")
+        self.assertNotEqual(file_hash(path), digest)
+
+if __name__ == "__main__":
+    unittest.main()
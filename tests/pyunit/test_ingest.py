@@ -0,0 +1,159 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Tests of the stats.txt loader of util/stats.  Run the Python unit
+# tests from the top of the tree with:
+#
+#   python -m unittest discover -s tests/pyunit
+
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+_tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir)
+sys.path.append(os.path.join(_tests_dir, os.pardir, "util", "stats"))
+
+import db
+import dbinit
+import ingest
+
+ref_stats = os.path.join(_tests_dir, "quick", "se", "00.hello", "ref",
+                         "x86", "linux", "simple-timing", "stats.txt")
+
+class Options(object):
+    db = None
+    host = None
+    user = None
+    passwd = None
+    dbfile = ":memory:"
+
+class IngestTest(unittest.TestCase):
+    def setUp(self):
+        self.db = dbinit.SQLiteDB(Options())
+        self.db.connect()
+        self.db.populate()
+
+    def tearDown(self):
+        self.db.close()
+
+    def value(self, run, name, sub=None):
+        self.db.cursor.execute("""
+        select dt_data from data, stats
+        where dt_stat=st_id and dt_run=? and st_name=? and dt_x=?""",
+            (run, name, self.subindex(name, sub)))
+        rows = self.db.cursor.fetchall()
+        return rows[0][0] if rows else None
+
+    def subindex(self, name, sub):
+        if sub is None:
+            return 0
+        self.db.cursor.execute("""
+        select sd_x from subdata, stats
+        where sd_stat=st_id and st_name=? and sd_name=?""", (name, sub))
+        return self.db.cursor.fetchone()[0]
+
+    def test_load_ref(self):
+        stats = list(ingest.dumps(ref_stats))
+        self.assertEqual(len(stats), 1)
+        values = dict((name, value) for name, value, desc in stats[0])
+        nans = [ name for name, value in values.iteritems()
+                 if math.isnan(value) ]
+        self.assertTrue(nans, "reference stats should contain nan values")
+
+        loader = ingest.StatsLoader(self.db)
+        run, ndumps, nvalues = loader.load(ref_stats, "hello")
+        self.assertEqual(ndumps, 1)
+        self.assertEqual(nvalues, len(values) - len(nans))
+
+        self.db.cursor.execute("select count(*) from data where dt_run=?",
+                               (run,))
+        self.assertEqual(self.db.cursor.fetchone()[0], nvalues)
+
+        self.assertEqual(self.value(run, "sim_insts"), values["sim_insts"])
+        self.assertEqual(self.value(run, "system.cpu.op_class", "IntAlu"),
+                         values["system.cpu.op_class::IntAlu"])
+
+        # NaN values are not stored, but their stats are still known
+        base, sep, sub = nans[0].partition("::")
+        self.db.cursor.execute("select count(*) from stats where st_name=?",
+                               (base,))
+        self.assertEqual(self.db.cursor.fetchone()[0], 1)
+
+    def test_load_twice(self):
+        loader = ingest.StatsLoader(self.db)
+        run1, ndumps, nvalues1 = loader.load(ref_stats, "first")
+        run2, ndumps, nvalues2 = loader.load(ref_stats, "second")
+        self.assertNotEqual(run1, run2)
+        self.assertEqual(nvalues1, nvalues2)
+        self.assertEqual(self.value(run2, "sim_insts"),
+                         self.value(run1, "sim_insts"))
+
+class LoadStatTest(unittest.TestCase):
+    stats = """
+---------- Begin Simulation Statistics ----------
+sim_ticks                1000      # Number of ticks simulated
+system.l2_cache.hits     10        # hits
+system.l2xcache.hits     20        # hits
+system.l2_cache_x.hits   30        # hits
+---------- End Simulation Statistics   ----------
+"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        stats_file = os.path.join(self.dir, "stats.txt")
+        with open(stats_file, "w") as f:
+            f.write(self.stats)
+
+        options = Options()
+        options.dbfile = os.path.join(self.dir, "stats.db")
+        mydb = dbinit.SQLiteDB(options)
+        mydb.connect()
+        mydb.populate()
+        ingest.StatsLoader(mydb).load(stats_file, "run")
+        mydb.close()
+
+        self.db = db.Database()
+        self.db.dbfile = options.dbfile
+        self.db.connect()
+
+    def tearDown(self):
+        self.db.thedb.close()
+        shutil.rmtree(self.dir)
+
+    def test_prefix(self):
+        # '_' must not act as a wildcard in the prefix lookup
+        self.db.loadStat("system.l2_cache")
+        self.assertEqual(sorted(self.db.allStatNames),
+                         [ "system.l2_cache.hits" ])
+
+    def test_exact(self):
+        self.db.loadStat("sim_ticks")
+        self.assertEqual(sorted(self.db.allStatNames), [ "sim_ticks" ])
+
+if __name__ == "__main__":
+    unittest.main()
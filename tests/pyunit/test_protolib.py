@@ -0,0 +1,126 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Round-trip tests of the batched trace reader and writer in
+# util/protolib.py.  The tests use a minimal stand-in for a generated
+# protobuf message, since the library only calls SerializeToString()
+# and ParseFromString() on messages.
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, "util"))
+
+import protolib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class Packet(object):
+    fields = ("tick", "addr", "size")
+
+    def __init__(self, tick=0, addr=0, size=0):
+        self.tick = tick
+        self.addr = addr
+        self.size = size
+
+    def SerializeToString(self):
+        return struct.pack("<QQI", self.tick, self.addr, self.size)
+
+    def ParseFromString(self, buf):
+        self.tick, self.addr, self.size = struct.unpack("<QQI", buf)
+
+def packets(count):
+    return [ Packet(1000 * i, (1 << 63) + 64 * i, 1 << (i % 7))
+             for i in xrange(count) ]
+
+class ProtoLibTest(unittest.TestCase):
+    magic = "gem5"
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, msgs, **kwargs):
+        path = os.path.join(self.dir, name)
+        writer = protolib.openWriter(path, **kwargs)
+        writer.write(self.magic)
+        for msg in msgs:
+            writer.writeMessage(msg)
+        writer.close()
+        return path
+
+    def read(self, path):
+        reader = protolib.openReader(path, block_size=256)
+        self.assertEqual(reader.read(len(self.magic)), self.magic)
+        return reader
+
+    def check_messages(self, path, msgs):
+        reader = self.read(path)
+        read = [ (m.tick, m.addr, m.size)
+                 for m in reader.messages(Packet()) ]
+        reader.close()
+        self.assertEqual(read, [ (m.tick, m.addr, m.size) for m in msgs ])
+
+    def test_plain(self):
+        msgs = packets(1000)
+        self.check_messages(self.write("trace.trc", msgs, block_size=512),
+                            msgs)
+
+    def test_gzip(self):
+        msgs = packets(1000)
+        self.check_messages(self.write("trace.trc.gz", msgs), msgs)
+
+    def test_gzip_threads(self):
+        msgs = packets(1000)
+        self.check_messages(self.write("trace.trc.gz", msgs, threads=2,
+                                       block_size=512), msgs)
+
+    @unittest.skipIf(np is None, "requires NumPy")
+    def test_field_arrays(self):
+        msgs = packets(100)
+        reader = self.read(self.write("trace.trc.gz", msgs))
+        arrays = reader.fieldArrays(Packet(), Packet.fields, count=60)
+        rest = reader.fieldArrays(Packet(), Packet.fields)
+        empty = reader.fieldArrays(Packet(), Packet.fields)
+        reader.close()
+
+        for f in Packet.fields:
+            self.assertEqual(arrays[f].dtype, np.uint64)
+            self.assertEqual(list(arrays[f]) + list(rest[f]),
+                             [ getattr(m, f) for m in msgs ])
+            self.assertEqual(len(arrays[f]), 60)
+            self.assertEqual(len(empty[f]), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Tests of the stats file differ (tests/testing/statdiff.py)
+
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+_tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir)
+sys.path.append(_tests_dir)
+
+from testing.statdiff import StatDiffer, begin_marker, end_marker
+
+ref_stats = os.path.join(_tests_dir, "quick", "se", "00.hello", "ref",
+                         "x86", "linux", "simple-timing", "stats.txt")
+
+def stats_file(*dumps):
+    lines = []
+    for dump in dumps:
+        lines.append(begin_marker)
+        lines += [ "%-40s %s # %s" % (name, value, name)
+                   for name, value in dump ]
+        lines.append(end_marker)
+        lines.append("")
+    return StringIO("\n".join(lines))
+
+base = [
+    ("sim_ticks", "1000"),
+    ("host_seconds", "0.50"),
+    ("system.cpu.ipc", "0.500000"),
+    ("system.cpu.op_class::IntAlu", "70     70.00%     70.00%"),
+    ("system.cpu.op_class::MemRead", "30     30.00%    100.00%"),
+]
+
+def modified(changes):
+    """A copy of base with the values of some stats replaced"""
+    return [ (name, changes.get(name, value)) for name, value in base ]
+
+class StatDifferTest(unittest.TestCase):
+    def diff(self, ref, new, **kwargs):
+        return StatDiffer(**kwargs).diff(stats_file(*ref),
+                                         stats_file(*new))
+
+    def test_identical(self):
+        diff = self.diff([ base ], [ base ])
+        self.assertTrue(diff)
+        self.assertEqual(diff.deltas, [])
+        self.assertEqual(diff.max_error, 0.0)
+        # Key stats are reported even if they didn't change
+        self.assertEqual(sorted([ d.name for d in diff.key_stats ]),
+                         [ "sim_ticks", "system.cpu.ipc" ])
+
+    def test_ref_file(self):
+        differ = StatDiffer()
+        self.assertTrue(differ.diff_files(ref_stats, ref_stats))
+
+    def test_changed(self):
+        diff = self.diff([ base ], [ modified({ "sim_ticks" : "1100" }) ])
+        self.assertFalse(diff)
+        self.assertEqual(len(diff.deltas), 1)
+        delta = diff.deltas[0]
+        self.assertEqual((delta.dump, delta.name, delta.ref, delta.new),
+                         (0, "sim_ticks", "1000", "1100"))
+        self.assertAlmostEqual(delta.abs_diff, 100.0)
+        self.assertAlmostEqual(delta.rel_diff, 10.0)
+        self.assertAlmostEqual(diff.max_error, 10.0)
+        self.assertTrue("sim_ticks" in diff.format())
+
+    def test_tolerance(self):
+        new = [ modified({ "sim_ticks" : "1100" }) ]
+        self.assertTrue(self.diff([ base ], new, tolerance=10.0))
+        self.assertFalse(self.diff([ base ], new, tolerance=5.0))
+        self.assertTrue(self.diff([ base ], new,
+                                  tolerances=[ ("^sim_ticks$", None) ]))
+
+    def test_host_stats_ignored(self):
+        new = modified({ "host_seconds" : "9" })
+        self.assertTrue(self.diff([ base ], [ new ]))
+
+    def test_distribution(self):
+        # Only the sample count of a bucket is compared, the PDF and
+        # CDF are derived from it
+        new = modified({ "system.cpu.op_class::IntAlu" : "70 69.00% 69.00%" })
+        self.assertTrue(self.diff([ base ], [ new ]))
+
+        new = modified({ "system.cpu.op_class::IntAlu" : "71 70.30% 70.30%" })
+        diff = self.diff([ base ], [ new ])
+        self.assertEqual([ d.name for d in diff.deltas ],
+                         [ "system.cpu.op_class::IntAlu" ])
+
+    def test_not_a_number(self):
+        new = modified({ "system.cpu.ipc" : "no_value" })
+        diff = self.diff([ base ], [ new ])
+        self.assertFalse(diff)
+        self.assertEqual(diff.deltas[0].abs_diff, None)
+        self.assertEqual(diff.deltas[0].new, "no_value")
+        diff.format()
+
+        nan = modified({ "system.cpu.ipc" : "nan" })
+        self.assertTrue(self.diff([ nan ], [ nan ]))
+
+    def test_reordered(self):
+        self.assertTrue(self.diff([ base ], [ list(reversed(base)) ]))
+
+    def test_missing_and_added(self):
+        new = base[:-1] + [ ("system.cpu.op_class::MemWrite", "30") ]
+        diff = self.diff([ base ], [ new ])
+        self.assertFalse(diff)
+        self.assertEqual(diff.deltas, [])
+        self.assertEqual([ name for dump, name, value in diff.missing ],
+                         [ "system.cpu.op_class::MemRead" ])
+        self.assertEqual([ name for dump, name, value in diff.added ],
+                         [ "system.cpu.op_class::MemWrite" ])
+        self.assertEqual(len(diff.all_deltas()), 2)
+
+    def test_dumps(self):
+        # Stats are matched by dump, not only by name
+        new = modified({ "sim_ticks" : "2000" })
+        diff = self.diff([ base, base ], [ base, new ])
+        self.assertEqual([ (d.dump, d.name) for d in diff.deltas ],
+                         [ (1, "sim_ticks") ])
+
+        diff = self.diff([ base, base ], [ base ])
+        self.assertEqual(len(diff.missing), len(base))
+
+if __name__ == "__main__":
+    unittest.main()
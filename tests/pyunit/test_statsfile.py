@@ -0,0 +1,218 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Tests of the stats file readers in util/statsfile.py.  Binary stats
+# files are generated following the layout documented in
+# src/base/stats/binary.hh.
+
+import gzip
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+_tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir)
+sys.path.append(os.path.join(_tests_dir, os.pardir, "util"))
+
+import statsfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ref_stats = os.path.join(_tests_dir, "quick", "se", "00.hello", "ref",
+                         "x86", "linux", "simple-timing", "stats.txt")
+
+def text_stats(*dumps):
+    """Contents of a stats.txt file with the given (name, value) dumps"""
+    lines = []
+    for dump in dumps:
+        lines.append(statsfile.begin_marker)
+        lines += [ "%-40s %12s # Desc of %s" % (name, value, name)
+                   for name, value in dump ]
+        lines.append(statsfile.end_marker)
+        lines.append("")
+    return "\n".join(lines)
+
+def binary_stats(*dumps, **kwargs):
+    """Contents of a binary stats file with the given (name, value)
+    dumps. A table is written whenever the names change."""
+    order = kwargs.get("order", "<")
+    out = [ statsfile.binary_magic,
+            struct.pack(order + "II", statsfile.binary_version,
+                        statsfile.binary_bom) ]
+    names = None
+    for dump in dumps:
+        dump_names = [ name for name, value in dump ]
+        if dump_names != names:
+            names = dump_names
+            table = struct.pack(order + "II", ord("T"), len(names))
+            for name in names:
+                for s in (name, "Desc of %s" % name):
+                    table += struct.pack(order + "I", len(s)) + s
+            out.append(table + "\0" * (-len(table) % 8))
+        out.append(struct.pack(order + "II", ord("D"), len(dump)))
+        out.append(struct.pack(order + "%dd" % len(dump),
+                               *[ float(value) for name, value in dump ]))
+    return "".join(out)
+
+first = [ ("sim_ticks", 1000), ("system.cpu.ipc", 0.5),
+          ("system.cpu.op_class::IntAlu", 70),
+          ("system.cpu.op_class::MemRead", 30) ]
+second = [ ("sim_ticks", 2000), ("system.cpu.ipc", 0.25),
+           ("system.cpu.op_class::IntAlu", 140),
+           ("system.cpu.op_class::MemWrite", 10) ]
+
+class LineParserTest(unittest.TestCase):
+    def test_parse_line(self):
+        self.assertEqual(statsfile.parseLine(
+            "system.cpu.op_class::IntAlu    7749     79.49%     79.50% "
+            "# Class of executed instruction\n"),
+            ("system.cpu.op_class::IntAlu", 7749.0,
+             "Class of executed instruction"))
+        self.assertEqual(statsfile.parseLine("\n"), None)
+        name, value, desc = statsfile.parseLine("x   no_value  # d\n")
+        self.assertTrue(math.isnan(value))
+
+    def test_ref_dumps(self):
+        f = statsfile.openStats(ref_stats)
+        try:
+            dumps = list(statsfile.dumps(f))
+        finally:
+            f.close()
+        self.assertEqual(len(dumps), 1)
+        values = dict((name, value) for name, value, desc in dumps[0])
+        self.assertEqual(values["sim_insts"], 5381)
+
+@unittest.skipIf(np is None, "requires NumPy")
+class StatsFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        f = gzip.open(path, "wb") if name.endswith(".gz") else \
+            open(path, "wb")
+        f.write(data)
+        f.close()
+        return path
+
+    def check(self, stats, *dumps):
+        """Check that stats holds the given dumps, with NaN for stats
+        missing from a dump"""
+        names = []
+        for dump in dumps:
+            names += [ name for name, value in dump if name not in names ]
+        self.assertEqual(stats.names, names)
+        self.assertEqual(len(stats), len(dumps))
+        for i, dump in enumerate(dumps):
+            values = dict(dump)
+            for name in names:
+                if name in values:
+                    self.assertEqual(stats[name][i], values[name])
+                else:
+                    self.assertTrue(math.isnan(stats[name][i]))
+        for name in names:
+            self.assertEqual(stats.descs[name], "Desc of %s" % name)
+
+    def test_text(self):
+        path = self.write("stats.txt", text_stats(first, second))
+        stats = statsfile.load(path)
+        self.check(stats, first, second)
+        self.assertEqual(stats.vector("system.cpu.op_class")[0],
+                         [ "IntAlu", "MemRead", "MemWrite" ])
+        self.assertEqual(stats.match(r"sim_"), [ "sim_ticks" ])
+        self.assertEqual(stats.dump(0), dict(first))
+
+    def test_text_gzip(self):
+        self.check(statsfile.load(self.write("stats.txt.gz",
+                                             text_stats(first))), first)
+
+    def test_text_cache(self):
+        path = self.write("stats.txt", text_stats(first, second))
+        statsfile.load(path, cache=True)
+        for f in statsfile._cachePaths(path):
+            self.assertTrue(os.path.exists(f))
+        self.check(statsfile._loadCache(path), first, second)
+        self.check(statsfile.load(path, cache=True), first, second)
+
+        # A modified source invalidates the cache
+        path = self.write("stats.txt", text_stats(second))
+        self.assertEqual(statsfile._loadCache(path), None)
+        self.check(statsfile.load(path, cache=True), second)
+
+    def test_binary(self):
+        path = self.write("stats.bin", binary_stats(first, first))
+        self.assertTrue(statsfile.isBinary(path))
+        self.check(statsfile.load(path), first, first)
+
+    def test_binary_tables(self):
+        # The columns change between dumps, so the file has two tables
+        # that are merged
+        data = binary_stats(first, second, first)
+        self.check(statsfile.parseBinary(data), first, second, first)
+
+    def test_binary_big_endian(self):
+        data = binary_stats(first, second, order=">")
+        self.check(statsfile.parseBinary(data), first, second)
+
+    def test_binary_gzip(self):
+        path = self.write("stats.bin.gz", binary_stats(first))
+        self.assertTrue(statsfile.isBinary(path))
+        self.check(statsfile.load(path), first)
+
+    def test_binary_truncated(self):
+        data = binary_stats(first, first)
+        self.check(statsfile.parseBinary(data[:-4]), first)
+
+    def test_binary_errors(self):
+        data = binary_stats(first)
+        self.assertRaises(ValueError, statsfile.parseBinary, "x" + data)
+        bad_version = data[:8] + struct.pack("<I", 99) + data[12:]
+        self.assertRaises(ValueError, statsfile.parseBinary, bad_version)
+        bad_tag = data + struct.pack("<II", ord("X"), 0)
+        self.assertRaises(ValueError, statsfile.parseBinary, bad_tag)
+
+    def test_text_binary_equal(self):
+        text = statsfile.load(self.write("stats.txt",
+                                         text_stats(first, second)))
+        binary = statsfile.load(self.write("stats.bin",
+                                           binary_stats(first, second)))
+        self.assertEqual(text.names, binary.names)
+        self.assertEqual(text.descs, binary.descs)
+        self.assertTrue(np.array_equal(np.isnan(text.data),
+                                       np.isnan(binary.data)))
+        self.assertTrue(np.array_equal(np.nan_to_num(text.data),
+                                       np.nan_to_num(binary.data)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import cPickle
+import hashlib
+import os
+import shutil
+
+# Hashes of files that have already been read by this process. The
+# gem5 binary is shared by all tests in a run, so this makes sure
+# that it's only hashed once.
+_file_hashes = {}
+
+def file_hash(filename):
+    st = os.stat(filename)
+    stamp = (filename, st.st_size, st.st_mtime)
+    if stamp not in _file_hashes:
+        h = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), ""):
+                h.update(block)
+        _file_hashes[stamp] = h.hexdigest()
+
+    return _file_hashes[stamp]
+
+def tree_files(path):
+    """List all files below path relative to path in a stable order."""
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for f in sorted(files):
+            yield os.path.relpath(os.path.join(root, f), path)
+
+class ResultCache(object):
+    """Content-addressed cache of test results.
+
+    Each entry is identified by a key that the test derives from
+    everything that could influence its outcome (see
+    Test.cache_key()). An entry contains the pickled TestResult and a
+    copy of the files the test produced in its output directory. When
+    a test with the same key is run again, the output files are
+    restored and the cached result is returned instead of simulating.
+
+    Cache entries are stored as:
+        <cache_dir>/<key[:2]>/<key>/result.pickle
+        <cache_dir>/<key[:2]>/<key>/files/...
+
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def load(self, key, output_dir):
+        """Restore the outputs of a cached test to output_dir and return
+        its result. Returns None if the key isn't in the cache.
+
+        Any previous contents of output_dir are removed first, so the
+        directory holds exactly the files of the cached run.
+
+        """
+
+        entry = self.entry_dir(key)
+        files = os.path.join(entry, "files")
+        try:
+            with open(os.path.join(entry, "result.pickle"), "rb") as f:
+                result = cPickle.load(f)
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            return None
+        if not os.path.isdir(files):
+            return None
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        shutil.copytree(files, output_dir)
+
+        return result
+
+    def store(self, key, output_dir, result):
+        """Store a test result and the contents of its output directory.
+
+        Entries are written to a temporary directory and renamed into
+        place, so concurrent test runs sharing a cache never see
+        partial entries.
+
+        """
+
+        entry = self.entry_dir(key)
+        if os.path.exists(entry):
+            return
+
+        tmp = '%s.%d' % (entry, os.getpid())
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+        shutil.copytree(output_dir, os.path.join(tmp, "files"))
+        with open(os.path.join(tmp, "result.pickle"), "wb") as f:
+            cPickle.dump(result, f, 2)
+
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp)
@@ -73,14 +73,21 @@ class UnitResult(object):
         STATE_FAILURE : "FAILURE",
     }
 
+    # Structured differences (e.g., StatDelta tuples from the stat
+    # differ) reported by units that compare outputs. This is a class
+    # attribute to provide a default for results pickled before it was
+    # introduced.
+    deltas = ()
+
     def __init__(self, name, state, message="", stderr="", stdout="",
-                 runtime=0.0):
+                 runtime=0.0, deltas=()):
         self.name = name
         self.state = state
         self.message = message
         self.stdout = stdout
         self.stderr = stderr
         self.runtime = runtime
+        self.deltas = deltas
 
     def skipped(self):
         return self.state == UnitResult.STATE_SKIPPED
@@ -142,8 +149,21 @@ class TestResult(object):
         return all([ r for r in self.results ])
 
 class ResultFormatter(object):
+    """Base class for test result formatters.
+
+    Formatters that can output one suite at a time set streaming to
+    True and implement dump_suite(suite). This allows the test runner
+    to output results as soon as a test has completed instead of
+    waiting for the entire test run to finish. Other formatters only
+    implement dump_suites(), which the runner calls once with all
+    suites.
+
+    """
+
     __metaclass__ = ABCMeta
 
+    streaming = False
+
     def __init__(self, fout=sys.stdout, verbose=False):
         self.verbose = verbose
         self.fout = fout
@@ -167,31 +187,40 @@ class Pickle(ResultFormatter):
 class Text(ResultFormatter):
     """Output test results as text."""
 
+    streaming = True
+
     def __init__(self, **kwargs):
         super(Text, self).__init__(**kwargs)
 
-    def dump_suites(self, suites):
+    def dump_suite(self, suite):
         fout = self.fout
-        for suite in suites:
-            print >> fout, "--- %s ---" % suite.name
+        print >> fout, "--- %s ---" % suite.name
+
+        for t in suite.results:
+            print >> fout, "*** %s" % t
 
-            for t in suite.results:
-                print >> fout, "*** %s" % t
+            if t and not self.verbose:
+                continue
 
-                if t and not self.verbose:
-                    continue
+            if t.message:
+                print >> fout, t.message
 
-                if t.message:
-                    print >> fout, t.message
+            if t.stderr:
+                print >> fout, t.stderr
+            if t.stdout:
+                print >> fout, t.stdout
 
-                if t.stderr:
-                    print >> fout, t.stderr
-                if t.stdout:
-                    print >> fout, t.stdout
+        fout.flush()
+
+    def dump_suites(self, suites):
+        for suite in suites:
+            self.dump_suite(suite)
 
 class TextSummary(ResultFormatter):
     """Output test results as a text summary"""
 
+    streaming = True
+
     def __init__(self, **kwargs):
         super(TextSummary, self).__init__(**kwargs)
 
@@ -205,11 +234,14 @@ class TextSummary(ResultFormatter):
         else:
             return "FAILED"
 
+    def dump_suite(self, suite):
+        status = self.test_status(suite)
+        print >> self.fout, "%s: %s" % (suite.name, status)
+        self.fout.flush()
+
     def dump_suites(self, suites):
-        fout = self.fout
         for suite in suites:
-            status = self.test_status(suite)
-            print >> fout, "%s: %s" % (suite.name, status)
+            self.dump_suite(suite)
 
 class JUnit(ResultFormatter):
     """Output test results as JUnit XML"""
@@ -225,11 +257,29 @@ class JUnit(ResultFormatter):
         else:
             self.name_table = string.maketrans("", "")
 
+    @staticmethod
+    def format_delta(delta):
+        if delta.new is None:
+            return "%s -> (missing)" % delta.ref
+        elif delta.ref is None:
+            return "(new) -> %s" % delta.new
+        elif delta.abs_diff is None:
+            return "%s -> %s" % (delta.ref, delta.new)
+        else:
+            return "%s -> %s (%+.2f%%)" % (delta.ref, delta.new,
+                                           delta.rel_diff)
+
     def convert_unit(self, x_suite, test):
         x_test = ET.SubElement(x_suite, "testcase",
                                name=test.name,
                                time="%f" % test.runtime)
 
+        if test.deltas:
+            x_props = ET.SubElement(x_test, "properties")
+            for d in test.deltas:
+                ET.SubElement(x_props, "property",
+                              name=d.name, value=self.format_delta(d))
+
         x_state = None
         if test.state == UnitResult.STATE_OK:
             pass
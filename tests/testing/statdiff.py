@@ -0,0 +1,316 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from collections import namedtuple
+import math
+import re
+
+begin_marker = "---------- Begin Simulation Statistics ----------"
+end_marker = "---------- End Simulation Statistics   ----------"
+
+StatDelta = namedtuple("StatDelta", (
+    "dump",     # Index of the stat dump (0 for the first dump)
+    "name",     # Stat name (vector elements as name::element)
+    "ref",      # Reference value (string as in stats.txt)
+    "new",      # New value (string as in stats.txt)
+    "abs_diff", # new - ref, None if a value isn't a number
+    "rel_diff", # Relative change in percent, inf if ref is 0
+))
+
+def parse_value(value):
+    """Convert the value field of a stat line to a float.
+
+    Distribution buckets include the PDF and CDF in addition to the
+    sample count. Only the count is compared since the other two are
+    derived from it. Values that aren't numbers (e.g., no_value)
+    return None.
+
+    """
+    try:
+        return float(value.split(None, 1)[0])
+    except (ValueError, IndexError):
+        return None
+
+def stat_lines(fin):
+    """Generate (dump, name, value) tuples from a stats file.
+
+    Vectors and distributions are reported one element at a time
+    (e.g., "system.cpu.op_class::IntAlu"). The value is the raw
+    string from the file with the description stripped.
+
+    """
+
+    # util/statsfile.py has a similar parser, but it isn't on the
+    # path of the test harness and it converts the values to floats.
+    # The differ needs the raw strings to print values with their
+    # original precision and to report non-numeric values.
+
+    dump = -1
+    in_dump = False
+    for line in fin:
+        if line.startswith(begin_marker):
+            dump += 1
+            in_dump = True
+            continue
+        elif line.startswith(end_marker):
+            in_dump = False
+            continue
+        elif not in_dump:
+            continue
+
+        body = line.partition("#")[0]
+        fields = body.split(None, 1)
+        if len(fields) != 2:
+            continue
+
+        yield dump, fields[0], " ".join(fields[1].split())
+
+class StatDiff(object):
+    """Result of comparing two stats files.
+
+    deltas -- Stats whose difference exceeds their tolerance
+    key_stats -- Deltas of the key stats, changed or not
+    missing -- (dump, name, value) of stats only in the reference
+    added -- (dump, name, value) of stats only in the new file
+    max_error -- Largest relative change (in percent) of any
+                 compared stat
+
+    """
+
+    def __init__(self):
+        self.deltas = []
+        self.key_stats = []
+        self.missing = []
+        self.added = []
+        self.max_error = 0.0
+
+    def __nonzero__(self):
+        return not self.deltas and not self.missing and not self.added
+
+    def all_deltas(self):
+        """Get all differences as StatDelta tuples. Missing stats have
+        new set to None and added stats have ref set to None.
+
+        """
+
+        return self.deltas + \
+            [ StatDelta(dump, name, value, None, None, None)
+              for dump, name, value in self.missing ] + \
+            [ StatDelta(dump, name, None, value, None, None)
+              for dump, name, value in self.added ]
+
+    def format(self, max_deltas=20):
+        """Format the differences in the same way as the old diff-out
+        script.
+
+        """
+
+        def value_fmt(*values):
+            digits = max([ len(v) - v.rfind(".") - 1 if "." in v else 0
+                           for v in values ])
+            return "%%10.%df" % digits
+
+        def delta_line(d):
+            if d.abs_diff is None:
+                return "  %-30s %10s %10s" % (d.name, d.ref, d.new)
+
+            fmt = value_fmt(d.ref, d.new)
+            return ("  %%-30s %s %s %s  %%+7.2f%%%%" % (fmt, fmt, fmt)) % (
+                d.name, parse_value(d.ref), parse_value(d.new),
+                d.abs_diff, d.rel_diff)
+
+        lines = [
+            "Maximum error magnitude: %+f%%" % self.max_error,
+            "",
+            "  %-30s %10s %10s %10s   %7s" % (
+                " ", "Reference", "New Value", "Abs Diff", "Pct Chg"),
+            "Key statistics:",
+            "",
+        ]
+        lines += [ delta_line(d) for d in
+                   sorted(self.key_stats, key=lambda d: (d.name, d.dump)) ]
+
+        lines += [ "", "Differences:", "" ]
+        deltas = sorted(self.deltas, key=lambda d: -abs(d.rel_diff))
+        if max_deltas:
+            deltas = deltas[:max_deltas]
+        lines += [ delta_line(d) for d in deltas ]
+        if len(deltas) < len(self.deltas):
+            lines.append("[... showing top %i errors only, additional " \
+                         "errors omitted ...]" % max_deltas)
+
+        for title, stats in (("Missing %i reference statistics:",
+                              self.missing),
+                             ("Found %i new statistics:", self.added)):
+            if stats:
+                lines += [ "", title % len(stats), "" ]
+                lines += [ "  %-50s    %s" % (name, value)
+                           for dump, name, value in stats ]
+
+        return "\n".join(lines) + "\n"
+
+class StatDiffer(object):
+    """Compare gem5 stats files.
+
+    Both files are read in a single pass. Stats are matched by name
+    and dump number. Since both files normally list stats in the same
+    order, only stats that appear out of order need to be buffered.
+
+    Tolerances are specified as a list of (regular expression,
+    tolerance) tuples. The tolerance of a stat is the relative change
+    (in percent) allowed by the first expression that matches its
+    name. A tolerance of None means that the stat is ignored. Stats
+    that don't match any expression use the default tolerance.
+
+    """
+
+    # Stats that relate to simulator performance rather than
+    # correctness.
+    default_tolerances = (
+        (re.compile(r"^host_(seconds|tick_rate|inst_rate|op_rate|" \
+                    r"mem_usage)$"), None),
+    )
+
+    # Key stats are always included in the report
+    default_key_stats = re.compile(
+        r"(ipc|committedInsts|committedOps|sim_insts|sim_ops|sim_ticks|" \
+        r"host_inst_rate|host_mem_usage)")
+
+    def __init__(self, tolerances=default_tolerances, tolerance=0.0,
+                 key_stats=default_key_stats):
+        self.tolerances = [ (re.compile(r) if not hasattr(r, "match") else r,
+                             t) for r, t in tolerances ]
+        self.tolerance = tolerance
+        self.key_stats = key_stats
+        self._tolerance_cache = {}
+
+    def stat_tolerance(self, name):
+        try:
+            return self._tolerance_cache[name]
+        except KeyError:
+            pass
+
+        tolerance = self.tolerance
+        for rex, t in self.tolerances:
+            if rex.match(name):
+                tolerance = t
+                break
+
+        self._tolerance_cache[name] = tolerance
+        return tolerance
+
+    def compare(self, result, dump, name, ref, new):
+        is_key = self.key_stats is not None and self.key_stats.search(name)
+        tolerance = self.stat_tolerance(name)
+        if ref == new and not is_key:
+            return
+
+        ref_value, new_value = parse_value(ref), parse_value(new)
+        if ref_value is None or new_value is None:
+            abs_diff, rel_diff = None, float("inf")
+        elif ref_value == new_value or \
+             (math.isnan(ref_value) and math.isnan(new_value)):
+            abs_diff, rel_diff = 0.0, 0.0
+        elif math.isnan(ref_value) or math.isnan(new_value):
+            abs_diff, rel_diff = float("nan"), float("inf")
+        else:
+            abs_diff = new_value - ref_value
+            rel_diff = 100.0 * abs_diff / ref_value if ref_value \
+                       else float("inf")
+
+        delta = StatDelta(dump, name, ref, new, abs_diff, rel_diff)
+        if is_key:
+            result.key_stats.append(delta)
+
+        if tolerance is None or ref == new:
+            return
+
+        error = abs(rel_diff)
+        result.max_error = max(result.max_error, error)
+        if error > tolerance:
+            result.deltas.append(delta)
+
+    def diff(self, ref, new):
+        """Compare two open stats files and return a StatDiff."""
+
+        result = StatDiff()
+        # Stats that have been seen in one file but not yet in the
+        # other.
+        ref_pending = {}
+        new_pending = {}
+
+        def match(key, value, pending, other_pending, is_ref):
+            other = other_pending.pop(key, None)
+            if other is None:
+                pending[key] = value
+            elif is_ref:
+                self.compare(result, key[0], key[1], value, other)
+            else:
+                self.compare(result, key[0], key[1], other, value)
+
+        ref_stats = stat_lines(ref)
+        new_stats = stat_lines(new)
+        while True:
+            r = next(ref_stats, None)
+            n = next(new_stats, None)
+            if r is None and n is None:
+                break
+
+            if r is not None and n is not None and r[:2] == n[:2]:
+                self.compare(result, r[0], r[1], r[2], n[2])
+                continue
+
+            if r is not None:
+                match(r[:2], r[2], ref_pending, new_pending, True)
+            if n is not None:
+                match(n[:2], n[2], new_pending, ref_pending, False)
+
+        result.missing = sorted([ k + (v, ) for k, v in ref_pending.items() ])
+        result.added = sorted([ k + (v, ) for k, v in new_pending.items() ])
+
+        return result
+
+    def diff_files(self, ref_name, new_name):
+        with open(ref_name, "r") as ref, open(new_name, "r") as new:
+            return self.diff(ref, new)
+
+if __name__ == "__main__":
+    # Command line interface compatible with the exit status of the
+    # old diff-out script: 0 if the files match, 1 otherwise.
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description="Compare two gem5 stats files")
+    parser.add_argument("ref", type=str, help="Reference stats file")
+    parser.add_argument("new", type=str, help="New stats file")
+    parser.add_argument("-t", type=float, default=0.0, metavar="PERCENT",
+                        help="Ignore differences below PERCENT")
+    parser.add_argument("-n", type=int, default=20, metavar="NUM",
+                        help="Print top NUM differences (0 for all)")
+    args = parser.parse_args()
+
+    diff = StatDiffer(tolerance=args.t).diff_files(args.ref, args.new)
+    sys.stdout.write(diff.format(max_deltas=args.n))
+    sys.exit(0 if diff else 1)
@@ -42,6 +42,8 @@ import os
 from collections import namedtuple
 from units import *
 from results import TestResult
+from cache import file_hash, tree_files
+import hashlib
 import shutil
 
 _test_base = os.path.join(os.path.dirname(__file__), "..")
@@ -172,12 +174,18 @@ class Test(object):
     phase (units from verify_units()). The verify phase is skipped if
     the run phase fails.
 
+    Test results can optionally be stored in a ResultCache. Tests that
+    support caching implement cache_key() and their results are
+    replayed from the cache instead of being run when nothing that
+    could affect their outcome has changed.
+
     """
 
     __metaclass__ = ABCMeta
 
-    def __init__(self, name):
+    def __init__(self, name, cache=None):
         self.test_name = name
+        self.cache = cache
 
     @abstractmethod
     def ref_files(self):
@@ -202,9 +210,34 @@ class Test(object):
         """Update reference files with files from a test run"""
         pass
 
+    def cache_key(self):
+        """Get a key that uniquely identifies the inputs of this test or
+        None if the test can't be cached. Tests that can be cached
+        store their outputs in the directory named by the output_dir
+        attribute.
+
+        """
+        return None
+
     def run(self):
         """Run this test case and return a list of results"""
 
+        key = self.cache_key() if self.cache is not None else None
+        if key is None:
+            return self._run()
+
+        result = self.cache.load(key, self.output_dir)
+        if result is None:
+            result = self._run()
+            # Only cache tests that ran successfully. Errors such as
+            # timeouts or crashes could be caused by the host and
+            # should be retried.
+            if result.success_run():
+                self.cache.store(key, self.output_dir, result)
+
+        return result
+
+    def _run(self):
         run_results = [ u.run() for u in self.run_units() ]
         run_ok = all([not r.skipped() and r for r in run_results ])
 
@@ -245,9 +278,11 @@ class ClassicTest(Test):
 
     def __init__(self, gem5, output_dir, config_tuple,
                  timeout=None,
-                 skip=False, skip_diff_out=False, skip_diff_stat=False):
+                 skip=False, skip_diff_out=False, skip_diff_stat=False,
+                 cache=None):
 
-        super(ClassicTest, self).__init__("/".join(config_tuple))
+        super(ClassicTest, self).__init__("/".join(config_tuple),
+                                          cache=cache)
 
         ct = config_tuple
 
@@ -264,6 +299,53 @@ class ClassicTest(Test):
         self.skip_diff_out = skip or skip_diff_out
         self.skip_diff_stat = skip or skip_diff_stat
 
+        # Compute the cache key up front. This ensures that the gem5
+        # binary is hashed once by the parent process instead of once
+        # in every worker when tests are run in parallel.
+        self._cache_key = self._input_hash() if cache is not None else None
+
+    def _input_hash(self):
+        """Hash everything that can affect the outcome of this test: the
+        gem5 binary, the test scripts and configurations, the workload
+        description, the reference files, the test options, and the
+        sources of the testing package itself, since they decide how
+        the output is verified (e.g., statdiff tolerances).
+
+        """
+
+        ct = self.config_tuple
+        h = hashlib.sha1()
+        h.update(repr((tuple(ct), self.skip_run,
+                       self.skip_diff_out, self.skip_diff_stat)))
+        h.update(file_hash(self.gem5))
+
+        inputs = [ self.script ]
+        for d in (os.path.join(_test_base, "configs"),
+                  os.path.join(_test_base, "..", "configs"),
+                  self.ref_dir):
+            inputs += [ os.path.join(d, f) for f in tree_files(d)
+                        if f not in ClassicTest.ref_ignore_files and
+                        not f.endswith(".pyc") ]
+
+        testing_dir = os.path.dirname(os.path.abspath(__file__))
+        inputs += [ os.path.join(testing_dir, f)
+                    for f in tree_files(testing_dir) if f.endswith(".py") ]
+
+        workload_dir = os.path.join(_test_base, ct.category, ct.mode,
+                                    ct.workload)
+        inputs += [ os.path.join(workload_dir, f)
+                    for f in sorted(os.listdir(workload_dir))
+                    if os.path.isfile(os.path.join(workload_dir, f)) ]
+
+        for f in inputs:
+            h.update(os.path.relpath(f, _test_base))
+            h.update(file_hash(f))
+
+        return h.hexdigest()
+
+    def cache_key(self):
+        return self._cache_key
+
     def ref_files(self):
         ref_dir = os.path.abspath(self.ref_dir)
         for root, dirs, files in os.walk(ref_dir, topdown=False):
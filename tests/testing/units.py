@@ -49,6 +49,7 @@ import traceback
 
 from results import UnitResult
 from helpers import *
+from statdiff import StatDiffer
 
 _test_base = os.path.join(os.path.dirname(__file__), "..")
 
@@ -261,30 +262,31 @@ class DiffOutFile(TestUnit):
                            % (fname, fname))
 
 class DiffStatFile(TestUnit):
-    """Test unit comparing two gem5 stat files."""
+    """Test unit comparing two gem5 stat files.
 
-    def __init__(self, **kwargs):
+    The comparison is done in-process by a StatDiffer. The differences
+    are returned both as a text report (stdout) and as a list of
+    StatDelta tuples in the deltas attribute of the result.
+
+    """
+
+    def __init__(self, differ=None, **kwargs):
         super(DiffStatFile, self).__init__("stat_diff", **kwargs)
 
-        self.stat_diff = os.path.join(_test_base, "diff-out")
+        self.differ = differ if differ is not None else StatDiffer()
 
     def _run(self):
         stats = "stats.txt"
+        ref = self.ref_file(stats)
+        out = self.out_file(stats)
 
-        cmd = [
-            self.stat_diff,
-            self.ref_file(stats), self.out_file(stats),
-        ]
-        with ProcessHelper(cmd,
-                           stdout=subprocess.PIPE,
-                           stderr=subprocess.PIPE) as p:
-            status, stdout, stderr = p.call()
+        if not os.path.exists(out):
+            return self.error("%s doesn't exist in output directory" % stats)
 
-        if status == 0:
-            return self.ok(stdout=stdout, stderr=stderr)
-        if status == 1:
-            return self.failure("Statistics mismatch",
-                                stdout=stdout, stderr=stderr)
+        diff = self.differ.diff_files(ref, out)
+        if diff:
+            return self.ok(stdout=diff.format())
         else:
-            return self.error("diff-out returned an error: %i" % status,
-                              stdout=stdout, stderr=stderr)
+            return self.failure("Statistics mismatch",
+                                stdout=diff.format(),
+                                deltas=diff.all_deltas())
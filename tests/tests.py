@@ -38,11 +38,14 @@
 # Authors: Andreas Sandberg
 
 import argparse
+import multiprocessing
+import signal
 import sys
 import os
 import pickle
 
 from testing.tests import *
+import testing.cache
 import testing.results
 
 class ParagraphHelpFormatter(argparse.HelpFormatter):
@@ -171,14 +174,118 @@ def _run_tests_args(subparsers):
     parser.add_argument("--skip-diff-stat", action="store_true",
                         help="Skip stat diffing stage")
 
+    parser.add_argument("--jobs", "-j",
+                        type=int, default=1,
+                        help="Number of tests to run in parallel")
+
+    parser.add_argument("--history", type=argparse.FileType("rb"),
+                        action="append", default=[],
+                        help="Pickled results from a previous run used to " \
+                        "schedule long-running tests first")
+
+    parser.add_argument("--cache", type=str, default=None,
+                        metavar="DIRECTORY",
+                        help="Result cache directory. Tests whose inputs " \
+                        "haven't changed are replayed from the cache.")
+
     _add_format_args(parser)
 
+# Name of the per-test result pickle that the build system stores in
+# each test's output directory. Runtimes from previous scons runs are
+# picked up from it, but the run command never writes it: scons uses
+# it as the target of the test and would take a stale file for an
+# up-to-date result.
+_status_pickle = "status.pickle"
+
+# Name of the per-test runtime pickle written by the run command
+_runtime_pickle = "runtime.pickle"
+
+def _load_runtimes(tests, history):
+    """Get the runtimes of tests from previous runs.
+
+    Runtimes are taken from the status and runtime pickles in each
+    test's output directory and the pickled result files in
+    history. Runtimes recorded by the run command take precedence over
+    those from scons, and results from the history files take
+    precedence over both. Tests that haven't been run before aren't
+    included in the returned dictionary.
+
+    """
+
+    def load(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+
+    runtimes = {}
+    for test in tests:
+        suites = load(os.path.join(test.output_dir, _status_pickle))
+        if suites:
+            runtimes.update([ (s.name, s.runtime()) for s in suites
+                              if not s.skipped() ])
+        runtime = load(os.path.join(test.output_dir, _runtime_pickle))
+        if runtime is not None:
+            runtimes[test.test_name] = runtime
+
+    for f in history:
+        runtimes.update([ (s.name, s.runtime()) for s in pickle.load(f)
+                          if not s.skipped() ])
+
+    return runtimes
+
+def _init_worker():
+    # Let the parent process handle keyboard interrupts and terminate
+    # the pool.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _run_test(job):
+    testno, test = job
+    return testno, test.run()
+
+def _run_serial(tests):
+    for testno, test in enumerate(tests):
+        print "%i: Running '%s'..." % (testno, test)
+        yield testno, test.run()
+
+def _run_pool(tests, jobs, runtimes):
+    """Run tests on a pool of worker processes.
+
+    Tests are scheduled longest first to avoid having a long test
+    starting last and keeping the run going after all other workers
+    have finished. Tests without a known runtime are assumed to be
+    long and are started first. Results are yielded as (test number,
+    result) tuples in the order tests complete.
+
+    """
+
+    def runtime(job):
+        testno, test = job
+        return runtimes.get(test.test_name, float("inf"))
+
+    queue = sorted(enumerate(tests), key=runtime, reverse=True)
+
+    pool = multiprocessing.Pool(processes=jobs, initializer=_init_worker)
+    try:
+        it = pool.imap_unordered(_run_test, queue)
+        for i in range(len(queue)):
+            # Use a timeout to make the wait interruptible.
+            yield it.next(timeout=sys.maxint)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
 def _run_tests(args):
     formatter = _create_formatter(args)
 
     out_base = os.path.abspath(args.directory)
     if not os.path.exists(out_base):
         os.mkdir(out_base)
+    cache = testing.cache.ResultCache(args.cache) if args.cache else None
     tests = []
     for test_name in args.test:
         config = ClassicConfig(*test_name.split("/"))
@@ -187,16 +294,35 @@ def _run_tests(args):
             ClassicTest(args.gem5, out_dir, config,
                         timeout=args.timeout,
                         skip_diff_stat=args.skip_diff_stat,
-                        skip_diff_out=args.skip_diff_out))
+                        skip_diff_out=args.skip_diff_out,
+                        cache=cache))
 
-    all_results = []
+    all_results = [ None ] * len(tests)
     print "Running %i tests" % len(tests)
-    for testno, test in enumerate(tests):
-        print "%i: Running '%s'..." % (testno, test)
-
-        all_results.append(test.run())
-
-    formatter.dump_suites(all_results)
+    if args.jobs > 1:
+        runtimes = _load_runtimes(tests, args.history)
+        test_results = _run_pool(tests, args.jobs, runtimes)
+    else:
+        test_results = _run_serial(tests)
+
+    for testno, result in test_results:
+        test = tests[testno]
+        if args.jobs > 1:
+            print "%i: Finished '%s'" % (testno, test)
+
+        if not result.skipped():
+            if not os.path.isdir(test.output_dir):
+                os.makedirs(test.output_dir)
+            with open(os.path.join(test.output_dir, _runtime_pickle),
+                      "wb") as f:
+                pickle.dump(result.runtime(), f)
+
+        all_results[testno] = result
+        if formatter.streaming:
+            formatter.dump_suite(result)
+
+    if not formatter.streaming:
+        formatter.dump_suites(all_results)
 
 def _show_args(subparsers):
     parser = subparsers.add_parser(
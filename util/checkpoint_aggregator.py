@@ -30,10 +30,23 @@
 #          Nilay Vaish
 
 from ConfigParser import ConfigParser
-import gzip
+from multiprocessing.pool import ThreadPool
+from collections import deque
+import Queue
+import threading
+import zlib
 
 import sys, re, os
 
+from protolib import gzipMember
+
+page_size = 1 << 12
+# Memory images are streamed in blocks of this many bytes (a multiple of
+# the page size)
+block_size = 1 << 22
+# Decompressed blocks buffered ahead for each input
+blocks_ahead = 8
+
 class myCP(ConfigParser):
     def __init__(self):
         ConfigParser.__init__(self)
@@ -41,7 +54,121 @@ class myCP(ConfigParser):
     def optionxform(self, optionstr):
         return optionstr
 
-def aggregate(output_dir, cpts, no_compress, memory_size):
+def pmem_blocks(path, size):
+    """
+    Generate the first size bytes of a gzipped memory image in blocks of
+    block_size bytes. At most one block of decompressed data is held in
+    memory at a time.
+    """
+    f = open(path, "rb")
+    # 16 + MAX_WBITS selects the gzip container
+    dec = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = ""
+    try:
+        while size > 0:
+            n = min(block_size, size)
+            buf = bytearray()
+            while len(buf) < n:
+                if not data:
+                    data = f.read(block_size)
+                    if not data:
+                        raise IOError("%s: unexpected end of memory image" %
+                                      path)
+                buf += dec.decompress(data, n - len(buf))
+                if dec.unused_data:
+                    # End of a gzip member, the rest of the input
+                    # belongs to the next one (the input is also left
+                    # in unconsumed_tail in this case).
+                    data = dec.unused_data
+                    dec = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                else:
+                    # Input left over because the block is full
+                    data = dec.unconsumed_tail
+            yield str(buf)
+            size -= n
+    finally:
+        f.close()
+
+class PmemReader(threading.Thread):
+    """Decompress a memory image into a bounded queue of blocks"""
+    def __init__(self, path, size):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.path = path
+        self.size = size
+        self.queue = Queue.Queue(blocks_ahead)
+
+    def run(self):
+        try:
+            for block in pmem_blocks(self.path, self.size):
+                self.queue.put(block)
+            self.queue.put(None)
+        except Exception, e:
+            self.queue.put(e)
+
+    def blocks(self):
+        while True:
+            block = self.queue.get()
+            if block is None:
+                return
+            if isinstance(block, Exception):
+                raise block
+            yield block
+
+class MemImageWriter(object):
+    """
+    Write the aggregated memory image, either as concatenated gzip
+    members compressed by a pool of threads, or as an uncompressed
+    sparse file where all-zero pages are skipped over.
+    """
+    def __init__(self, f, compress, jobs):
+        self.f = f
+        self.compress = compress
+        self.size = 0
+        self.zero_block = "\0" * block_size
+        self.pending = deque()
+        self.jobs = max(1, jobs)
+        self.pool = ThreadPool(self.jobs) if compress else None
+
+    def write(self, block):
+        self.size += len(block)
+        if self.compress:
+            self.pending.append(self.pool.apply_async(gzipMember, (block, 6)))
+            while len(self.pending) > 2 * self.jobs:
+                self.f.write(self.pending.popleft().get())
+            return
+
+        if block == self.zero_block[:len(block)]:
+            self.f.seek(len(block), os.SEEK_CUR)
+            return
+        zero_page = self.zero_block[:page_size]
+        start = 0
+        for pos in xrange(0, len(block), page_size):
+            if block[pos:pos + page_size] == zero_page:
+                if pos > start:
+                    self.f.write(block[start:pos])
+                self.f.seek(page_size, os.SEEK_CUR)
+                start = pos + page_size
+        if start < len(block):
+            self.f.write(block[start:])
+
+    def pad(self, size):
+        """Extend the image with zeros up to size bytes"""
+        while self.size < size:
+            self.write(self.zero_block[:min(block_size, size - self.size)])
+
+    def close(self):
+        if self.compress:
+            while self.pending:
+                self.f.write(self.pending.popleft().get())
+            self.pool.close()
+            self.pool.join()
+        else:
+            # Materialize any trailing hole
+            self.f.truncate(self.size)
+        self.f.close()
+
+def aggregate(output_dir, cpts, no_compress, memory_size, jobs=1):
     merged_config = None
     page_ptr = 0
 
@@ -52,11 +179,9 @@ def aggregate(output_dir, cpts, no_compress, memory_size):
     agg_mem_file = open(output_path + "/system.physmem.store0.pmem", "wb+")
     agg_config_file = open(output_path + "/m5.cpt", "wb+")
 
-    if not no_compress:
-        merged_mem = gzip.GzipFile(fileobj= agg_mem_file, mode="wb")
-
     max_curtick = 0
     num_digits = len(str(len(cpts)-1))
+    cpt_pages = []
 
     for (i, arg) in enumerate(cpts):
         print arg
@@ -94,39 +219,37 @@ def aggregate(output_dir, cpts, no_compress, memory_size):
         if i != len(cpts)-1:
             merged_config.write(agg_config_file)
 
-        ### memory stuff
         pages = int(config.get("system", "pagePtr"))
         page_ptr = page_ptr + pages
-        print "pages to be read: ", pages
+        cpt_pages.append(pages)
 
-        f = open(cpts[i] + "/system.physmem.store0.pmem", "rb")
-        gf = gzip.GzipFile(fileobj=f, mode="rb")
+    ### memory stuff
+    # Inputs are decompressed by up to 'jobs' reader threads ahead of
+    # the one being written out, each buffering a bounded number of
+    # blocks
+    merged_mem = MemImageWriter(agg_mem_file, not no_compress, jobs)
+    readers = [ PmemReader(cpts[i] + "/system.physmem.store0.pmem",
+                           pages * page_size)
+                for (i, pages) in enumerate(cpt_pages) ]
+    for reader in readers[:max(1, jobs)]:
+        reader.start()
 
-        x = 0
-        while x < pages:
-            bytesRead = gf.read(1 << 12)
-            if not no_compress:
-                merged_mem.write(bytesRead)
-            else:
-                agg_mem_file.write(bytesRead)
-            x += 1
-
-        gf.close()
-        f.close()
+    for (i, reader) in enumerate(readers):
+        print "pages to be read from %s: %d" % (cpts[i], cpt_pages[i])
+        for block in reader.blocks():
+            merged_mem.write(block)
+        next_reader = i + max(1, jobs)
+        if next_reader < len(readers):
+            readers[next_reader].start()
 
     merged_config.add_section("system")
     merged_config.set("system", "pagePtr", page_ptr)
     merged_config.set("system", "nextPID", len(cpts))
 
-    file_size = page_ptr * 4 * 1024
-    dummy_data = "".zfill(4096)
-    while file_size < memory_size:
-        if not no_compress:
-            merged_mem.write(dummy_data)
-        else:
-            agg_mem_file.write(dummy_data)
-        file_size += 4 * 1024
-        page_ptr += 1
+    if memory_size and page_ptr * page_size < memory_size:
+        page_ptr += (memory_size - page_ptr * page_size + page_size - 1) / \
+            page_size
+    merged_mem.pad(page_ptr * page_size)
 
     print "WARNING: "
     print "Make sure the simulation using this checkpoint has at least ",
@@ -138,11 +261,8 @@ def aggregate(output_dir, cpts, no_compress, memory_size):
 
     merged_config.write(agg_config_file)
 
-    if not no_compress:
-        merged_mem.close()
-        agg_mem_file.close()
-    else:
-        agg_mem_file.close()
+    merged_mem.close()
+    agg_config_file.close()
 
 if __name__ == "__main__":
     from argparse import ArgumentParser
@@ -150,7 +270,11 @@ if __name__ == "__main__":
                             "hold the checkpoints to be combined>")
     parser.add_argument("-o", "--output-dir", action="store",
                         help="Output directory")
-    parser.add_argument("-c", "--no-compress", action="store_true")
+    parser.add_argument("-c", "--no-compress", action="store_true",
+                        help="Write an uncompressed, sparse memory image")
+    parser.add_argument("-j", "--jobs", action="store", type=int, default=4,
+                        help="Threads used to decompress and compress "\
+                        "memory images")
     parser.add_argument("--cpts", nargs='+')
     parser.add_argument("--memory-size", action="store", type=int)
 
@@ -163,4 +287,4 @@ if __name__ == "__main__":
                      "need to be combined.")
 
     aggregate(options.output_dir, options.cpts, options.no_compress,
-              options.memory_size)
+              options.memory_size, options.jobs)
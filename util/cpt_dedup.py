@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# This script deduplicates the memory images (*.pmem) of checkpoints
+# into a content-addressed page store.  Checkpoints of the same workload
+# (e.g., SimPoint checkpoints) share most of their pages, and each
+# distinct page is only stored once.
+#
+# Storing a checkpoint splits each memory image into pages, adds the
+# pages the store does not have yet, and writes a manifest
+# (<image>.manifest) listing the SHA-1 of every page next to the image,
+# which can then be removed.  Restoring a checkpoint rebuilds ordinary
+# memory images from their manifests, so gem5 itself never sees the
+# store.
+#
+# The store is a directory holding an SQLite index of the pages
+# (chunks.db) and append-only pack files of zlib-compressed pages.  Each
+# process storing checkpoints appends to pack files of its own, so
+# several simulations can share a store.  All-zero pages are never
+# stored.
+#
+# Example:
+#   cpt_dedup.py store -s /work/store -r m5out/
+#   cpt_dedup.py restore -r m5out/
+#   cpt_dedup.py stats -s /work/store
+
+import gzip
+import hashlib
+import os
+import os.path as osp
+import socket
+import sqlite3
+import sys
+import zlib
+
+manifest_magic = 'gem5-pmem-manifest'
+manifest_version = 1
+default_page_size = 1 << 12
+hash_size = hashlib.sha1().digest_size
+zero_hash = '\0' * hash_size
+# Pages are read, hashed and looked up in the index in batches of this
+# many bytes
+batch_size = 1 << 22
+# Maximum number of parameters in one SQLite query
+max_query_args = 500
+# Start a new pack file once the current one reaches this size
+max_pack_size = 1 << 30
+
+class DedupError(Exception):
+    pass
+
+def read_blocks(path, size=batch_size):
+    """Generate the contents of a (possibly gzipped) file in blocks"""
+    raw = open(path, 'rb')
+    try:
+        gzipped = raw.read(2) == '\x1f\x8b'
+        raw.seek(0)
+        f = raw
+        if gzipped:
+            f = gzip.GzipFile(fileobj=raw, mode='rb')
+        while True:
+            block = f.read(size)
+            if not block:
+                break
+            yield block
+    finally:
+        raw.close()
+
+class ChunkStore(object):
+    def __init__(self, path, create=False):
+        self.path = osp.abspath(path)
+        if not osp.isdir(self.path):
+            if not create:
+                raise DedupError("%s is not a checkpoint store" % path)
+            os.makedirs(self.path)
+        self.db = sqlite3.connect(osp.join(self.path, 'chunks.db'),
+                                  timeout=600)
+        self.db.text_factory = str
+        self.db.execute('CREATE TABLE IF NOT EXISTS packs ('
+                        'id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS chunks ('
+                        'hash BLOB PRIMARY KEY, pack INTEGER, '
+                        'offset INTEGER, length INTEGER)')
+        self.db.commit()
+        self.pack = None
+        self.pack_id = None
+        self.packs = {}
+
+    def close(self):
+        if self.pack is not None:
+            self.pack.close()
+            self.pack = None
+        for f in self.packs.itervalues():
+            f.close()
+        self.packs = {}
+        self.db.close()
+
+    def _open_pack(self):
+        if self.pack is not None:
+            self.pack.close()
+        n = 0
+        while True:
+            name = 'pack-%s-%d-%d' % (socket.gethostname(), os.getpid(), n)
+            if not osp.exists(osp.join(self.path, name)):
+                break
+            n += 1
+        self.pack = open(osp.join(self.path, name), 'ab')
+        cursor = self.db.execute('INSERT INTO packs (name) VALUES (?)',
+                                 (name,))
+        self.pack_id = cursor.lastrowid
+
+    def _missing(self, hashes):
+        """Return the subset of hashes that are not in the store"""
+        found = set()
+        hashes = list(hashes)
+        for i in xrange(0, len(hashes), max_query_args):
+            args = [ sqlite3.Binary(h) for h in
+                     hashes[i:i + max_query_args] ]
+            rows = self.db.execute('SELECT hash FROM chunks WHERE hash IN '
+                                   '(%s)' % ','.join('?' * len(args)), args)
+            found.update(str(row[0]) for row in rows)
+        return set(hashes) - found
+
+    def add(self, pages):
+        """
+        Add a list of (hash, data) pages, returns the number of bytes of
+        new data written.
+        """
+        new = {}
+        for digest, data in pages:
+            if digest != zero_hash:
+                new[digest] = data
+        missing = self._missing(new.iterkeys())
+        if not missing:
+            return 0
+
+        if self.pack is None or self.pack.tell() >= max_pack_size:
+            self._open_pack()
+
+        rows = []
+        written = 0
+        for digest in missing:
+            data = zlib.compress(new[digest], 1)
+            offset = self.pack.tell()
+            self.pack.write(data)
+            rows.append((sqlite3.Binary(digest), self.pack_id, offset,
+                         len(data)))
+            written += len(data)
+        # The pack data has to be on disk before the index refers to it
+        self.pack.flush()
+        os.fsync(self.pack.fileno())
+        self.db.executemany('INSERT OR IGNORE INTO chunks VALUES (?,?,?,?)',
+                            rows)
+        self.db.commit()
+        return written
+
+    def get(self, hashes):
+        """Return the data of a list of page hashes, in order"""
+        locations = {}
+        unique = list(set(hashes) - set([ zero_hash ]))
+        for i in xrange(0, len(unique), max_query_args):
+            args = [ sqlite3.Binary(h) for h in
+                     unique[i:i + max_query_args] ]
+            rows = self.db.execute('SELECT hash, pack, offset, length FROM '
+                                   'chunks WHERE hash IN (%s)' %
+                                   ','.join('?' * len(args)), args)
+            for digest, pack, offset, length in rows:
+                locations[str(digest)] = (pack, offset, length)
+
+        data = {}
+        for digest in unique:
+            if digest not in locations:
+                raise DedupError("page %s is missing from store %s" %
+                                 (digest.encode('hex'), self.path))
+            pack, offset, length = locations[digest]
+            f = self._pack_file(pack)
+            f.seek(offset)
+            data[digest] = zlib.decompress(f.read(length))
+        return [ data.get(digest) for digest in hashes ]
+
+    def _pack_file(self, pack):
+        if pack not in self.packs:
+            name, = self.db.execute('SELECT name FROM packs WHERE id = ?',
+                                    (pack,)).fetchone()
+            self.packs[pack] = open(osp.join(self.path, name), 'rb')
+        return self.packs[pack]
+
+    def stats(self):
+        chunks, length = self.db.execute('SELECT COUNT(*), SUM(length) '
+                                         'FROM chunks').fetchone()
+        packs, = self.db.execute('SELECT COUNT(*) FROM packs').fetchone()
+        return chunks, length or 0, packs
+
+def write_manifest(path, store, size, page_size, hashes):
+    manifest = gzip.open(path + '.tmp', 'wb')
+    manifest.write('%s %d %s %d %d\n' % (manifest_magic, manifest_version,
+                                         store.path, size, page_size))
+    manifest.write(''.join(hashes))
+    manifest.close()
+    os.rename(path + '.tmp', path)
+
+def read_manifest(path):
+    """Return (store path, image size, page size, hashes) of a manifest"""
+    manifest = gzip.open(path, 'rb')
+    try:
+        header = manifest.readline().split()
+        if len(header) != 5 or header[0] != manifest_magic:
+            raise DedupError("%s is not a memory image manifest" % path)
+        if int(header[1]) != manifest_version:
+            raise DedupError("%s has manifest version %s, expected %d" %
+                             (path, header[1], manifest_version))
+        store_path = header[2]
+        size, page_size = int(header[3]), int(header[4])
+        data = manifest.read()
+    finally:
+        manifest.close()
+    hashes = [ data[i:i + hash_size] for i in xrange(0, len(data), hash_size) ]
+    if len(hashes) != (size + page_size - 1) / page_size:
+        raise DedupError("%s is truncated" % path)
+    return store_path, size, page_size, hashes
+
+def store_image(store, path, page_size=default_page_size, remove=False):
+    """
+    Add the pages of a memory image to the store and write its manifest.
+    Returns (image size, bytes added to the store).
+    """
+    zero_page = '\0' * page_size
+    hashes = []
+    size = 0
+    added = 0
+    pending = ''
+    for block in read_blocks(path, batch_size):
+        block = pending + block
+        end = len(block) - len(block) % page_size
+        pending = block[end:]
+        pages = []
+        for pos in xrange(0, end, page_size):
+            page = block[pos:pos + page_size]
+            if page == zero_page:
+                digest = zero_hash
+            else:
+                digest = hashlib.sha1(page).digest()
+            pages.append((digest, page))
+            hashes.append(digest)
+        added += store.add(pages)
+        size += end
+    if pending:
+        digest = hashlib.sha1(pending).digest()
+        added += store.add([ (digest, pending) ])
+        hashes.append(digest)
+        size += len(pending)
+
+    write_manifest(path + '.manifest', store, size, page_size, hashes)
+    if remove:
+        os.remove(path)
+    return size, added
+
+def restore_image(manifest_path, path=None, compress=True, store=None):
+    """
+    Rebuild a memory image from its manifest.  The image is written
+    next to the manifest unless path is given.
+    """
+    store_path, size, page_size, hashes = read_manifest(manifest_path)
+    if path is None:
+        path = manifest_path[:-len('.manifest')]
+    own_store = store is None or store.path != store_path
+    if own_store:
+        store = ChunkStore(store_path)
+
+    tmp_path = path + '.tmp'
+    if compress:
+        out = gzip.open(tmp_path, 'wb', 1)
+    else:
+        out = open(tmp_path, 'wb')
+    try:
+        zero_page = '\0' * page_size
+        pages_per_batch = batch_size / page_size
+        remaining = size
+        for i in xrange(0, len(hashes), pages_per_batch):
+            batch = hashes[i:i + pages_per_batch]
+            for digest, data in zip(batch, store.get(batch)):
+                if data is None:
+                    data = zero_page[:min(page_size, remaining)]
+                out.write(data)
+                remaining -= len(data)
+        out.close()
+        os.rename(tmp_path, path)
+    except:
+        out.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        if own_store:
+            store.close()
+    return path
+
+def checkpoint_images(cpt_dir, suffix='.pmem'):
+    return sorted(osp.join(cpt_dir, name) for name in os.listdir(cpt_dir)
+                  if name.endswith(suffix))
+
+def store_checkpoint(store, cpt_dir, remove=True,
+                     page_size=default_page_size):
+    """Deduplicate all memory images of a checkpoint into the store"""
+    size = added = 0
+    for image in checkpoint_images(cpt_dir):
+        image_size, image_added = store_image(store, image, page_size, remove)
+        size += image_size
+        added += image_added
+    return size, added
+
+def restore_checkpoint(cpt_dir, compress=True):
+    """
+    Rebuild the memory images of a checkpoint that only has manifests,
+    returns the list of images that were rebuilt.
+    """
+    restored = []
+    for manifest in checkpoint_images(cpt_dir, '.pmem.manifest'):
+        image = manifest[:-len('.manifest')]
+        if not osp.exists(image):
+            restored.append(restore_image(manifest, image, compress))
+    return restored
+
+def checkpoint_dirs(path, recurse):
+    if not recurse:
+        return [ path ]
+    return sorted(root for root, dirs, files in os.walk(path)
+                  if 'm5.cpt' in files)
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser("usage: %prog [options] store|restore|stats "
+                          "[checkpoint directory...]")
+    parser.add_option("-s", "--store", help="Checkpoint page store directory")
+    parser.add_option("-r", "--recurse", action="store_true",
+                      help="Process every checkpoint below the directories")
+    parser.add_option("-k", "--keep", action="store_true",
+                      help="Keep the memory images after storing them")
+    parser.add_option("--page-size", type="int", default=default_page_size,
+                      help="Deduplication granularity in bytes "
+                           "[Default: %default]")
+    parser.add_option("-u", "--uncompressed", action="store_true",
+                      help="Restore uncompressed memory images")
+    (options, args) = parser.parse_args()
+
+    if not args or args[0] not in ('store', 'restore', 'stats'):
+        parser.error("You must specify store, restore or stats")
+    command, paths = args[0], args[1:]
+    if command in ('store', 'stats') and not options.store:
+        parser.error("%s needs a store directory (-s)" % command)
+
+    try:
+        if command == 'stats':
+            store = ChunkStore(options.store)
+            chunks, length, packs = store.stats()
+            store.close()
+            print "%d pages, %d bytes compressed in %d pack files" % \
+                (chunks, length, packs)
+            sys.exit(0)
+
+        if not paths:
+            parser.error("You must specify a checkpoint directory")
+
+        store = None
+        if command == 'store':
+            store = ChunkStore(options.store, create=True)
+
+        total_size = total_added = 0
+        for path in paths:
+            for cpt_dir in checkpoint_dirs(path, options.recurse):
+                if command == 'store':
+                    size, added = store_checkpoint(store, cpt_dir,
+                                                   not options.keep,
+                                                   options.page_size)
+                    print "%s: %d bytes of memory, %d new bytes stored" % \
+                        (cpt_dir, size, added)
+                    total_size += size
+                    total_added += added
+                else:
+                    for image in restore_checkpoint(cpt_dir,
+                                                    not options.uncompressed):
+                        print "restored", image
+
+        if store is not None:
+            store.close()
+            print "%d bytes of memory stored as %d new bytes" % \
+                (total_size, total_added)
+    except (DedupError, EnvironmentError, sqlite3.Error), e:
+        print "Error:", e
+        sys.exit(1)
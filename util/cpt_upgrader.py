@@ -127,16 +127,113 @@ class Upgrader:
             Upgrader.legacy[i].depends = [Upgrader.legacy[i-1].tag]
             i = i + 1
 
+class UpgradeError(Exception):
+    pass
+
+# Upgrade plans, in the order the tags are applied, keyed by the set of
+# tags a checkpoint starts with.  Checkpoints from the same simulator
+# version share a tag set, so the dependency loop only runs once for them.
+upgrade_plans = {}
+
+def plan_upgrades(tags):
+    tags = frozenset(tags)
+    if tags in upgrade_plans:
+        return upgrade_plans[tags]
+
+    # Apply migrations for tags not in checkpoint, respecting dependences
+    plan = []
+    applied = set(tags)
+    to_apply = Upgrader.tag_set - applied
+    while to_apply:
+        ready = set([ t for t in to_apply if Upgrader.get(t).ready(applied) ])
+        if not ready:
+            raise UpgradeError("could not apply these upgrades: %s\n"
+                               "upgrade dependences impossible to resolve" %
+                               ' '.join(to_apply))
+        plan += sorted(ready)
+        applied |= ready
+        to_apply -= ready
+
+    upgrade_plans[tags] = plan
+    return plan
+
+def read_version_tags(path):
+    """
+    Return the version tags of a checkpoint by reading only its Globals
+    section, or None if it has none and needs a full parse (e.g., legacy
+    checkpoints with a cpt_ver).
+    """
+    section = None
+    tags = None
+    for line in file(path, 'r'):
+        if line.startswith('['):
+            if section == 'Globals':
+                break
+            section = line.strip()[1:-1]
+        elif section != 'Globals':
+            continue
+        elif tags is not None and line[:1] in ' \t' and line.strip():
+            # continuation of the value
+            tags += line.split()
+        elif line.startswith('version_tags'):
+            key, sep, value = line.partition('=')
+            if not sep:
+                key, sep, value = line.partition(':')
+            if key.strip() == 'version_tags':
+                tags = value.split()
+        elif tags is not None:
+            break
+    return tags
+
+def write_atomic(cpt, path, backup):
+    """
+    Write a checkpoint to a temporary file and rename it over the
+    original, so a checkpoint is never left half written.  The backup is
+    a hard link to the original file where possible.
+    """
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(prefix='.m5.cpt.', dir=osp.dirname(path))
+    try:
+        tmp_file = os.fdopen(fd, 'w')
+        cpt.write(tmp_file)
+        tmp_file.close()
+        os.chmod(tmp_path, os.stat(path).st_mode & 0777)
+        if backup:
+            bak_path = path + '.bak'
+            if osp.exists(bak_path):
+                os.remove(bak_path)
+            try:
+                os.link(path, bak_path)
+            except OSError:
+                import shutil
+                shutil.copyfile(path, bak_path)
+        os.rename(tmp_path, path)
+    except:
+        if osp.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def process_file(path, **kwargs):
+    """
+    Upgrade a checkpoint file in place, returns True if it was changed.
+    """
     if not osp.isfile(path):
         import errno
-        raise IOError(ennro.ENOENT, "No such file", path)
+        raise IOError(errno.ENOENT, "No such file", path)
 
     verboseprint("Processing file %s...." % path)
 
-    if kwargs.get('backup', True):
-        import shutil
-        shutil.copyfile(path, path + '.bak')
+    # Skip checkpoints that are already current without parsing them
+    tags = read_version_tags(path)
+    if tags is not None:
+        tags = set(tags)
+        unknown_tags = tags - Upgrader.tag_set
+        if unknown_tags:
+            print "warning: upgrade script does not recognize the following "\
+                  "tags in this checkpoint:", ' '.join(unknown_tags)
+        if not plan_upgrades(tags):
+            verboseprint("...nothing to do")
+            return False
 
     cpt = ConfigParser.SafeConfigParser()
 
@@ -166,43 +263,92 @@ def process_file(path, **kwargs):
     elif cpt.has_option('Globals','version_tags'):
         tags = set((''.join(cpt.get('Globals','version_tags'))).split())
     else:
-        print "fatal: no version information in checkpoint"
-        exit(1)
+        raise UpgradeError("no version information in checkpoint")
 
     verboseprint("has tags", ' '.join(tags))
     # If the current checkpoint has a tag we don't know about, we have
     # a divergence that (in general) must be addressed by (e.g.) merging
     # simulator support for its changes.
     unknown_tags = tags - Upgrader.tag_set
-    if unknown_tags:
+    if unknown_tags and change:
         print "warning: upgrade script does not recognize the following "\
               "tags in this checkpoint:", ' '.join(unknown_tags)
 
-    # Apply migrations for tags not in checkpoint, respecting dependences
-    to_apply = Upgrader.tag_set - tags
-    while to_apply:
-        ready = set([ t for t in to_apply if Upgrader.get(t).ready(tags) ])
-        if not ready:
-            print "could not apply these upgrades:", ' '.join(to_apply)
-            print "upgrade dependences impossible to resolve; aborting"
-            exit(1)
-
-        for tag in ready:
-            Upgrader.get(tag).upgrade(cpt)
-            tags.add(tag)
-            change = True
-
-        to_apply -= ready
+    for tag in plan_upgrades(tags):
+        Upgrader.get(tag).upgrade(cpt)
+        tags.add(tag)
+        change = True
 
     if not change:
         verboseprint("...nothing to do")
-        return
+        return False
 
     cpt.set('Globals', 'version_tags', ' '.join(tags))
 
     # Write the old data back
     verboseprint("...completed")
-    cpt.write(file(path, 'w'))
+    write_atomic(cpt, path, kwargs.get('backup', True))
+    return True
+
+def process_file_safe(args):
+    """
+    Pool worker for process_file, returns (path, changed, error) where
+    error is None unless the upgrade failed.
+    """
+    path, kwargs = args
+    try:
+        return path, process_file(path, **kwargs), None
+    except (UpgradeError, ConfigParser.Error, EnvironmentError), e:
+        return path, False, str(e)
+    except Exception, e:
+        return path, False, "%s: %s" % (type(e).__name__, e)
+
+def process_tree(path, jobs, **kwargs):
+    """
+    Upgrade every m5.cpt below path using a pool of jobs processes and
+    print a summary.  Returns the number of failed checkpoints.
+    """
+    import time
+    start = time.time()
+
+    paths = []
+    for root,dirs,files in os.walk(path):
+        if 'm5.cpt' in files:
+            paths.append(osp.join(root, 'm5.cpt'))
+    work = [ (p, kwargs) for p in sorted(paths) ]
+
+    if jobs > 1 and len(work) > 1:
+        import multiprocessing
+        # The upgraders are loaded before forking, so the workers
+        # inherit them
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(process_file_safe, work,
+                                      chunksize=max(1, len(work) / (jobs * 8)))
+    else:
+        pool = None
+        results = (process_file_safe(w) for w in work)
+
+    upgraded = 0
+    failed = []
+    for cpt_path, changed, error in results:
+        if error is not None:
+            print "error: %s: %s" % (cpt_path, error)
+            failed.append(cpt_path)
+        elif changed:
+            upgraded += 1
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    elapsed = time.time() - start
+    print "%d checkpoints: %d upgraded, %d already current, %d failed" % \
+        (len(work), upgraded, len(work) - upgraded - len(failed), len(failed))
+    print "%.1fs, %.1f checkpoints/s" % \
+        (elapsed, len(work) / elapsed if elapsed > 0 else 0.0)
+    for cpt_path in failed:
+        print "failed:", cpt_path
+    return len(failed)
 
 if __name__ == '__main__':
     from optparse import OptionParser, SUPPRESS_HELP
@@ -213,6 +359,9 @@ if __name__ == '__main__':
     parser.add_option("-N", "--no-backup", action="store_false",
                       dest="backup", default=True,
                       help="Do no backup each checkpoint before modifying it")
+    parser.add_option("-j", "--jobs", type="int", default=1,
+                      help="Number of checkpoints to upgrade in parallel "\
+                           "when recursing")
     parser.add_option("-v", "--verbose", action="store_true",
                       help="Print out debugging information as")
     parser.add_option("--get-cc-file", action="store_true",
@@ -243,24 +392,23 @@ if __name__ == '__main__':
 
     # Process a single file if we have it
     if osp.isfile(path):
-        process_file(path, **vars(options))
+        cpt_file = path
     # Process an entire directory
     elif osp.isdir(path):
         cpt_file = osp.join(path, 'm5.cpt')
         if options.recurse:
-            # Visit very file and see if it matches
-            for root,dirs,files in os.walk(path):
-                for name in files:
-                    if name == 'm5.cpt':
-                        process_file(osp.join(root,name), **vars(options))
-                for dir in dirs:
-                    pass
+            failed = process_tree(path, options.jobs, backup=options.backup)
+            sys.exit(1 if failed else 0)
         # Maybe someone passed a cpt.XXXXXXX directory and not m5.cpt
-        elif osp.isfile(cpt_file):
-            process_file(cpt_file, **vars(options))
-        else:
+        elif not osp.isfile(cpt_file):
             print "Error: checkpoint file not found at in %s " % path,
             print "and recurse not specified"
             sys.exit(1)
+
+    try:
+        process_file(cpt_file, **vars(options))
+    except UpgradeError, e:
+        print "fatal:", e
+        sys.exit(1)
     sys.exit(0)
 
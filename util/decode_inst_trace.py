@@ -76,7 +76,7 @@ def main():
         exit(-1)
 
     # Open the file in read mode
-    proto_in = protolib.openFileRd(sys.argv[1])
+    proto_in = protolib.openReader(sys.argv[1])
 
     try:
         ascii_out = open(sys.argv[2], 'w')
@@ -113,7 +113,7 @@ def main():
 
     # Decode the inst messages until we hit the end of the file
     optional_fields = ('tick', 'type', 'inst_flags', 'addr', 'size', 'mem_flags')
-    while protolib.decodeMessage(proto_in,  inst):
+    for inst in proto_in.messages(inst):
         # If we have a tick use it, otherwise count instructions
         if inst.HasField('tick'):
             tick = inst.tick
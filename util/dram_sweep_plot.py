@@ -46,9 +46,12 @@ except ImportError:
     print "Failed to import matplotlib and numpy"
     exit(-1)
 
+import os
 import sys
 import re
 
+import statsfile
+
 # Determine the parameters of the sweep from the simout output, and
 # then parse the stats and plot the 3D surface corresponding to the
 # different combinations of parallel banks, and stride size, as
@@ -69,9 +72,7 @@ def main():
     # efficiency
     mode = sys.argv[1][1]
 
-    try:
-        stats = open(sys.argv[2] + '/stats.txt', 'r')
-    except IOError:
+    if not os.path.isfile(sys.argv[2] + '/stats.txt'):
         print "Failed to open ", sys.argv[2] + '/stats.txt', " for reading"
         exit(-1)
 
@@ -101,23 +102,16 @@ def main():
         exit(-1)
 
     # Now parse the stats
-    peak_bw = []
-    bus_util = []
-    avg_pwr = []
+    stats = statsfile.load(sys.argv[2] + '/stats.txt')
 
-    for line in stats:
-        match = re.match(".*busUtil\s+(\d+\.\d+)\s+#.*", line)
-        if match:
-            bus_util.append(float(match.groups(0)[0]))
+    # Get the values of all the stats with a given suffix, dump by dump
+    def values(suffix):
+        data = stats.select(stats.match(".*" + suffix + "$")).ravel()
+        return list(data[~np.isnan(data)])
 
-        match = re.match(".*peakBW\s+(\d+\.\d+)\s+#.*", line)
-        if match:
-            peak_bw.append(float(match.groups(0)[0]))
-
-        match = re.match(".*averagePower\s+(\d+\.?\d*)\s+#.*", line)
-        if match:
-            avg_pwr.append(float(match.groups(0)[0]))
-    stats.close()
+    peak_bw = values("peakBW")
+    bus_util = values("busUtil")
+    avg_pwr = values("averagePower")
 
 
     # Sanity check
@@ -112,12 +112,15 @@ except:
 DepRecord = inst_dep_record_pb2.InstDepRecord
 
 def main():
-    if len(sys.argv) != 3:
-        print "Usage: ", sys.argv[0], " <ASCII input> <protobuf output>"
+    if len(sys.argv) not in (3, 4):
+        print "Usage: ", sys.argv[0], " <ASCII input> <protobuf output>", \
+            "[compression threads]"
         exit(-1)
 
-    # Open the file in write mode
-    proto_out = open(sys.argv[2], 'wb')
+    # Open the file in write mode, the output is buffered and compressed
+    # if the name ends in .gz
+    threads = int(sys.argv[3]) if len(sys.argv) == 4 else 1
+    proto_out = protolib.openWriter(sys.argv[2], threads)
 
     # Open the file in read mode
     try:
@@ -145,12 +148,14 @@ def main():
         enumValues[namestr] = valdesc.number
 
     num_records = 0
-    # For each line in the ASCII trace, create a packet message and
-    # write it to the encoded output
+    # For each line in the ASCII trace, fill in the record message and
+    # write it to the encoded output. The message is reused, and
+    # cleared first as the optional and repeated fields vary per record.
+    dep_record = DepRecord()
     for line in ascii_in:
         inst_info_str, rob_dep_str, reg_dep_str = (line.strip()).split(':')
         inst_info_list = inst_info_str.split(',')
-        dep_record = DepRecord()
+        dep_record.Clear()
 
         dep_record.seq_num = long(inst_info_list[0])
         dep_record.pc = long(inst_info_list[1])
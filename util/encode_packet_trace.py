@@ -81,8 +81,9 @@ except:
         exit(-1)
 
 def main():
-    if len(sys.argv) != 3:
-        print "Usage: ", sys.argv[0], " <ASCII input> <protobuf output>"
+    if len(sys.argv) not in (3, 4):
+        print "Usage: ", sys.argv[0], " <ASCII input> <protobuf output>", \
+            "[compression threads]"
         exit(-1)
 
     try:
@@ -91,11 +92,9 @@ def main():
         print "Failed to open ", sys.argv[1], " for reading"
         exit(-1)
 
-    try:
-        proto_out = open(sys.argv[2], 'wb')
-    except IOError:
-        print "Failed to open ", sys.argv[2], " for writing"
-        exit(-1)
+    # Buffer the output, and compress it if the name ends in .gz
+    threads = int(sys.argv[3]) if len(sys.argv) == 4 else 1
+    proto_out = protolib.openWriter(sys.argv[2], threads)
 
     # Write the magic number in 4-byte Little Endian, similar to what
     # is done in src/proto/protoio.cc
@@ -108,11 +107,12 @@ def main():
     header.tick_freq = 1000000000000
     protolib.encodeMessage(proto_out, header)
 
-    # For each line in the ASCII trace, create a packet message and
-    # write it to the encoded output
+    # For each line in the ASCII trace, fill in the packet message and
+    # write it to the encoded output, all fields are set every time so
+    # the message can be reused
+    packet = packet_pb2.Packet()
     for line in ascii_in:
         cmd, addr, size, tick = line.split(',')
-        packet = packet_pb2.Packet()
         packet.tick = long(tick)
         # ReadReq is 1 and WriteReq is 4 in src/mem/packet.hh Command enum
         packet.cmd = 1 if cmd == 'r' else 4
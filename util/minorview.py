@@ -67,13 +67,18 @@ if __name__ == '__main__':
         help='time of first event to load from file')
     parser.add_argument('--end-time', metavar='time', type=int, default=None,
         help='time of last event to load from file')
+    parser.add_argument('--window', metavar='MB', type=int, default=32,
+        help='megabytes of the event file to load at once, other parts'
+            + ' are loaded when moving through time. 0 loads the whole'
+            + ' file (default: 32)')
     parser.add_argument('--mini-views', action='store_true', default=False,
         help='show tiny views of the next 10 time steps')
     parser.add_argument('eventFile', metavar='event-file', default='ev')
 
     args = parser.parse_args(sys.argv[1:])
 
-    model = BlobModel(unitNamePrefix=args.prefix)
+    model = BlobModel(unitNamePrefix=args.prefix,
+        windowSize=args.window << 20)
 
     if args.picture and os.access(args.picture, os.O_RDONLY):
         model.load_picture(args.picture)
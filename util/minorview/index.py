@@ -0,0 +1,107 @@
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# index.py: tick to file offset index of MinorTrace event files
+#
+# The index is kept next to the event file (as <event-file>.idx) and is
+# rebuilt whenever the event file's size or modification time changes.
+# It holds an entry every index_interval bytes, at the first line of a
+# new tick, so that a window of the file starting at any tick can be
+# read without scanning everything before it.
+
+import bisect
+import os
+import re
+import sys
+
+index_magic = 'MinorViewIndex'
+index_interval = 1 << 20
+
+time_re = re.compile('^\s*(\d+):')
+
+def index_name(file):
+    return file + '.idx'
+
+def build_index(f):
+    """Build the index of the file f as a list of (time, offset)
+    pairs"""
+    index = []
+    time = -1
+    offset = 0
+    next_offset = 0
+    for line in f:
+        match = time_re.match(line)
+        if match is not None:
+            line_time = int(match.group(1))
+            if line_time != time:
+                if offset >= next_offset:
+                    index.append((line_time, offset))
+                    next_offset = offset + index_interval
+                time = line_time
+        offset += len(line)
+    return index
+
+def write_index(name, stat, index):
+    f = open(name, 'w')
+    f.write('%s %d %d\n' % (index_magic, stat.st_size, int(stat.st_mtime)))
+    for entry in index:
+        f.write('%d %d\n' % entry)
+    f.close()
+
+def read_index(name, stat):
+    """Read an index, returns None if it is missing or out of date"""
+    try:
+        f = open(name, 'r')
+    except IOError:
+        return None
+    header = f.readline().split()
+    if header != [index_magic, str(stat.st_size), str(int(stat.st_mtime))]:
+        f.close()
+        return None
+    index = []
+    for line in f:
+        time, offset = line.split()
+        index.append((int(time), int(offset)))
+    f.close()
+    return index
+
+def load_index(file):
+    """Read the index of an event file, building it first if needed"""
+    stat = os.stat(file)
+    name = index_name(file)
+    index = read_index(name, stat)
+    if index is None:
+        print 'Indexing file', file
+        f = open(file)
+        index = build_index(f)
+        f.close()
+        try:
+            write_index(name, stat, index)
+        except IOError:
+            print 'Could not write event file index', name
+    return index
+
+def find_entry(index, time):
+    """Find the number of the last index entry at or before time"""
+    return max(bisect.bisect_right(index, (time, sys.maxint)) - 1, 0)
@@ -41,6 +41,8 @@ from colours import unknownColour
 from point import Point
 import re
 import blobs
+import index
+import bisect
 from time import time as wall_time
 import os
 
@@ -82,6 +84,8 @@ class BlobVisualData(object):
     def __str__(self):
         return ''
 
+id_re = re.compile('^(F;)?(\d+)/(\d+)\.(\d+)/(\d+)(/(\d+)(\.(\d+))?)?')
+
 class Id(BlobVisualData):
     """A line or instruction id"""
     def __init__(self):
@@ -101,8 +105,7 @@ class Id(BlobVisualData):
         return cmp(self.as_list(), right.as_list())
 
     def from_string(self, string):
-        m = re.match('^(F;)?(\d+)/(\d+)\.(\d+)/(\d+)(/(\d+)(\.(\d+))?)?',
-            string)
+        m = id_re.match(string)
 
         def seqnum_from_string(string):
             if string is None:
@@ -174,6 +177,8 @@ class Id(BlobVisualData):
 
         return ret
 
+branch_re = re.compile('^(\w+);(\d+)\.(\d+);([0-9a-fA-Fx]+);(.*)$')
+
 class Branch(BlobVisualData):
     """Branch data new stream and prediction sequence numbers, a branch
     reason and a new PC"""
@@ -185,7 +190,7 @@ class Branch(BlobVisualData):
         self.id = Id()
 
     def from_string(self, string):
-        m = re.match('^(\w+);(\d+)\.(\d+);([0-9a-fA-Fx]+);(.*)$', string)
+        m = branch_re.match(string)
 
         if m is not None:
             self.reason, newStreamSeqNum, newPredictionSeqNum, \
@@ -212,7 +217,7 @@ class Counts(BlobVisualData):
         self.counts = []
 
     def from_string(self, string):
-        self.counts = map(int, re.split('/', string))
+        self.counts = map(int, string.split('/'))
         return self
 
     def to_striped_block(self, select):
@@ -226,6 +231,8 @@ class Colour(BlobVisualData):
     def to_striped_block(self, select):
         return [self.colour]
 
+dcache_access_re = re.compile('^([RW]);([^;]*);.*$')
+
 class DcacheAccess(BlobVisualData):
     """Data cache accesses [RW];id"""
     def __init__(self):
@@ -233,7 +240,7 @@ class DcacheAccess(BlobVisualData):
         self.id = Id()
 
     def from_string(self, string):
-        self.direc, id = re.match('^([RW]);([^;]*);.*$', string).groups()
+        self.direc, id = dcache_access_re.match(string).groups()
         self.id.from_string(id)
         return self
 
@@ -537,9 +544,13 @@ class BlobEvent(object):
             map(find_inst, blocks)
         return sorted(ret)
 
+match_line_re = re.compile('^\s*(\d+):\s*([\w\.]+):\s*(Minor\w+:)?\s*(.*)$')
+leading_spaces_re = re.compile('^ *')
+spaces_re = re.compile('  *')
+
 class BlobModel(object):
     """Model bringing together blob definitions and parsed events"""
-    def __init__(self, unitNamePrefix=''):
+    def __init__(self, unitNamePrefix='', windowSize=0):
         self.blobs = []
         self.unitNameToBlobs = {}
         self.unitEvents = {}
@@ -547,6 +558,18 @@ class BlobModel(object):
         self.picSize = Point(20,10)
         self.lastTime = 0
         self.unitNamePrefix = unitNamePrefix
+        # Number of bytes of the event file to hold in the model at once,
+        #   0 to load all of it.  Other windows are paged in by
+        #   load_window
+        self.windowSize = windowSize
+        self.file = None
+        self.index = []
+        self.endTime = None
+        # Start times of the loaded window and the ones either side of
+        #   it.  None if there is no such window
+        self.windowStart = 0
+        self.nextWindowStart = None
+        self.prevWindowStart = None
 
     def clear_events(self):
         """Drop all events and times"""
@@ -662,11 +685,7 @@ class BlobModel(object):
     def find_time_index(self, time):
         """Find a time index close to the given time (where
         times[return] <= time and times[return+1] > time"""
-        ret = 0
-        lastIndex = len(self.times) - 1
-        while ret < lastIndex and self.times[ret + 1] <= time:
-            ret += 1
-        return ret
+        return max(bisect.bisect_right(self.times, time) - 1, 0)
 
     def add_minor_inst(self, rest):
         """Parse and add a MinorInst line to the model"""
@@ -683,8 +702,8 @@ class BlobModel(object):
             del other_pairs['inst']
 
             # Collapse unnecessary spaces in disassembly
-            disassembly = re.sub('  *', ' ',
-                re.sub('^ *', '', pairs['inst']))
+            disassembly = spaces_re.sub(' ',
+                leading_spaces_re.sub('', pairs['inst']))
 
             inst = Inst(id, disassembly, addr, other_pairs)
             self.add_inst(inst)
@@ -719,8 +738,78 @@ class BlobModel(object):
 
             self.add_line(LineFault(id, pairs['fault'], vaddr, other_pairs))
 
+    def add_trace_event(self, unit, time, rest):
+        """Parse and add a MinorTrace line to the model"""
+        event = BlobEvent(unit, time, {})
+        pairs = parse.parse_pairs(rest)
+        event.pairs = pairs
+
+        # Try to decode the colour data for this event
+        blobs = self.unitNameToBlobs.get(unit, [])
+        for blob in blobs:
+            if blob.visualDecoder is not None:
+                event.visuals[blob.picChar] = (
+                    blob.visualDecoder(pairs))
+
+        self.add_unit_event(event)
+        return event
+
     def load_events(self, file, startTime=0, endTime=None):
-        """Load an event file and add everything to this model"""
+        """Load an event file and add everything to this model.  If the
+        model has a windowSize, only the window of the file starting at
+        startTime is loaded"""
+        if not os.access(file, os.R_OK):
+            print 'Can\'t open file', file
+            exit(1)
+        else:
+            print 'Opening file', file
+
+        self.file = file
+        self.index = index.load_index(file)
+        self.endTime = endTime
+        self.load_window(startTime)
+
+    def has_next_window(self):
+        return self.nextWindowStart is not None
+
+    def has_prev_window(self):
+        return self.prevWindowStart is not None
+
+    def load_next_window(self):
+        self.load_window(self.nextWindowStart)
+
+    def load_prev_window(self):
+        self.load_window(self.prevWindowStart)
+
+    def load_last_window(self):
+        """Load the last window of the file (or up to endTime)"""
+        entries = self.index
+        if self.endTime is not None:
+            entries = entries[:index.find_entry(self.index,
+                self.endTime) + 1]
+        if not self.windowSize or not entries:
+            self.load_window(self.windowStart)
+            return
+
+        # Walk back from the end of the file a window's worth of bytes
+        endOffset = os.path.getsize(self.file)
+        entry = len(entries) - 1
+        while entry > 0 and endOffset - entries[entry - 1][1] <= \
+            self.windowSize:
+            entry -= 1
+        self.load_window(entries[entry][0])
+
+    def window_contains(self, time):
+        """Is time within the loaded window?"""
+        return time >= self.windowStart and (self.nextWindowStart is None or
+            time < self.nextWindowStart)
+
+    def load_window(self, startTime):
+        """Load the events of self.file from startTime until the end of
+        the window.  MinorInst/MinorLine definitions and the last
+        MinorTrace line of each unit from the index entry before the
+        window are also loaded so that the window starts with the state
+        of the pipeline at that time"""
         def update_comments(comments, time):
             # Add a list of comments to an existing event, if there is one at
             #   the given time, or create a new, correctly-timed, event from
@@ -743,54 +832,88 @@ class BlobModel(object):
 
         self.clear_events()
 
+        if startTime is None:
+            startTime = 0
+        endTime = self.endTime
+
         # A negative time will *always* be different from an event time
         time = -1
-        time_events = {}
         last_time_lines = {}
         minor_trace_line_count = 0
         comments = []
 
+        # The last MinorTrace line for each unit seen before startTime
+        #   and the events made from them at the start of the window
+        lead_in_lines = {}
+        lead_in_events = {}
+
         default_colour = [[colours.unknownColour]]
         next_progress_print_event_count = 1000
 
-        if not os.access(file, os.R_OK):
-            print 'Can\'t open file', file
-            exit(1)
-        else:
-            print 'Opening file', file
-
-        f = open(file)
+        f = open(self.file)
 
         start_wall_time = wall_time()
 
-        # Skip leading events
-        still_skipping = True
-        l = f.readline()
-        while l and still_skipping:
-            match = re.match('^\s*(\d+):', l)
-            if match is not None:
-                event_time = match.groups()
-                if int(event_time[0]) >= startTime:
-                    still_skipping = False
-                else:
-                    l = f.readline()
-            else:
-                l = f.readline()
-
-        match_line_re = re.compile(
-            '^\s*(\d+):\s*([\w\.]+):\s*(Minor\w+:)?\s*(.*)$')
+        # Find the index entries for the lead in and the end of the window
+        self.windowStart = startTime
+        self.nextWindowStart = None
+        self.prevWindowStart = None
+        offset = 0
+        end_offset = None
+        if self.index:
+            entry = index.find_entry(self.index, startTime)
+            # Start reading an entry early to pick up the lead in
+            offset = self.index[max(entry - 1, 0)][1]
+            if self.windowSize:
+                window_offset = self.index[entry][1]
+                if startTime > self.index[0][0]:
+                    prev_entry = entry
+                    while prev_entry > 0 and window_offset - \
+                        self.index[prev_entry - 1][1] <= self.windowSize:
+                        prev_entry -= 1
+                    if prev_entry == entry and \
+                        self.index[entry][0] >= startTime:
+                        prev_entry -= 1
+                    self.prevWindowStart = self.index[prev_entry][0]
+                next_entry = entry + 1
+                while next_entry < len(self.index) and \
+                    self.index[next_entry][1] - window_offset < \
+                    self.windowSize:
+                    next_entry += 1
+                if next_entry < len(self.index):
+                    end_time, end_offset = self.index[next_entry]
+                    if endTime is None or end_time <= endTime:
+                        self.nextWindowStart = end_time
+            f.seek(offset)
+
+        unit_re = re.compile('^' + self.unitNamePrefix + '\.?(.*)$')
 
         # Parse each line of the events file, accumulating comments to be
         #   attached to MinorTrace events when the time changes
         reached_end_time = False
+        l = f.readline()
         while not reached_end_time and l:
+            if end_offset is not None and offset >= end_offset:
+                break
+            offset += len(l)
+
             match = match_line_re.match(l)
             if match is not None:
                 event_time, unit, line_type, rest = match.groups()
                 event_time = int(event_time)
 
-                unit = re.sub('^' + self.unitNamePrefix + '\.?(.*)$',
-                    '\\1', unit)
+                unit = unit_re.sub('\\1', unit)
+
+                if event_time < startTime:
+                    # Lead in, only keep the state of the units
+                    if line_type == 'MinorTrace:':
+                        lead_in_lines[unit] = rest
+                    elif line_type == 'MinorInst:':
+                        self.add_minor_inst(rest)
+                    elif line_type == 'MinorLine:':
+                        self.add_minor_line(rest)
+                    l = f.readline()
+                    continue
 
                 # When the time changes, resolve comments
                 if event_time != time:
@@ -800,6 +923,18 @@ class BlobModel(object):
                             self.numEvents + 1000)
                     update_comments(comments, time)
                     comments = []
+
+                    # Show the lead in state at the first time in the
+                    #   window
+                    if time == -1:
+                        for lead_in_unit, lead_in_rest in \
+                            lead_in_lines.iteritems():
+                            lead_in_events[lead_in_unit] = \
+                                self.add_trace_event(lead_in_unit,
+                                    event_time, lead_in_rest)
+                            last_time_lines[lead_in_unit] = lead_in_rest
+                        lead_in_lines = {}
+
                     time = event_time
 
                 if line_type is None:
@@ -811,18 +946,15 @@ class BlobModel(object):
                     # Only insert this event if it's not the same as
                     #   the last event we saw for this unit
                     if last_time_lines.get(unit, None) != rest:
-                        event = BlobEvent(unit, event_time, {})
-                        pairs = parse.parse_pairs(rest)
-                        event.pairs = pairs
-
-                        # Try to decode the colour data for this event
-                        blobs = self.unitNameToBlobs.get(unit, [])
-                        for blob in blobs:
-                            if blob.visualDecoder is not None:
-                                event.visuals[blob.picChar] = (
-                                    blob.visualDecoder(pairs))
-
-                        self.add_unit_event(event)
+                        # Replace any lead in event at the same time
+                        lead_in_event = lead_in_events.pop(unit, None)
+                        events = self.unitEvents.get(unit, [])
+                        if lead_in_event is not None and \
+                            lead_in_event.time == event_time and \
+                            len(events) > 0 and events[-1] is lead_in_event:
+                            events.pop()
+                            self.numEvents -= 1
+                        self.add_trace_event(unit, event_time, rest)
                         last_time_lines[unit] = rest
                 elif line_type == 'MinorInst:':
                     self.add_minor_inst(rest)
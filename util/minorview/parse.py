@@ -37,11 +37,14 @@
 
 import re
 
+pair_re = re.compile('(\w+)(=("[^"]*"|[^\s]*))?')
+quoted_re = re.compile('^"(.*)"$')
+
 def list_parser(names):
     """Parse a list of elements, some of which might be one-level sublists
     within parentheses, into a a list of lists of those elements.  For
     example: list_parser('(a,b),c') -> [['a', 'b'], 'c']"""
-    elems = re.split(',', names)
+    elems = names.split(',')
     ret = []
     accum = []
     for elem in elems:
@@ -80,11 +83,11 @@ def parse_pairs_list(pairString):
     """parse a string like 'name=value name2=value2' into a
     list of pairs of ('name', 'value') ..."""
     ret = []
-    pairs = re.finditer('(\w+)(=("[^"]*"|[^\s]*))?', pairString)
+    pairs = pair_re.finditer(pairString)
     for pair in pairs:
         name, rest, value = pair.groups()
         if value is not None:
-            value = re.sub('^"(.*)"$', '\\1', value)
+            value = quoted_re.sub('\\1', value)
             ret.append((name, value))
         else:
             ret.append((name, ''))
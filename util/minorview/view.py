@@ -284,37 +284,59 @@ class BlobController(object):
 
     def time_start(self, button):
         """Start pressed"""
+        if self.model.has_prev_window():
+            self.model.load_window(self.startTime)
         self.set_time_index(0)
         self.view.redraw()
 
     def time_end(self, button):
         """End pressed"""
+        if self.model.has_next_window():
+            self.model.load_last_window()
         self.set_time_index(len(self.model.times) - 1)
         self.view.redraw()
 
+    def at_end(self):
+        """Is the view at the last time in the event file"""
+        return self.view.timeIndex >= len(self.model.times) - 1 and \
+            not self.model.has_next_window()
+
     def time_forward(self, button):
-        """Step forward pressed"""
-        self.set_time_index(min(self.view.timeIndex + 1,
-            len(self.model.times) - 1))
+        """Step forward pressed.  Page in the next window of events
+        when stepping off the end of this one"""
+        if self.view.timeIndex >= len(self.model.times) - 1 and \
+            self.model.has_next_window():
+            self.model.load_next_window()
+            self.set_time_index(0)
+        else:
+            self.set_time_index(min(self.view.timeIndex + 1,
+                len(self.model.times) - 1))
         self.view.redraw()
         gtk.gdk.flush()
 
     def time_back(self, button):
         """Step back pressed"""
-        self.set_time_index(max(self.view.timeIndex - 1, 0))
+        if self.view.timeIndex == 0 and self.model.has_prev_window():
+            time = self.view.time
+            self.model.load_prev_window()
+            self.set_time_index(self.model.find_time_index(time - 1))
+        else:
+            self.set_time_index(max(self.view.timeIndex - 1, 0))
         self.view.redraw()
 
     def time_set(self, entry):
         """Time dialogue changed.  Need to find a suitable time
         <= the entry's time"""
-        newTime = self.model.find_time_index(int(entry.get_text()))
+        time = int(entry.get_text())
+        if not self.model.window_contains(time):
+            self.model.load_window(time)
+        newTime = self.model.find_time_index(time)
         self.set_time_index(newTime)
         self.view.redraw()
 
     def time_step(self):
         """Time step while playing"""
-        if not self.playTimer \
-            or self.view.timeIndex == len(self.model.times) - 1:
+        if not self.playTimer or self.at_end():
             self.time_stop(None)
             return False
         else:
@@ -333,9 +355,14 @@ class BlobController(object):
             self.playTimer = None
 
     def load_events(self, button):
-        """Reload events file"""
-        self.model.load_events(self.filenameEntry.get_text(),
-            startTime=self.startTime, endTime=self.endTime)
+        """Reload events file.  Stay in the same window when reloading
+        the same file"""
+        file = self.filenameEntry.get_text()
+        startTime = self.startTime
+        if file == self.model.file:
+            startTime = self.model.windowStart
+        self.model.load_events(file, startTime=startTime,
+            endTime=self.endTime)
         self.set_time_index(min(len(self.model.times) - 1,
             self.view.timeIndex))
         self.view.redraw()
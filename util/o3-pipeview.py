@@ -39,22 +39,23 @@
 
 # Pipeline activity viewer for the O3 CPU model.
 
+import bisect
+import heapq
 import optparse
 import os
 import sys
-import copy
 
-# Temporary storage for instructions. The queue is filled in out-of-order
-# until it reaches 'max_threshold' number of instructions. It is then
-# sorted out and instructions are printed out until their number drops to
-# 'min_threshold'.
+# Temporary storage for instructions. Instructions are pushed onto a heap
+# ordered by sequence number, and the oldest one is printed whenever it
+# holds more than 'window' instructions, so memory stays bounded however
+# long the printed region is.
 # It is assumed that the instructions are not out of order for more then
-# 'min_threshold' places - otherwise they will appear out of order.
+# 'window' places - otherwise they will appear out of order.
 insts = {
-    'queue': [] ,         # Instructions to print.
-    'max_threshold':2000, # Instructions are sorted out and printed when
-                          # their number reaches this threshold.
-    'min_threshold':1000, # Printing stops when this number is reached.
+    'queue': [] ,         # Heap of (seq. number, count, instruction).
+    'count':0,            # Number of queued instructions, breaks ties.
+    'window':2000,        # Instructions are printed when the heap grows
+                          # beyond this size.
     'sn_start':0,         # The first instruction seq. number to be printed.
     'sn_stop':0,          # The last instruction seq. number to be printed.
     'tick_start':0,       # The first tick to be printed
@@ -67,8 +68,91 @@ insts = {
     'only_committed':0,   # Set if only committed instructions are printed.
 }
 
+# The trace index holds one entry every 'index_interval' fetch records:
+# the byte offset of the fetch line, and the largest tick and fetch
+# sequence number seen in the lines before it. Both maxima are
+# non-decreasing, so the last entry below a start tick/seq. number can be
+# found by bisection, and no earlier line can match the start condition.
+index_magic = 'O3PipeViewIndex'
+index_interval = 1024
+
+def index_name(trace_name):
+    return trace_name + '.idx'
+
+def build_index(trace):
+    offsets, ticks, sns = [], [], []
+    max_tick = max_sn = 0
+    fetches = 0
+    offset = 0
+    for line in trace:
+        if line.startswith('O3PipeView:'):
+            fields = line.split(':', 6)
+            if fields[1] == 'fetch':
+                if fetches % index_interval == 0:
+                    offsets.append(offset)
+                    ticks.append(max_tick)
+                    sns.append(max_sn)
+                fetches += 1
+                max_sn = max(max_sn, int(fields[5]))
+            max_tick = max(max_tick, int(fields[2]))
+        offset += len(line)
+    return offsets, ticks, sns
+
+def write_index(name, stat, index):
+    with open(name, 'w') as f:
+        f.write('%s %d %d\n' % (index_magic, stat.st_size,
+                                 int(stat.st_mtime)))
+        for entry in zip(*index):
+            f.write('%d %d %d\n' % entry)
+
+def read_index(name, stat):
+    """Read an index, returns None if it is missing or out of date"""
+    try:
+        f = open(name, 'r')
+    except IOError:
+        return None
+    with f:
+        header = f.readline().split()
+        if header != [ index_magic, str(stat.st_size),
+                       str(int(stat.st_mtime)) ]:
+            return None
+        offsets, ticks, sns = [], [], []
+        for line in f:
+            offset, tick, sn = line.split()
+            offsets.append(int(offset))
+            ticks.append(int(tick))
+            sns.append(int(sn))
+    return offsets, ticks, sns
+
+def load_index(trace_name):
+    """Read the index of a trace, building it first if needed"""
+    stat = os.stat(trace_name)
+    name = index_name(trace_name)
+    index = read_index(name, stat)
+    if index is None:
+        with open(trace_name, 'r') as trace:
+            index = build_index(trace)
+        try:
+            write_index(name, stat, index)
+        except IOError:
+            print 'Could not write trace index %s' % name
+    return index
+
+def seek_trace(trace, index, start_tick, start_sn):
+    """Seek close to the first line the main loop is looking for"""
+    offsets, ticks, sns = index
+    if start_tick != 0:
+        entry = bisect.bisect_left(ticks, start_tick) - 1
+    elif start_sn != 0:
+        entry = bisect.bisect_left(sns, start_sn) - 1
+    else:
+        return
+    if entry > 0:
+        trace.seek(offsets[entry])
+
 def process_trace(trace, outfile, cycle_time, width, color, timestamps,
-                  committed_only, store_completions, start_tick, stop_tick, start_sn, stop_sn):
+                  committed_only, store_completions, start_tick, stop_tick,
+                  start_sn, stop_sn, index=None):
     global insts
 
     insts['sn_start'] = start_sn
@@ -80,31 +164,34 @@ def process_trace(trace, outfile, cycle_time, width, color, timestamps,
     line = None
     fields = None
 
+    if index:
+        seek_trace(trace, index, start_tick, start_sn)
+
     # Skip lines up to the starting tick
     if start_tick != 0:
         while True:
             line = trace.readline()
             if not line: return
+            if not line.startswith('O3PipeView:'): continue
             fields = line.split(':')
-            if fields[0] != 'O3PipeView': continue
             if int(fields[2]) >= start_tick: break
     elif start_sn != 0:
         while True:
             line = trace.readline()
             if not line: return
+            if not line.startswith('O3PipeView:fetch:'): continue
             fields = line.split(':')
-            if fields[0] != 'O3PipeView': continue
-            if fields[1] == 'fetch' and int(fields[5]) >= start_sn: break
+            if int(fields[5]) >= start_sn: break
     else:
         line = trace.readline()
         if not line: return
         fields = line.split(':')
 
     # Skip lines up to next instruction fetch
-    while fields[0] != 'O3PipeView' or fields[1] != 'fetch':
+    while not line.startswith('O3PipeView:fetch:'):
         line = trace.readline()
         if not line: return
-        fields = line.split(':')
+    fields = line.split(':')
 
     # Print header
     outfile.write('// f = fetch, d = decode, n = rename, p = dispatch, '
@@ -130,8 +217,8 @@ def process_trace(trace, outfile, cycle_time, width, color, timestamps,
             curr_inst[fields[1]] = int(fields[2])
             if fields[1] == 'fetch':
                 if ((stop_tick > 0 and int(fields[2]) > stop_tick+insts['tick_drift']) or
-                    (stop_sn > 0 and int(fields[5]) > (stop_sn+insts['max_threshold']))):
-                    print_insts(outfile, cycle_time, width, color, timestamps, 0)
+                    (stop_sn > 0 and int(fields[5]) > (stop_sn+insts['window']))):
+                    print_insts(outfile, cycle_time, width, color, timestamps, store_completions, 0)
                     return
                 (curr_inst['pc'], curr_inst['upc']) = fields[3:5]
                 curr_inst['sn'] = int(fields[5])
@@ -143,32 +230,30 @@ def process_trace(trace, outfile, cycle_time, width, color, timestamps,
                     curr_inst[fields[3]] = int(fields[4])
                 queue_inst(outfile, curr_inst, cycle_time, width, color, timestamps, store_completions)
 
-        line = trace.readline()
-        if not line:
-            print_insts(outfile, cycle_time, width, color, timestamps, store_completions, 0)
-            return
+        # Skip other trace output without splitting it
+        while True:
+            line = trace.readline()
+            if not line:
+                print_insts(outfile, cycle_time, width, color, timestamps, store_completions, 0)
+                return
+            if line.startswith('O3PipeView:'): break
         fields = line.split(':')
 
 
-#Sorts out instructions according to sequence number
-def compare_by_sn(a, b):
-    return cmp(a['sn'], b['sn'])
-
 # Puts new instruction into the print queue.
-# Sorts out and prints instructions when their number reaches threshold value
+# Prints the oldest instruction when the queue is larger than the window
 def queue_inst(outfile, inst, cycle_time, width, color, timestamps, store_completions):
     global insts
-    l_copy = copy.deepcopy(inst)
-    insts['queue'].append(l_copy)
-    if len(insts['queue']) > insts['max_threshold']:
-        print_insts(outfile, cycle_time, width, color, timestamps, store_completions, insts['min_threshold'])
+    heapq.heappush(insts['queue'], (inst['sn'], insts['count'], dict(inst)))
+    insts['count'] += 1
+    if len(insts['queue']) > insts['window']:
+        print_insts(outfile, cycle_time, width, color, timestamps, store_completions, insts['window'])
 
-# Sorts out and prints instructions in print queue
+# Prints instructions in print queue in seq. number order
 def print_insts(outfile, cycle_time, width, color, timestamps, store_completions, lower_threshold):
     global insts
-    insts['queue'].sort(compare_by_sn)
     while len(insts['queue']) > lower_threshold:
-        print_item=insts['queue'].pop(0)
+        print_item = heapq.heappop(insts['queue'])[2]
         # As the instructions are processed out of order the main loop starts
         # earlier then specified by start_sn/tick and finishes later then what
         # is defined in stop_sn/tick.
@@ -347,6 +432,11 @@ def main():
         '--store_completions',
         action='store_true', default=False,
         help="additionally display store completion ticks (default: '%default')")
+    parser.add_option(
+        '--no-index',
+        dest='index', action='store_false', default=True,
+        help="do not use or create the TRACE_FILE.idx index used to "
+        "seek to the start of a tick or instruction range")
     (options, args) = parser.parse_args()
     if len(args) != 1:
         parser.error('incorrect number of arguments')
@@ -360,13 +450,18 @@ def main():
         parser.error('invalid range')
         sys.exit(1)
     # Process trace
+    # Only look for an index if there is a range start to seek to
+    index = None
+    if options.index and (tick_range[0] != 0 or inst_range[0] != 0):
+        print 'Loading trace index... ',
+        index = load_index(args[0])
     print 'Processing trace... ',
     with open(args[0], 'r') as trace:
         with open(options.outfile, 'w') as out:
             process_trace(trace, out, options.cycle_time, options.width,
                           options.color, options.timestamps,
                           options.only_committed, options.store_completions,
-                          *(tick_range + inst_range))
+                          *(tick_range + inst_range), index=index)
     print 'done!'
 
 
@@ -72,7 +72,11 @@
 # types of proto objects can use the same function to decode a single message
 
 import gzip
+import mmap
+import os
 import struct
+import zlib
+from collections import deque
 
 def openFileRd(in_file):
     """
@@ -98,6 +102,203 @@ def openFileRd(in_file):
         exit(-1)
     return proto_in
 
+def openReader(in_file, block_size=1 << 20):
+    """
+    Open a trace for reading with a ProtoReader. Gzipped files are
+    decompressed in large blocks, and uncompressed files are memory
+    mapped.
+    """
+    try:
+        f = open(in_file, 'rb')
+        gzipped = f.read(2) == '\x1f\x8b'
+        f.close()
+    except IOError:
+        print "Failed to open ", in_file, " for reading"
+        exit(-1)
+
+    if gzipped:
+        return ProtoReader(gzip.open(in_file, 'rb'), block_size)
+    return ProtoReader(open(in_file, 'rb'), block_size, use_mmap=True)
+
+def DecodeVarintAt(buf, pos):
+    """
+    Decode a Varint32 starting at offset pos of a buffer, see
+    DecodeVarint. Return the value and the offset following it, or
+    (None, pos) if the buffer ends in the middle of the varint.
+    """
+    end = len(buf)
+    if pos >= end:
+        return (None, pos)
+    # Fast path for the common single-byte case
+    b = ord(buf[pos])
+    if not (b & 0x80):
+        return (b, pos + 1)
+
+    result = 0
+    shift = 0
+    mask = 0xffffffff
+    while 1:
+        if pos >= end:
+            return (None, pos)
+        b = ord(buf[pos])
+        result |= ((b & 0x7f) << shift)
+        pos += 1
+        if not (b & 0x80):
+            if result > 0x7fffffffffffffff:
+                result -= (1 << 64)
+                result |= ~mask
+            else:
+                result &= mask
+            return (result, pos)
+        shift += 7
+        if shift >= 64:
+            raise IOError('Too many bytes when decoding varint.')
+
+class ProtoReader(object):
+    """
+    Block-buffered reader for files of length-prefixed messages. The
+    varint length prefixes are decoded from a large in-memory buffer
+    (or directly from a memory map of an uncompressed file) rather
+    than with one small read per byte.
+    """
+
+    def __init__(self, in_file, block_size=1 << 20, use_mmap=False):
+        self.in_file = in_file
+        self.block_size = block_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.map = None
+
+        if use_mmap:
+            try:
+                if os.fstat(in_file.fileno()).st_size > 0:
+                    self.map = mmap.mmap(in_file.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+                    self.buf = self.map
+                self.eof = True
+            except (mmap.error, ValueError, EnvironmentError):
+                self.map = None
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.buf = ''
+        self.in_file.close()
+
+    def _fill(self, size):
+        """
+        Make sure at least size bytes are buffered past the current
+        position (unless the file ends first). Return False at EOF.
+        """
+        avail = len(self.buf) - self.pos
+        if avail >= size:
+            return True
+        if self.eof:
+            return avail > 0
+
+        chunks = [ self.buf[self.pos:] ]
+        while avail < size:
+            chunk = self.in_file.read(max(self.block_size, size - avail))
+            if not chunk:
+                self.eof = True
+                break
+            chunks.append(chunk)
+            avail += len(chunk)
+        self.buf = ''.join(chunks)
+        self.pos = 0
+        return avail > 0
+
+    def read(self, size):
+        """Read raw bytes (e.g., the magic number)"""
+        self._fill(size)
+        data = self.buf[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+    def nextMessage(self):
+        """
+        Return the serialized form of the next message, or None at the
+        end of the file.
+        """
+        size, pos = DecodeVarintAt(self.buf, self.pos)
+        if size is None:
+            # The varint straddles the end of the buffer, refill
+            if not self._fill(10):
+                return None
+            size, pos = DecodeVarintAt(self.buf, self.pos)
+            if size is None:
+                return None
+        if size == 0:
+            return None
+
+        end = pos + size
+        if end > len(self.buf):
+            self.pos = pos
+            if not self._fill(size):
+                return None
+            pos = self.pos
+            end = pos + size
+            if end > len(self.buf):
+                # Truncated message
+                return None
+        self.pos = end
+        return self.buf[pos:end]
+
+    def messages(self, message):
+        """
+        Generate the remaining messages of the file, parsed into
+        message. Note that the same message object is yielded each
+        time.
+        """
+        nextMessage = self.nextMessage
+        parse = message.ParseFromString
+        while True:
+            buf = nextMessage()
+            if buf is None:
+                return
+            parse(buf)
+            yield message
+
+    def decodeMessage(self, message):
+        """
+        Attempt to read a message and decode it. Return False if no
+        message could be read.
+        """
+        buf = self.nextMessage()
+        if buf is None:
+            return False
+        message.ParseFromString(buf)
+        return True
+
+    def fieldArrays(self, message, fields, count=None):
+        """
+        Decode up to count (default: all) remaining messages and return
+        the values of the given (integer) fields as a dictionary of
+        NumPy arrays. Unset optional fields are 0.
+
+        For example, to analyse a packet trace:
+          arrays = reader.fieldArrays(packet_pb2.Packet(),
+                                      ('cmd', 'addr', 'size', 'tick', 'pc'))
+        """
+        import numpy as np
+
+        # The array module has no 64-bit unsigned type code in Python 2,
+        # so collect the values in lists and convert them at the end
+        columns = [ [] for f in fields ]
+        appends = zip(fields, [ c.append for c in columns ])
+        n = 0
+        for msg in self.messages(message):
+            for f, append in appends:
+                append(getattr(msg, f))
+            n += 1
+            if count is not None and n >= count:
+                break
+
+        return dict((f, np.array(c, dtype=np.uint64))
+                    for f, c in zip(fields, columns))
+
 def DecodeVarint(in_file):
     """
     The decoding of the Varint32 is copied from
@@ -133,6 +334,9 @@ def decodeMessage(in_file, message):
     Attempt to read a message from the file and decode it. Return
     False if no message could be read.
     """
+    if isinstance(in_file, ProtoReader):
+        return in_file.decodeMessage(message)
+
     try:
         size, pos = DecodeVarint(in_file)
         if size == 0:
@@ -161,6 +365,130 @@ def encodeMessage(out_file, message):
     """
     Encoded a message with the length prepended as a 32-bit varint.
     """
+    if isinstance(out_file, ProtoWriter):
+        out_file.writeMessage(message)
+        return
+
     out = message.SerializeToString()
     EncodeVarint(out_file, len(out))
     out_file.write(out)
+
+def VarintBytes(value):
+    """
+    Return the Varint32 encoding of value as a string, see EncodeVarint.
+    """
+    if value < 0x80:
+        return chr(value)
+    out = bytearray()
+    bits = value & 0x7f
+    value >>= 7
+    while value:
+        out.append(0x80|bits)
+        bits = value & 0x7f
+        value >>= 7
+    out.append(bits)
+    return str(out)
+
+def gzipMember(data, level):
+    """
+    Compress a block of data into a complete gzip member. Concatenated
+    members form a valid gzip file.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    # Magic, deflate, no flags, no mtime, no extra flags, unknown OS
+    header = '\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff,
+                          len(data) & 0xffffffff)
+    return header + body + trailer
+
+def openWriter(out_file, threads=1, block_size=1 << 22, level=6):
+    """
+    Open a trace for writing with a ProtoWriter. Files ending in .gz
+    are compressed, using threads worker threads if threads > 1.
+    """
+    try:
+        proto_out = open(out_file, 'wb')
+    except IOError:
+        print "Failed to open ", out_file, " for writing"
+        exit(-1)
+
+    if not out_file.endswith('.gz'):
+        return ProtoWriter(proto_out, block_size)
+    if threads <= 1:
+        return ProtoWriter(gzip.GzipFile(fileobj=proto_out, mode='wb',
+                                         compresslevel=level),
+                           block_size, close_file=proto_out)
+    return ProtoWriter(proto_out, block_size, threads=threads, level=level)
+
+class ProtoWriter(object):
+    """
+    Batched writer for files of length-prefixed messages. Serialized
+    messages are accumulated in a large buffer that is written out in
+    blocks.
+
+    If threads > 1, each block is compressed as a separate gzip member
+    by a pool of worker threads (zlib releases the GIL while
+    compressing) and the members are written in order. Readers must
+    support concatenated gzip members, which Python's gzip module,
+    zlib's gzread() and the protobuf GzipInputStream all do.
+    """
+
+    def __init__(self, out_file, block_size=1 << 22, threads=1, level=6,
+                 close_file=None):
+        self.out_file = out_file
+        self.close_file = close_file
+        self.block_size = block_size
+        self.level = level
+        self.buf = bytearray()
+        self.pool = None
+        self.pending = deque()
+        self.threads = threads
+        if threads > 1:
+            from multiprocessing.pool import ThreadPool
+            self.pool = ThreadPool(threads)
+
+    def write(self, data):
+        """Write raw bytes (e.g., the magic number)"""
+        self.buf.extend(data)
+        if len(self.buf) >= self.block_size:
+            self.flush()
+
+    def writeMessage(self, message):
+        """
+        Encode a message with the length prepended as a 32-bit varint.
+        """
+        out = message.SerializeToString()
+        buf = self.buf
+        buf.extend(VarintBytes(len(out)))
+        buf.extend(out)
+        if len(buf) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buf:
+            return
+        data = str(self.buf)
+        self.buf = bytearray()
+
+        if self.pool is None:
+            self.out_file.write(data)
+            return
+
+        self.pending.append(self.pool.apply_async(gzipMember,
+                                                  (data, self.level)))
+        # Bound the number of blocks in flight
+        while len(self.pending) > 2 * self.threads:
+            self.out_file.write(self.pending.popleft().get())
+
+    def close(self):
+        self.flush()
+        while self.pending:
+            self.out_file.write(self.pending.popleft().get())
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        self.out_file.close()
+        if self.close_file is not None:
+            self.close_file.close()
@@ -26,7 +26,7 @@
 #
 # Authors: Nathan Binkert
 
-import MySQLdb, re, string
+import re, string
 
 def statcmp(a, b):
     v1 = a.split('.')
@@ -125,7 +125,11 @@ class Database(object):
         self.user = ''
         self.passwd = ''
         self.db = 'm5stats'
+        # If set, use this SQLite database file instead of MySQL
+        self.dbfile = None
         self.cursor = None
+        # Placeholder for query arguments, depends on the DB module
+        self.param = '%s'
 
         self.allStats = []
         self.allStatIds = {}
@@ -138,6 +142,8 @@ class Database(object):
         self.allRunNames = {}
 
         self.allFormulas = {}
+        self.formulasLoaded = False
+        self.statsLoaded = False
 
         self.stattop = {}
         self.statdict = {}
@@ -170,8 +176,8 @@ class Database(object):
 
         return None
 
-    def query(self, sql):
-        self.cursor.execute(sql)
+    def execute(self, sql, args=()):
+        self.cursor.execute(sql, args)
 
     def update_dict(self, dict):
         dict.update(self.stattop)
@@ -199,43 +205,115 @@ class Database(object):
 
     def connect(self):
         # connect
-        self.thedb = MySQLdb.connect(db=self.db,
-                                     host=self.host,
-                                     user=self.user,
-                                     passwd=self.passwd)
+        if self.dbfile is not None:
+            import sqlite3
+            self.thedb = sqlite3.connect(self.dbfile)
+            self.param = '?'
+        else:
+            import MySQLdb
+            self.thedb = MySQLdb.connect(db=self.db,
+                                         host=self.host,
+                                         user=self.user,
+                                         passwd=self.passwd)
+            self.param = '%s'
 
         # create a cursor
         self.cursor = self.thedb.cursor()
 
-        self.query('''select rn_id,rn_name,rn_sample,rn_user,rn_project
-                   from runs''')
+        self.execute('''select rn_id,rn_name,rn_sample,rn_user,rn_project
+                     from runs''')
         for result in self.cursor.fetchall():
             run = RunData(result);
             self.allRuns.append(run)
             self.allRunIds[run.run] = run
             self.allRunNames[run.name] = run
 
-        self.query('select sd_stat,sd_x,sd_y,sd_name,sd_descr from subdata')
-        for result in self.cursor.fetchall():
-            subdata = SubData(result)
-            if self.allSubData.has_key(subdata.stat):
-                self.allSubData[subdata.stat].append(subdata)
-            else:
-                self.allSubData[subdata.stat] = [ subdata ]
+        # Stats (and their subdata and formulas) are only loaded when
+        # they are looked up, so that querying a few stats doesn't
+        # require reading the description of every stat in the
+        # database.  See loadStats().
+
+    def loadFormulas(self):
+        if self.formulasLoaded:
+            return
 
-        self.query('select * from formulas')
+        self.execute('select * from formulas')
         for id,formula in self.cursor.fetchall():
-            self.allFormulas[int(id)] = formula.tostring()
+            if hasattr(formula, 'tostring'):
+                formula = formula.tostring()
+            self.allFormulas[int(id)] = str(formula)
+        self.formulasLoaded = True
+
+    # Load the stats matching an SQL condition on the stats table (all
+    # stats if where is None) that haven't been loaded yet
+    def loadStats(self, where=None, args=()):
+        if self.statsLoaded:
+            return []
+
+        sql = 'select * from stats'
+        if where is not None:
+            sql += ' where ' + where
+        self.execute(sql, args)
+        rows = [ row for row in self.cursor.fetchall()
+                 if int(row[0]) not in self.allStatIds ]
+        if not rows:
+            return []
+
+        self.loadFormulas()
+
+        ids = [ int(row[0]) for row in rows ]
+        for i in xrange(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            self.execute('''select sd_stat,sd_x,sd_y,sd_name,sd_descr
+                         from subdata where sd_stat in (%s)''' %
+                         ','.join([ self.param ] * len(chunk)), chunk)
+            for result in self.cursor.fetchall():
+                subdata = SubData(result)
+                self.allSubData.setdefault(subdata.stat, []).append(subdata)
 
         StatData.db = self
-        self.query('select * from stats')
         import info
-        for result in self.cursor.fetchall():
+        stats = []
+        for result in rows:
             stat = info.NewStat(self, StatData(result))
             self.append(stat)
             self.allStats.append(stat)
             self.allStatIds[stat.stat] = stat
             self.allStatNames[stat.name] = stat
+            stats.append(stat)
+
+        # Formulas are evaluated in terms of other stats, so make sure
+        # those are available too
+        for stat in stats:
+            if stat.type == 'FORMULA':
+                for name in re.findall(r'[A-Za-z_][\w.:]*', stat.formula):
+                    self.loadStat(name)
+
+        if where is None:
+            self.statsLoaded = True
+        return stats
+
+    def loadStatIds(self, ids):
+        ids = [ id for id in ids if id not in self.allStatIds ]
+        for i in xrange(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            self.loadStats('st_id in (%s)' %
+                           ','.join([ self.param ] * len(chunk)), chunk)
+
+    def loadAllStats(self):
+        self.loadStats()
+
+    # Load the stat with the given name, or all the stats below it
+    # if the name is a prefix (e.g., 'system.cpu')
+    def loadStat(self, name):
+        name = name.replace('__', ':')
+        if name in self.allStatNames:
+            return
+        # '_' and '%' are wildcards in like patterns, and '_' is part of
+        # most stat names, so escape them to match the prefix exactly
+        prefix = name.replace('!', '!!').replace('_', '!_').replace('%', '!%')
+        self.loadStats("st_name = %s or st_name like %s escape '!'" %
+                       (self.param, self.param), (name, prefix + '.%'))
 
     # Name: listruns
     # Desc: Prints all runs matching a given user, if no argument
@@ -263,7 +341,7 @@ class Database(object):
                    sql += ' or'
                sql += ' dt_run=%s' % run.run
             sql += ')'
-        self.query(sql)
+        self.execute(sql)
         for r in self.cursor.fetchall():
             print r[0]
 
@@ -280,7 +358,7 @@ class Database(object):
                    sql += ' or'
                sql += ' dt_run=%s' % run.run
             sql += ')'
-        self.query(sql)
+        self.execute(sql)
         ret = []
         for r in self.cursor.fetchall():
             ret.append(r[0])
@@ -298,6 +376,7 @@ class Database(object):
         if regex != None:
             rx = re.compile(regex)
 
+        self.loadAllStats()
         stats = [ stat.name for stat in self.allStats ]
         stats.sort(statcmp)
         for stat in stats:
@@ -317,6 +396,7 @@ class Database(object):
         if regex != None:
             rx = re.compile(regex)
 
+        self.loadAllStats()
         stats = [ stat.name for stat in self.allStats ]
         stats.sort(statcmp)
         for stat in stats:
@@ -331,13 +411,18 @@ class Database(object):
         ret = []
         for stat in stats:
             if type(stat) is int:
+                if stat not in self.allStatIds:
+                    self.loadStats('st_id = %s' % self.param, (stat, ))
                 ret.append(self.allStatIds[stat])
 
             if type(stat) is str:
+                # Only fetch the names to find the stats to load
                 rx = re.compile(stat)
-                for stat in self.allStats:
-                    if rx.match(stat.name):
-                        ret.append(stat)
+                self.execute('select st_id,st_name from stats')
+                ids = [ int(id) for id,name in self.cursor.fetchall()
+                        if rx.match(name) ]
+                self.loadStatIds(ids)
+                ret.extend([ self.allStatIds[id] for id in ids ])
         return ret
 
     #########################################
@@ -408,7 +493,7 @@ class Database(object):
         if ticks is None:
             ticks = self.ticks
         sql = self._method(self, stat, ticks)
-        self.query(sql)
+        self.execute(sql)
 
         runs = {}
         xmax = 0
@@ -433,4 +518,6 @@ class Database(object):
         return results
 
     def __getitem__(self, key):
+        if key not in self.stattop:
+            self.loadStat(key)
         return self.stattop[key]
@@ -26,8 +26,6 @@
 #
 # Authors: Nathan Binkert
 
-import MySQLdb
-
 class MyDB(object):
     def __init__(self, options):
         self.name = options.db
@@ -38,12 +36,14 @@ class MyDB(object):
         self.cursor = None
 
     def admin(self):
+        import MySQLdb
         self.close()
         self.mydb = MySQLdb.connect(db='mysql', host=self.host, user=self.user,
                                     passwd=self.passwd)
         self.cursor = self.mydb.cursor()
 
     def connect(self):
+        import MySQLdb
         self.close()
         self.mydb = MySQLdb.connect(db=self.name, host=self.host,
                                     user=self.user, passwd=self.passwd)
@@ -210,6 +210,9 @@ class MyDB(object):
         #   'run' is indexed to allow a user to remove all of the data for a
         #       particular execution run.  It can also be used to allow the
         #       user to print out all of the data for a given run.
+        #   'stat,run,tick' is indexed so that the values of one stat can
+        #       be retrieved for a set of runs and samples without scanning
+        #       the data of all other stats.
         #
         self.query('''
         CREATE TABLE data(
@@ -221,6 +224,7 @@ class MyDB(object):
             dt_data	DOUBLE			NOT NULL,
             INDEX (dt_stat),
             INDEX (dt_run),
+            INDEX (dt_stat,dt_run,dt_tick),
             UNIQUE (dt_stat,dt_x,dt_y,dt_run,dt_tick)
         ) TYPE=InnoDB;''')
 
@@ -383,3 +387,161 @@ class MyDB(object):
         FROM event_names
         LEFT JOIN events ON en_id=ev_event
         WHERE ev_event IS NULL''')
+
+# File based database with the same schema as MyDB.  It doesn't need a
+# database server, so it can be used offline (e.g., on compute nodes).
+# See MyDB.populate() for a description of the tables.
+class SQLiteDB(MyDB):
+    def __init__(self, options):
+        super(SQLiteDB, self).__init__(options)
+        self.filename = options.dbfile
+
+    def admin(self):
+        self.connect()
+
+    def connect(self):
+        import sqlite3
+        self.close()
+        self.mydb = sqlite3.connect(self.filename)
+        self.cursor = self.mydb.cursor()
+
+    def close(self):
+        if self.mydb is not None:
+            self.mydb.commit()
+        super(SQLiteDB, self).close()
+        self.mydb = None
+
+    def drop(self):
+        import os
+        self.close()
+        if os.path.exists(self.filename):
+            os.unlink(self.filename)
+        self.connect()
+
+    def create(self):
+        pass
+
+    def populate(self):
+        self.query('''
+        CREATE TABLE runs(
+            rn_id	INTEGER		PRIMARY KEY AUTOINCREMENT,
+            rn_name	VARCHAR(200)	NOT NULL,
+            rn_sample	VARCHAR(32)	NOT NULL,
+            rn_user	VARCHAR(32)	NOT NULL,
+            rn_project	VARCHAR(100)	NOT NULL,
+            rn_date	TIMESTAMP	NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            rn_expire	TIMESTAMP	NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (rn_name,rn_sample)
+        )''')
+
+        self.query('''
+        CREATE TABLE stats(
+            st_id	INTEGER		PRIMARY KEY AUTOINCREMENT,
+            st_name	VARCHAR(255)	NOT NULL,
+            st_descr	TEXT		NOT NULL,
+            st_type	VARCHAR(10)	NOT NULL
+                CHECK (st_type IN ("SCALAR", "VECTOR", "DIST", "VECTORDIST",
+                                   "VECTOR2D", "FORMULA")),
+            st_print	BOOL		NOT NULL,
+            st_prereq	SMALLINT	NOT NULL,
+            st_prec	TINYINT		NOT NULL,
+            st_nozero	BOOL		NOT NULL,
+            st_nonan	BOOL		NOT NULL,
+            st_total	BOOL		NOT NULL,
+            st_pdf	BOOL		NOT NULL,
+            st_cdf	BOOL		NOT NULL,
+            st_min	DOUBLE		NOT NULL,
+            st_max	DOUBLE		NOT NULL,
+            st_bktsize	DOUBLE		NOT NULL,
+            st_size	SMALLINT	NOT NULL,
+            UNIQUE (st_name)
+        )''')
+
+        self.query('''
+        CREATE TABLE data(
+            dt_stat	SMALLINT	NOT NULL,
+            dt_x	SMALLINT	NOT NULL,
+            dt_y	SMALLINT	NOT NULL,
+            dt_run	SMALLINT	NOT NULL,
+            dt_tick	BIGINT		NOT NULL,
+            dt_data	DOUBLE		NOT NULL,
+            UNIQUE (dt_stat,dt_x,dt_y,dt_run,dt_tick)
+        )''')
+        self.query('CREATE INDEX data_stat ON data(dt_stat)')
+        self.query('CREATE INDEX data_run ON data(dt_run)')
+        self.query('''
+        CREATE INDEX data_stat_run_tick ON data(dt_stat,dt_run,dt_tick)''')
+
+        self.query('''
+        CREATE TABLE subdata(
+            sd_stat	SMALLINT	NOT NULL,
+            sd_x	SMALLINT	NOT NULL,
+            sd_y	SMALLINT	NOT NULL,
+            sd_name	VARCHAR(255)	NOT NULL,
+            sd_descr	TEXT,
+            UNIQUE (sd_stat,sd_x,sd_y)
+        )''')
+
+        self.query('''
+        CREATE TABLE formulas(
+            fm_stat	SMALLINT	NOT NULL,
+            fm_formula	BLOB		NOT NULL,
+            PRIMARY KEY(fm_stat)
+        )''')
+
+        self.query('''
+        CREATE TABLE formula_ref(
+            fr_stat	SMALLINT	NOT NULL,
+            fr_run	SMALLINT	NOT NULL,
+            UNIQUE (fr_stat,fr_run)
+        )''')
+        self.query('CREATE INDEX formula_ref_stat ON formula_ref(fr_stat)')
+        self.query('CREATE INDEX formula_ref_run ON formula_ref(fr_run)')
+
+        self.query('''
+        CREATE TABLE events(
+            ev_event	SMALLINT	NOT NULL,
+            ev_run	SMALLINT	NOT NULL,
+            ev_tick	BIGINT		NOT NULL,
+            UNIQUE(ev_event,ev_run,ev_tick)
+        )''')
+        self.query('CREATE INDEX events_event ON events(ev_event)')
+        self.query('CREATE INDEX events_run ON events(ev_run)')
+        self.query('CREATE INDEX events_tick ON events(ev_tick)')
+
+        self.query('''
+        CREATE TABLE event_names(
+            en_id	INTEGER		PRIMARY KEY AUTOINCREMENT,
+            en_name	VARCHAR(255)	NOT NULL,
+            UNIQUE (en_name)
+        )''')
+
+    # SQLite doesn't support multi-table DELETE, so use subqueries
+    def clean(self):
+        self.query('''
+        DELETE FROM data
+        WHERE dt_run NOT IN (SELECT rn_id FROM runs)''')
+
+        self.query('''
+        DELETE FROM formula_ref
+        WHERE fr_run NOT IN (SELECT rn_id FROM runs)''')
+
+        self.query('''
+        DELETE FROM formulas
+        WHERE fm_stat NOT IN (SELECT fr_stat FROM formula_ref)''')
+
+        self.query('''
+        DELETE FROM stats
+        WHERE st_id NOT IN (SELECT DISTINCT dt_stat FROM data)''')
+
+        self.query('''
+        DELETE FROM subdata
+        WHERE sd_stat NOT IN (SELECT DISTINCT dt_stat FROM data)''')
+
+        self.query('''
+        DELETE FROM events
+        WHERE ev_run NOT IN (SELECT rn_id FROM runs)''')
+
+        self.query('''
+        DELETE FROM event_names
+        WHERE en_id NOT IN (SELECT ev_event FROM events)''')
@@ -0,0 +1,157 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Bulk loading of stats.txt files into a stats database (see dbinit.py
+# for the schema).  The file is streamed one dump at a time, and all of
+# the inserts are batched and done in a single transaction, so loading
+# large files with many periodic dumps is limited by parsing rather
+# than by the database.
+#
+# Stats are stored by name: a stat without subnames ('sim_seconds') is
+# a SCALAR, and the elements of vectors and distributions
+# ('system.cpu.op_class::IntAlu', 'system.mem.latency::mean') are
+# stored as the x index of a VECTOR stat, with the element name in the
+# subdata table.  The tick of each dump is its final_tick.  nan values
+# and values that aren't numbers (no_value) are parsed as NaN, which
+# the database can't store, so they are left out of the data table.
+
+import math
+import os
+import sys
+
+# The stats.txt line parser is shared with the other stats scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+import statsfile
+
+# Generate the stats of each dump in a stats file as a list of
+# (name, value, description) tuples
+def dumps(filename):
+    f = statsfile.openStats(filename)
+    try:
+        for stats in statsfile.dumps(f):
+            yield stats
+    finally:
+        f.close()
+
+class StatsLoader(object):
+    def __init__(self, mydb, batch=10000):
+        self.mydb = mydb
+        self.cursor = mydb.cursor
+        self.batch = batch
+
+        # Current contents of the stats and subdata tables
+        self.stats = {}
+        self.cursor.execute('select st_id,st_name from stats')
+        for id,name in self.cursor.fetchall():
+            self.stats[str(name)] = int(id)
+
+        self.subdata = {}
+        self.nextx = {}
+        self.cursor.execute('select sd_stat,sd_x,sd_name from subdata')
+        for stat,x,name in self.cursor.fetchall():
+            self.subdata[int(stat), str(name)] = int(x)
+            self.nextx[int(stat)] = max(self.nextx.get(int(stat), 0),
+                                        int(x) + 1)
+
+    def newStat(self, name, desc, type):
+        self.cursor.execute('''
+        insert into stats(st_name,st_descr,st_type,st_print,st_prereq,
+                          st_prec,st_nozero,st_nonan,st_total,st_pdf,
+                          st_cdf,st_min,st_max,st_bktsize,st_size)
+        values (?,?,?,1,0,6,0,0,0,0,0,0,0,0,0)''', (name, desc, type))
+        id = self.cursor.lastrowid
+        self.stats[name] = id
+        return id
+
+    # Return the (stat, x) location of a stat value
+    def locate(self, name, desc):
+        base, sep, sub = name.partition('::')
+        stat = self.stats.get(base)
+        if stat is None:
+            stat = self.newStat(base, desc, 'VECTOR' if sep else 'SCALAR')
+
+        if not sep:
+            return stat, 0
+
+        x = self.subdata.get((stat, sub))
+        if x is None:
+            x = self.nextx.get(stat, 0)
+            self.nextx[stat] = x + 1
+            self.subdata[stat, sub] = x
+            self.cursor.execute('''
+            insert into subdata(sd_stat,sd_x,sd_y,sd_name,sd_descr)
+            values (?,?,0,?,?)''', (stat, x, sub, desc))
+        return stat, x
+
+    def flush(self, rows):
+        if rows:
+            self.cursor.executemany('''
+            insert or replace into data(dt_stat,dt_x,dt_y,dt_run,dt_tick,
+                                        dt_data)
+            values (?,?,0,?,?,?)''', rows)
+            del rows[:]
+
+    def load(self, filename, name, user='', project='', sample=''):
+        """Load all the dumps of a stats file as a new run.
+
+        Return Value:
+          (run id, number of dumps, number of values stored) tuple
+        """
+
+        self.cursor.execute('''
+        insert into runs(rn_name,rn_sample,rn_user,rn_project)
+        values (?,?,?,?)''', (name, sample, user, project))
+        run = self.cursor.lastrowid
+
+        rows = []
+        ndumps = 0
+        nvalues = 0
+        try:
+            for stats in dumps(filename):
+                tick = ndumps
+                for stat_name, value, desc in stats:
+                    if stat_name == 'final_tick':
+                        tick = int(value)
+                        break
+
+                for stat_name, value, desc in stats:
+                    stat, x = self.locate(stat_name, desc)
+                    # dt_data can't be NULL, which is what the database
+                    # turns NaN into, so NaN values are not stored
+                    if math.isnan(value):
+                        continue
+                    rows.append((stat, x, run, tick, value))
+                    nvalues += 1
+                    if len(rows) >= self.batch:
+                        self.flush(rows)
+
+                ndumps += 1
+
+            self.flush(rows)
+        except:
+            self.mydb.mydb.rollback()
+            raise
+
+        self.mydb.mydb.commit()
+        return run, ndumps, nvalues
@@ -32,9 +32,11 @@ import re, sys, math
 
 def usage():
     print '''\
-Usage: %s [-E] [-F] [ -G <get> ] [-d <db> ] [-g <graphdir> ] [-h <host>] [-p]
-       [-s <system>] [-r <runs> ] [-T <samples>] [-u <username>]
-       <command> [command args]
+Usage: %s [-E] [-F] [ -G <get> ] [-d <db> ] [-f <dbfile>] [-g <graphdir> ]
+       [-h <host>] [-p] [-s <system>] [-r <runs> ] [-T <samples>]
+       [-u <username>] <command> [command args]
+
+       -f <dbfile> uses an SQLite database file instead of a MySQL server
 
        commands    extra parameters   description
        ----------- ------------------ ---------------------------------------
@@ -47,6 +49,7 @@ Usage: %s [-E] [-F] [ -G <get> ] [-d <db> ] [-g <graphdir> ] [-h <host>] [-p]
        stats       [regex]            List all stats (only matching regex)
 
        database    <command>          Where command is drop, init, or clean
+       load        <file> <run>       Load a stats.txt[.gz] file as run
 
 ''' % sys.argv[0]
     sys.exit(1)
@@ -68,7 +71,10 @@ def commands(options, command, args):
         if len(args) == 0: raise CommandException
 
         import dbinit
-        mydb = dbinit.MyDB(options)
+        if options.dbfile:
+            mydb = dbinit.SQLiteDB(options)
+        else:
+            mydb = dbinit.MyDB(options)
 
         if args[0] == 'drop':
             if len(args) > 2: raise CommandException
@@ -98,10 +104,27 @@ def commands(options, command, args):
 
         raise CommandException
 
+    if command == 'load':
+        if len(args) != 2 or not options.dbfile:
+            raise CommandException
+
+        import dbinit, ingest, time
+        mydb = dbinit.SQLiteDB(options)
+        mydb.connect()
+        start = time.time()
+        loader = ingest.StatsLoader(mydb)
+        run, ndumps, nvalues = loader.load(args[0], args[1],
+                                           user=options.user)
+        mydb.close()
+        print 'loaded run %d: %d dumps, %d values in %.2fs' % \
+              (run, ndumps, nvalues, time.time() - start)
+        return
+
     import db
     source = db.Database()
     source.host = options.host
     source.db = options.db
+    source.dbfile = options.dbfile
     source.passwd = options.passwd
     source.user = options.user
     source.connect()
@@ -416,6 +439,7 @@ if __name__ == '__main__':
     options = Options()
     options.host = None
     options.db = None
+    options.dbfile = None
     options.passwd = ''
     options.user = getpass.getuser()
     options.runs = None
@@ -428,7 +452,7 @@ if __name__ == '__main__':
     options.jobfile = None
     options.all = False
 
-    opts, args = getopts(sys.argv[1:], '-EFJad:g:h:j:m:pr:s:u:T:')
+    opts, args = getopts(sys.argv[1:], '-EFJad:f:g:h:j:m:pr:s:u:T:')
     for o,a in opts:
         if o == '-E':
             options.printmode = 'E'
@@ -438,6 +462,8 @@ if __name__ == '__main__':
             options.all = True
         if o == '-d':
             options.db = a
+        if o == '-f':
+            options.dbfile = a
         if o == '-g':
             options.graph = True;
             options.graphdir = a
@@ -468,11 +494,12 @@ if __name__ == '__main__':
         if not options.db:
             options.db = options.jobfile.statdb
 
-    if not options.host:
-        sys.exit('Database server must be provided from a jobfile or -h')
+    if not options.dbfile:
+        if not options.host:
+            sys.exit('Database server must be provided from a jobfile or -h')
 
-    if not options.db:
-        sys.exit('Database name must be provided from a jobfile or -d')
+        if not options.db:
+            sys.exit('Database name must be provided from a jobfile or -d')
 
     if len(args) == 0:
         usage()
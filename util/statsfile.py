@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# This file is a library for reading gem5 stats.txt files into a
+# columnar store, shared by the scripts that analyse simulation
+# statistics.  The file (optionally gzipped) is read once, and every
+# dump window becomes one row of a 2D NumPy array with one column per
+# stat.  Vectors and distributions are expanded into one column per
+# element ('system.cpu.op_class::IntAlu', 'system.mem.latency::mean',
+# ...).  Stats missing from a dump are NaN.
+#
+# The parsed data can be cached next to the input file (as
+# <input>.cols.npy and <input>.cols.idx), in which case later loads of
+# the same, unmodified file memory-map the cached array instead of
+# parsing the text again.
+#
+# Files written by the binary stats output (m5.stats.initBinary()) are
+# loaded into the same structure. Their dumps are fixed-size records
+# that are memory-mapped directly, so no parsing or caching is needed.
+#
+# Example:
+#
+#   import statsfile
+#   stats = statsfile.load("m5out/stats.txt")
+#   ticks = stats["final_tick"]
+#   ipc = stats["system.cpu.ipc"]
+
+import gzip
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+
+# Only the columnar store needs NumPy, the line parser (parseLine(),
+# dumps()) can be used without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+begin_marker = '---------- Begin Simulation Statistics ----------'
+end_marker = '---------- End Simulation Statistics   ----------'
+
+# Version of the cache format, bump when changing it
+cache_version = 1
+
+# Header of files written by the binary stats output (see
+# src/base/stats/binary.hh)
+binary_magic = 'gem5stat'
+binary_version = 1
+binary_bom = 0x01020304
+
+def _requireNumpy():
+    if np is None:
+        raise ImportError("statsfile requires NumPy")
+
+def openStats(filename):
+    """
+    Open a stats file for reading, using gzip if the name ends in .gz
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    return open(filename, 'r')
+
+def parseLine(line):
+    """
+    Parse a stats line into a (name, value, description) tuple. Returns
+    None if the line doesn't hold a stat. Non-numeric values (e.g.,
+    no_value) are returned as NaN.
+    """
+    body, sep, desc = line.partition('#')
+    fields = body.split()
+    if len(fields) < 2:
+        return None
+    try:
+        value = float(fields[1])
+    except ValueError:
+        value = float('nan')
+    return fields[0], value, desc.strip()
+
+def dumps(in_file):
+    """
+    Generate the stats of each dump window in an open stats file as a
+    list of (name, value, description) tuples, in file order.
+    """
+    stats = None
+    for line in in_file:
+        if line.startswith(begin_marker):
+            stats = []
+        elif line.startswith(end_marker):
+            if stats is not None:
+                yield stats
+            stats = None
+        elif stats is not None:
+            stat = parseLine(line)
+            if stat is not None:
+                stats.append(stat)
+
+    # Truncated file (e.g., the simulation is still running)
+    if stats:
+        yield stats
+
+class StatsFile(object):
+    """
+    Columnar view of the dumps in a stats file.
+
+    names -- stat names, in order of first appearance
+    descs -- dictionary of stat descriptions
+    data -- 2D array of values (dumps x stats)
+    """
+
+    def __init__(self, names, descs, data):
+        self.names = names
+        self.descs = descs
+        self.data = data
+        self.index = dict((name, i) for i, name in enumerate(names))
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        """Values of a stat across all dumps"""
+        return self.data[:, self.index[name]]
+
+    def get(self, name, default=None):
+        if name not in self.index:
+            return default
+        return self[name]
+
+    def match(self, regex):
+        """Names of the stats matching a regular expression"""
+        rx = re.compile(regex)
+        return [ name for name in self.names if rx.match(name) ]
+
+    def select(self, names):
+        """Values of a list of stats as a 2D (dumps x stats) array"""
+        return self.data[:, [ self.index[name] for name in names ]]
+
+    def vector(self, name):
+        """
+        Elements of a vector or distribution stat. Returns the list of
+        element names and a 2D (dumps x elements) array of values.
+        """
+        prefix = name + '::'
+        elements = [ n for n in self.names if n.startswith(prefix) ]
+        return [ n[len(prefix):] for n in elements ], self.select(elements)
+
+    def dump(self, i):
+        """Dictionary of the (non-NaN) stats of one dump"""
+        row = self.data[i]
+        return dict((name, row[col]) for name, col in self.index.iteritems()
+                    if not np.isnan(row[col]))
+
+def parse(in_file):
+    """
+    Parse an open stats file into a StatsFile.
+    """
+    _requireNumpy()
+    names = []
+    descs = {}
+    index = {}
+    rows = []
+
+    for stats in dumps(in_file):
+        cols = array('l')
+        values = array('d')
+        for name, value, desc in stats:
+            col = index.get(name)
+            if col is None:
+                col = len(names)
+                index[name] = col
+                names.append(name)
+                descs[name] = desc
+            cols.append(col)
+            values.append(value)
+        rows.append((cols, values))
+
+    data = np.empty((len(rows), len(names)))
+    data.fill(np.nan)
+    for i, (cols, values) in enumerate(rows):
+        data[i, np.frombuffer(cols, dtype=np.dtype('l'))] = \
+            np.frombuffer(values, dtype=np.float64)
+
+    return StatsFile(names, descs, data)
+
+def _cachePaths(filename):
+    return filename + '.cols.npy', filename + '.cols.idx'
+
+def _sourceKey(filename):
+    st = os.stat(filename)
+    return [ cache_version, st.st_size, st.st_mtime ]
+
+def _loadCache(filename):
+    data_path, idx_path = _cachePaths(filename)
+    try:
+        with open(idx_path, 'r') as f:
+            idx = json.load(f)
+        if idx['source'] != _sourceKey(filename):
+            return None
+        data = np.load(data_path, mmap_mode='r')
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+    if data.shape != (idx['dumps'], len(idx['names'])):
+        return None
+    names = [ str(name) for name in idx['names'] ]
+    descs = dict((str(name), str(desc))
+                 for name, desc in idx['descs'].iteritems())
+    return StatsFile(names, descs, data)
+
+def _writeCache(filename, stats):
+    data_path, idx_path = _cachePaths(filename)
+    idx = {
+        'source' : _sourceKey(filename),
+        'dumps' : len(stats),
+        'names' : stats.names,
+        'descs' : stats.descs,
+        }
+    try:
+        np.save(data_path, stats.data)
+        # Write the index last, it validates the data file
+        with open(idx_path, 'w') as f:
+            json.dump(idx, f)
+    except (IOError, OSError):
+        pass
+
+def isBinary(filename):
+    """
+    Check if a file was written by the binary stats output
+    """
+    in_file = openStats(filename)
+    try:
+        return in_file.read(len(binary_magic)) == binary_magic
+    finally:
+        in_file.close()
+
+def parseBinary(buf):
+    """
+    Parse the contents of a binary stats file (a string or mmap) into
+    a StatsFile. Runs of dumps that share a column table are returned
+    as views of buf rather than copies.
+    """
+    _requireNumpy()
+    if buf[:len(binary_magic)] != binary_magic:
+        raise ValueError("Not a binary stats file")
+
+    for order in ('<', '>'):
+        version, bom = struct.unpack_from(order + 'II', buf, 8)
+        if bom == binary_bom:
+            break
+    else:
+        raise ValueError("Invalid byte order mark in binary stats file")
+    if version != binary_version:
+        raise ValueError("Unsupported binary stats version %d" % version)
+
+    word = struct.Struct(order + 'II')
+    dtype = np.dtype(order + 'f8')
+
+    # Tables in file order and the dumps using each of them as
+    # (table, offset of first dump, number of dumps, record size)
+    tables = [ ([], []) ]
+    runs = []
+    offset = 16
+    while offset + 8 <= len(buf):
+        tag, count = word.unpack_from(buf, offset)
+        offset += 8
+        if tag == ord('T'):
+            names, descs = [], []
+            for i in xrange(count):
+                for strs in (names, descs):
+                    size, = struct.unpack_from(order + 'I', buf, offset)
+                    strs.append(buf[offset + 4:offset + 4 + size])
+                    offset += 4 + size
+            offset += -offset % 8
+            tables.append((names, descs))
+        elif tag == ord('D'):
+            size = 8 + 8 * count
+            # Truncated file (e.g., the simulation is still running)
+            if offset - 8 + size > len(buf):
+                break
+            table = len(tables) - 1
+            if runs and runs[-1][0] == table:
+                runs[-1][2] += 1
+            else:
+                runs.append([ table, offset, 1, size ])
+            offset += size - 8
+        else:
+            raise ValueError("Corrupt binary stats file at offset %d" % \
+                             (offset - 8))
+
+    blocks = [ (tables[table],
+                np.ndarray(shape=(dumps, len(tables[table][0])),
+                           dtype=dtype, buffer=buf, offset=first,
+                           strides=(size, 8)))
+               for table, first, dumps, size in runs ]
+
+    if len(blocks) == 1:
+        (names, descs), data = blocks[0]
+        return StatsFile(names, dict(zip(names, descs)), data)
+
+    # The columns changed between dumps, merge the tables
+    names = []
+    descs = {}
+    index = {}
+    for (t_names, t_descs), data in blocks:
+        for name, desc in zip(t_names, t_descs):
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+                descs[name] = desc
+
+    data = np.empty((sum([ len(d) for t, d in blocks ]), len(names)))
+    data.fill(np.nan)
+    row = 0
+    for (t_names, t_descs), block in blocks:
+        cols = [ index[name] for name in t_names ]
+        data[row:row + len(block), cols] = block
+        row += len(block)
+
+    return StatsFile(names, descs, data)
+
+def loadBinary(filename):
+    """
+    Load a file written by the binary stats output. Uncompressed files
+    are memory-mapped.
+    """
+    if filename.endswith('.gz'):
+        in_file = gzip.open(filename, 'rb')
+        try:
+            return parseBinary(in_file.read())
+        finally:
+            in_file.close()
+
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Not a binary stats file")
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return parseBinary(buf)
+
+def load(filename, cache=False):
+    """
+    Load a (optionally gzipped) stats file. Both stats.txt files and
+    files written by the binary stats output are supported.
+
+    If cache is True, a valid cache next to a text input is
+    memory-mapped instead of parsing the file, and the cache is
+    (re)written after parsing otherwise.
+    """
+    _requireNumpy()
+    if isBinary(filename):
+        return loadBinary(filename)
+
+    if cache:
+        stats = _loadCache(filename)
+        if stats is not None:
+            return stats
+
+    in_file = openStats(filename)
+    try:
+        stats = parse(in_file)
+    finally:
+        in_file.close()
+
+    if cache:
+        _writeCache(filename, stats)
+    return stats
@@ -66,6 +66,8 @@ import xml.etree.ElementTree as ET
 import xml.dom.minidom as minidom
 import shutil
 import zlib
+import multiprocessing
+from array import array
 
 import argparse
 
@@ -106,6 +108,11 @@ parser.add_argument("--gzipped-bmp-not-supported", action="store_true",
                     This option is only required when using Streamline versions \
                     older than 5.14")
 
+parser.add_argument("-j", "--jobs", action="store", type=int,
+                    default=multiprocessing.cpu_count(),
+                    help="Number of processes used to parse the stats \
+                    file. Default=number of CPUs")
+
 parser.add_argument("--verbose", action="store_true",
                     help="Enable verbose output")
 
@@ -332,7 +339,7 @@ def stringList(x):
     ret = []
     ret += packed32(len(x))
     for i in x:
-        ret.append(i)
+        ret.append(ord(i))
     return ret
 
 def utf8StringList(x):
@@ -353,8 +360,7 @@ def timestampList(x):
 ############################################################
 
 def writeBinary(outfile, binary_list):
-    for i in binary_list:
-        outfile.write("%c" % i)
+    outfile.write(bytearray(binary_list))
 
 ############################################################
 # APC Protocol Frame Types
@@ -729,9 +735,6 @@ class StatsEntry(object):
         self.short_name = re.sub("system\.", "", name)
         self.short_name = re.sub(":", "_", name)
 
-        # Regex for this stat (string version used to construct union regex)
-        self.regex_string = "^" + name + "\s+([\d\.]+)"
-        self.regex = re.compile("^" + name + "\s+([\d\.e\-]+)\s+# (.*)$", re.M)
         self.description = ""
 
         # Whether this stat is use per CPU or not
@@ -740,11 +743,8 @@ class StatsEntry(object):
         # Key used in .apc protocol (as described in captured.xml)
         self.key = key
 
-        # List of values of stat per timestamp
-        self.values = []
-
-        # Whether this stat has been found for the current timestamp
-        self.found = False
+        # Values of stat per timestamp
+        self.values = array('d')
 
         # Whether this stat has been found at least once
         # (to suppress too many warnings)
@@ -753,12 +753,10 @@ class StatsEntry(object):
         # Field used to hold ElementTree subelement for this stat
         self.ET_element = None
 
-        # Create per-CPU stat name and regex, etc.
+        # Create per-CPU stat names and values
         if self.per_cpu:
-            self.per_cpu_regex_string = []
-            self.per_cpu_regex = []
             self.per_cpu_name = []
-            self.per_cpu_found = []
+            self.values = []
             for i in range(num_cpus):
                 if num_cpus > 1:
                     per_cpu_name = re.sub("#", str(i), self.name)
@@ -768,18 +766,26 @@ class StatsEntry(object):
                 self.per_cpu_name.append(per_cpu_name)
                 print "\t", per_cpu_name
 
-                self.per_cpu_regex_string.\
-                    append("^" + per_cpu_name + "\s+[\d\.]+")
-                self.per_cpu_regex.append(re.compile("^" + per_cpu_name + \
-                    "\s+([\d\.e\-]+)\s+# (.*)$", re.M))
-                self.values.append([])
-                self.per_cpu_found.append(False)
+                self.values.append(array('d'))
+
+    # Names of the stats in the stats file for this entry
+    def stat_names(self):
+        if self.per_cpu:
+            return self.per_cpu_name
+        else:
+            return [ self.name ]
+
+    def stat_values(self):
+        if self.per_cpu:
+            return self.values
+        else:
+            return [ self.values ]
 
     def append_value(self, val, per_cpu_index = None):
         if self.per_cpu:
-            self.values[per_cpu_index].append(str(val))
+            self.values[per_cpu_index].append(val)
         else:
-            self.values.append(str(val))
+            self.values.append(val)
 
 # Global stats object that contains the list of stats entries
 # and other utility functions
@@ -795,18 +801,13 @@ class Stats(object):
             self.next_key))
         self.next_key += 1
 
-    # Union of all stats to accelerate parsing speed
-    def createStatsRegex(self):
-        regex_strings = [];
+    # List of all the stat names to look for in the stats file, the
+    # values of a window are returned in this order
+    def createStatsNames(self):
         print "\nnum entries in stats_list", len(self.stats_list)
+        self.names = []
         for entry in self.stats_list:
-            if entry.per_cpu:
-                for i in range(num_cpus):
-                    regex_strings.append(entry.per_cpu_regex_string[i])
-            else:
-                regex_strings.append(entry.regex_string)
-
-        self.regex = re.compile('|'.join(regex_strings))
+            self.names += entry.stat_names()
 
 
 def registerStats(config_file):
@@ -856,10 +857,89 @@ def registerStats(config_file):
                 stats.register(item, group, i, False)
                 i += 1
 
-    stats.createStatsRegex()
+    stats.createStatsNames()
 
     return stats
 
+window_end_marker = "---------- End Simulation Statistics   ----------"
+stat_value_regex = re.compile("[\d\.e\-]+$")
+
+# Split the stats file into windows, the text of each stats dump.  The
+# file is read in large blocks and only searched for the end markers,
+# the lines are split up by the parsing processes.  The second element
+# of each tuple is True if reading the file failed in the window.
+def statsWindows(f, block_size = 1 << 22):
+    data = ""
+    eof = False
+    while not eof:
+        try:
+            block = f.read(block_size)
+        except IOError:
+            print ""
+            print "WARNING: IO error in stats file"
+            print "(gzip stream not closed properly?)...continuing for now"
+            yield data, True
+            return
+        eof = not block
+        data += block
+
+        start = 0
+        while True:
+            end = data.find(window_end_marker, start)
+            if end < 0:
+                break
+            end = data.find("\n", end)
+            if end < 0:
+                if not eof:
+                    break
+                end = len(data)
+            yield data[start:end + 1], False
+            start = end + 1
+        data = data[start:]
+
+# Names of the stats parseWindows looks for, set before the parsing
+# processes are started
+window_stat_names = []
+
+# Parse a list of windows.  The stats are looked up by name and only the
+# lines of the wanted stats are split up.  For each window returns its
+# final tick, the simulation frequency and the values of
+# window_stat_names (None for missing stats) and their descriptions.
+def parseWindows(windows):
+    wanted = dict((name, i) for i, name in enumerate(window_stat_names))
+    wanted["final_tick"] = -1
+    wanted["sim_freq"] = -2
+    ret = []
+    for window in windows:
+        tick = None
+        sim_freq = None
+        values = [ None ] * len(window_stat_names)
+        descriptions = [ None ] * len(window_stat_names)
+        for line in window.splitlines():
+            i = wanted.get(line.partition(" ")[0])
+            if i is None:
+                continue
+            fields = line.split(None, 2)
+            if len(fields) < 2:
+                continue
+            if i < 0:
+                if fields[1].isdigit():
+                    if i == -1:
+                        tick = int(fields[1])
+                    else:
+                        sim_freq = int(fields[1])
+                continue
+
+            if values[i] is not None:
+                continue
+            if len(fields) < 3 or not fields[2].startswith("# ") or \
+                    not stat_value_regex.match(fields[1]):
+                continue
+            values[i] = float(fields[1])
+            descriptions[i] = fields[2][2:]
+        ret.append((tick, sim_freq, values, descriptions))
+    return ret
+
 # Parse and read in gem5 stats file
 # Streamline counters are organized per CPU
 def readGem5Stats(stats, gem5_stats_file):
@@ -869,14 +949,7 @@ def readGem5Stats(stats, gem5_stats_file):
     print "===============================\n"
     ext = os.path.splitext(gem5_stats_file)[1]
 
-    window_start_regex = \
-        re.compile("^---------- Begin Simulation Statistics ----------")
-    window_end_regex = \
-        re.compile("^---------- End Simulation Statistics   ----------")
-    final_tick_regex = re.compile("^final_tick\s+(\d+)")
-
     global ticks_in_ns
-    sim_freq_regex = re.compile("^sim_freq\s+(\d+)")
     sim_freq = -1
 
     try:
@@ -888,103 +961,87 @@ def readGem5Stats(stats, gem5_stats_file):
         print "ERROR opening stats file", gem5_stats_file, "!"
         sys.exit(1)
 
-    stats_not_found_list = stats.stats_list[:]
-    window_num = 0
+    global window_stat_names
+    window_stat_names = stats.names
 
-    while (True):
+    # Windows are parsed in chunks by a pool of processes, a batch of
+    # chunks at a time to bound the memory used
+    jobs = max(args.jobs, 1)
+    chunk_size = 16
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+
+    windows = statsWindows(f)
+    window_num = 0
+    done = False
+    while not done:
+        batch = []
         error = False
-        try:
-            line = f.readline()
-        except IOError:
-            print ""
-            print "WARNING: IO error in stats file"
-            print "(gzip stream not closed properly?)...continuing for now"
-            error = True
-        if not line:
+        for window, error in windows:
+            batch.append(window)
+            if error or len(batch) == jobs * chunk_size:
+                break
+        if not batch:
             break
+        if error:
+            done = True
+
+        chunks = [ batch[i:i + chunk_size]
+                   for i in range(0, len(batch), chunk_size) ]
+        if pool:
+            results = pool.map(parseWindows, chunks)
+        else:
+            results = map(parseWindows, chunks)
 
-        # Find out how many gem5 ticks in 1ns
-        if sim_freq < 0:
-            m = sim_freq_regex.match(line)
-            if m:
-                sim_freq = int(m.group(1)) # ticks in 1 sec
+        for tick, window_freq, values, descriptions in \
+                [ r for chunk in results for r in chunk ]:
+            # Find out how many gem5 ticks in 1ns
+            if sim_freq < 0 and window_freq is not None:
+                sim_freq = window_freq # ticks in 1 sec
                 ticks_in_ns = int(sim_freq / 1e9)
                 print "Simulation frequency found! 1 tick == %e sec\n" \
                         % (1.0 / sim_freq)
 
-        # Final tick in gem5 stats: current absolute timestamp
-        m = final_tick_regex.match(line)
-        if m:
-            tick = int(m.group(1))
-            if tick > end_tick:
-                break
-            stats.tick_list.append(tick)
-
+            # Final tick in gem5 stats: current absolute timestamp
+            if tick is not None:
+                if tick > end_tick:
+                    done = True
+                    break
+                stats.tick_list.append(tick)
 
-        if (window_end_regex.match(line) or error):
             if args.verbose:
                 print "new window"
+
+            i = 0
             for stat in stats.stats_list:
-                if stat.per_cpu:
-                    for i in range(num_cpus):
-                        if not stat.per_cpu_found[i]:
-                            if not stat.not_found_at_least_once:
-                                print "WARNING: stat not found in window #", \
-                                    window_num, ":", stat.per_cpu_name[i]
-                                print "suppressing further warnings for " + \
-                                    "this stat"
-                                stat.not_found_at_least_once = True
-                            stat.values[i].append(str(0))
-                        stat.per_cpu_found[i] = False
-                else:
-                    if not stat.found:
+                for name, stat_values in \
+                        zip(stat.stat_names(), stat.stat_values()):
+                    value = values[i]
+                    if value is None:
                         if not stat.not_found_at_least_once:
                             print "WARNING: stat not found in window #", \
-                                window_num, ":", stat.name
-                            print "suppressing further warnings for this stat"
+                                window_num, ":", name
+                            print "suppressing further warnings for " + \
+                                "this stat"
                             stat.not_found_at_least_once = True
-                        stat.values.append(str(0))
-                    stat.found = False
-            stats_not_found_list = stats.stats_list[:]
-            window_num += 1
-            if error:
-                break
-
-        # Do a single regex of the union of all stats first for speed
-        if stats.regex.match(line):
-            # Then loop through only the stats we haven't seen in this window
-            for stat in stats_not_found_list[:]:
-                if stat.per_cpu:
-                    for i in range(num_cpus):
-                        m = stat.per_cpu_regex[i].match(line)
-                        if m:
-                            if stat.name == "ipc":
-                                value = str(int(float(m.group(1)) * 1000))
-                            else:
-                                value = str(int(float(m.group(1))))
-                            if args.verbose:
-                                print stat.per_cpu_name[i], value
-                            stat.values[i].append(value)
-                            stat.per_cpu_found[i] = True
-                            all_found = True
-                            for j in range(num_cpus):
-                                if not stat.per_cpu_found[j]:
-                                    all_found = False
-                            if all_found:
-                                stats_not_found_list.remove(stat)
-                            if stat.description == "":
-                                stat.description = m.group(2)
-                else:
-                    m = stat.regex.match(line)
-                    if m:
-                        value = str(int(float(m.group(1))))
+                        value = 0
+                    else:
+                        if stat.name == "ipc":
+                            value = int(value * 1000)
+                        else:
+                            value = int(value)
                         if args.verbose:
-                            print stat.name, value
-                        stat.values.append(value)
-                        stat.found = True
-                        stats_not_found_list.remove(stat)
+                            print name, value
                         if stat.description == "":
-                            stat.description = m.group(2)
+                            stat.description = descriptions[i]
+                    stat_values.append(value)
+                    i += 1
+            window_num += 1
+
+    if pool:
+        pool.close()
+        pool.join()
     f.close()
 
 
@@ -1106,15 +1163,18 @@ def writeCounters(blob, stats):
         else:
             stat_length = len(stat.values)
 
+    # Write all the counters of a timestamp at once
     for n in range(len(timestamp_list)):
+        frames = []
         for stat in stats.stats_list:
             if stat.per_cpu:
                 for i in range(num_cpus):
-                    writeBinary(blob, counterFrame(timestamp_list[n], i, \
-                                    stat.key, int(float(stat.values[i][n]))))
+                    frames += counterFrame(timestamp_list[n], i, \
+                                  stat.key, int(stat.values[i][n]))
             else:
-                writeBinary(blob, counterFrame(timestamp_list[n], 0, \
-                                    stat.key, int(float(stat.values[n]))))
+                frames += counterFrame(timestamp_list[n], 0, \
+                              stat.key, int(stat.values[n]))
+        writeBinary(blob, frames)
 
 # Streamline can display LCD frame buffer dumps (gzipped bmp)
 # This function converts the frame buffer dumps to the Streamline format
@@ -1161,7 +1221,7 @@ def writeVisualAnnotations(blob, input_path, output_path):
                 bytes_read = gzip.open(frame_path + "/" + fn, "rb").read()
 
             userspace_body += int32(len(bytes_read))
-            userspace_body += bytes_read
+            userspace_body += bytearray(bytes_read)
 
             writeBinary(blob, annotateFrame(0, annotate_pid, ticksToNs(tick), \
                                 len(userspace_body), userspace_body))